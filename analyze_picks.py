@@ -1,15 +1,36 @@
+import argparse
 import sqlite3
+from database import get_connection, release_connection
+from migrations import migrate
+from report import write_rows
 
 DATABASE_NAME = "picks.db"
 
+def _render_pick(row):
+    (pick_id, commence_time, home_team, away_team, market, pick_text,
+     pick_odds, confidence, result) = row
+    return (
+        f"[{pick_id}] Game: {away_team} @ {home_team}\n"
+        f"    Date: {commence_time}\n"
+        f"    Market: {market.capitalize()}\n"
+        f"    Pick: {pick_text}\n"
+        f"    Odds: {pick_odds}\n"
+        f"    Confidence: {confidence}\n"
+        f"    Result: {result if result else 'PENDING'}\n"
+        + "-" * 25 + "\n"
+    )
+
 def display_pick_report():
-    """Displays a report of all generated picks, including specific odds."""
+    """Displays a report of all generated picks, including specific odds. Returns the number of picks shown.
+
+    Rows are streamed through report.write_rows rather than fetched all at once.
+    """
     conn = None
     try:
-        conn = sqlite3.connect(DATABASE_NAME)
+        conn = get_connection(DATABASE_NAME)
         cursor = conn.cursor()
-        
-        # Updated SELECT statement to pull pick_odds directly from nfl_picks
+
+        # Pull the odds stored with each pick directly from nfl_picks
         cursor.execute('''
             SELECT
                 p.id,
@@ -18,7 +39,7 @@ def display_pick_report():
                 f.away_team,
                 p.market,
                 p.pick,
-                p.pick_odds,
+                p.odds,
                 p.confidence_level,
                 p.result
             FROM nfl_picks AS p
@@ -26,119 +47,226 @@ def display_pick_report():
             ON p.game_id = f.id
             ORDER BY f.commence_time ASC
         ''')
-        
-        picks_data = cursor.fetchall()
-        
-        if not picks_data:
-            print("No picks found in the database. Run `generate_picks.py` first!")
-            return None
-
-        print("\n--- Pickatron NFL Analysis Report ---")
-        print("-------------------------------------")
-        
-        for pick in picks_data:
-            (pick_id, commence_time, home_team, away_team, market, pick_text, 
-             pick_odds, confidence, result) = pick
-            
-            result_display = result if result else "PENDING"
-            
-            print(f"[{pick_id}] Game: {away_team} @ {home_team}")
-            print(f"    Date: {commence_time}")
-            print(f"    Market: {market.capitalize()}")
-            print(f"    Pick: {pick_text}")
-            print(f"    Odds: {pick_odds}")
-            print(f"    Confidence: {confidence}")
-            print(f"    Result: {result_display}")
-            print("-" * 25)
-            
-        return picks_data
-            
+        columns = [description[0] for description in cursor.description]
+        return write_rows(
+            cursor, columns, render_text=_render_pick,
+            title="\n--- Pickatron NFL Analysis Report ---\n-------------------------------------",
+            empty_message="No picks found in the database. Run `generate_picks.py` first!",
+        )
+
     except sqlite3.Error as e:
         print(f"Database error: {e}")
-        return None
+        return 0
     finally:
         if conn:
-            conn.close()
+            release_connection(conn)
+
+def has_picks():
+    """True if nfl_picks holds at least one pick (an EXISTS probe, not a scan)."""
+    conn = None
+    try:
+        conn = get_connection(DATABASE_NAME)
+        return conn.execute("SELECT EXISTS (SELECT 1 FROM nfl_picks)").fetchone()[0] == 1
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return False
+    finally:
+        if conn:
+            release_connection(conn)
+
+STAKE = 100
+PICKS_SPORT = "NFL"  # nfl_picks only holds NFL picks
+
+def _stats_delta(result, odds, sign=1):
+    """Returns one pick's (bets, wins, losses, pushes, staked, profit) contribution, times sign.
+
+    Pushes are not staked. Picks saved without odds still count towards the
+    record and hit rate but not towards staked/profit.
+    """
+    settled = result in ("WIN", "LOSS")
+    priced = settled and odds is not None
+    if not priced:
+        profit = 0.0
+    elif result == "WIN":
+        profit = (odds - 1) * STAKE
+    else:
+        profit = -STAKE
+    return (
+        sign * int(settled),
+        sign * int(result == "WIN"),
+        sign * int(result == "LOSS"),
+        sign * int(result == "PUSH"),
+        sign * (STAKE if priced else 0),
+        sign * profit,
+    )
+
+def _apply_stats_delta(cursor, market, confidence, delta):
+    cursor.execute('''
+        INSERT INTO pick_stats (sport, market, confidence_level, bets, wins, losses, pushes, staked, profit)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(sport, market, confidence_level) DO UPDATE SET
+            bets = bets + excluded.bets,
+            wins = wins + excluded.wins,
+            losses = losses + excluded.losses,
+            pushes = pushes + excluded.pushes,
+            staked = staked + excluded.staked,
+            profit = profit + excluded.profit
+    ''', (PICKS_SPORT, market or '', confidence or '') + delta)
+
+def _set_pick_result(cursor, pick_id, result):
+    """Sets a pick's result and moves its contribution in pick_stats. Returns False if not found."""
+    cursor.execute(
+        "SELECT market, confidence_level, odds, result FROM nfl_picks WHERE id = ?", (pick_id,)
+    )
+    row = cursor.fetchone()
+    if not row:
+        return False
+    market, confidence, odds, previous = row
+    if previous == result:
+        return True
+    if previous is not None:
+        _apply_stats_delta(cursor, market, confidence, _stats_delta(previous, odds, sign=-1))
+    cursor.execute('''
+        UPDATE nfl_picks
+        SET result = ?
+        WHERE id = ?
+    ''', (result, pick_id))
+    if result is not None:
+        _apply_stats_delta(cursor, market, confidence, _stats_delta(result, odds))
+    return True
 
 def update_pick_result(pick_id, result):
-    """Updates the result for a specific pick in the database."""
+    """Updates the result for a specific pick and its pick_stats totals in one transaction."""
     conn = None
     try:
-        conn = sqlite3.connect(DATABASE_NAME)
+        conn = get_connection(DATABASE_NAME)
         cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE nfl_picks
-            SET result = ?
-            WHERE id = ?
-        ''', (result, pick_id))
+        cursor.execute("BEGIN IMMEDIATE")
+        if not _set_pick_result(cursor, pick_id, result):
+            conn.rollback()
+            print(f"No pick found with ID {pick_id}.")
+            return
         conn.commit()
         print(f"Result for Pick ID {pick_id} updated to {result}.")
     except sqlite3.Error as e:
         print(f"Database error: {e}")
     finally:
         if conn:
-            conn.close()
+            release_connection(conn)
 
-def calculate_roi():
-    """Calculates and prints the total ROI based on all settled picks."""
+def rebuild_pick_stats():
+    """Recomputes pick_stats from every settled pick, e.g. to backfill or repair the totals."""
     conn = None
     try:
-        conn = sqlite3.connect(DATABASE_NAME)
+        conn = get_connection(DATABASE_NAME)
         cursor = conn.cursor()
-
-        stake = 100
-
-        # Now we pull the odds directly from the picks table
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("DELETE FROM pick_stats")
         cursor.execute('''
+            INSERT INTO pick_stats (sport, market, confidence_level, bets, wins, losses, pushes, staked, profit)
             SELECT
-                p.result,
-                p.pick_odds
-            FROM nfl_picks AS p
-            WHERE p.result IS NOT NULL AND p.result != 'PUSH'
-        ''')
-        picks = cursor.fetchall()
+                ?,
+                COALESCE(market, ''),
+                COALESCE(confidence_level, ''),
+                SUM(result IN ('WIN', 'LOSS')),
+                SUM(result = 'WIN'),
+                SUM(result = 'LOSS'),
+                SUM(result = 'PUSH'),
+                SUM(CASE WHEN result IN ('WIN', 'LOSS') AND odds IS NOT NULL THEN ? ELSE 0 END),
+                SUM(CASE
+                    WHEN odds IS NULL THEN 0
+                    WHEN result = 'WIN' THEN (odds - 1) * ?
+                    WHEN result = 'LOSS' THEN -?
+                    ELSE 0
+                END)
+            FROM nfl_picks
+            WHERE result IS NOT NULL
+            GROUP BY 2, 3
+        ''', (PICKS_SPORT, STAKE, STAKE, STAKE))
+        groups = cursor.rowcount
+        conn.commit()
+        print(f"Rebuilt pick stats: {groups} market/confidence groups.")
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+    finally:
+        if conn:
+            release_connection(conn)
+
+def get_pick_stats(group_by=(), conn=None):
+    """Reads performance totals from pick_stats, optionally grouped by sport/market/confidence_level.
 
-        if not picks:
+    Returns a list of dicts with bets, wins, losses, pushes, staked, profit, plus
+    derived roi (%), hit_rate (%) and units_won. The table holds one row per
+    group, so this never touches nfl_picks. conn defaults to this thread's shared connection.
+    """
+    columns = [c for c in group_by if c in ("sport", "market", "confidence_level")]
+    select = ", ".join(columns + [
+        "SUM(bets)", "SUM(wins)", "SUM(losses)", "SUM(pushes)", "SUM(staked)", "SUM(profit)",
+    ])
+    sql = f"SELECT {select} FROM pick_stats"
+    if columns:
+        sql += f" GROUP BY {', '.join(columns)} ORDER BY {', '.join(columns)}"
+    conn = conn or get_connection(DATABASE_NAME)
+    stats = []
+    for row in conn.execute(sql):
+        keys = dict(zip(columns, row))
+        bets, wins, losses, pushes, staked, profit = (value or 0 for value in row[len(columns):])
+        stats.append(dict(
+            keys,
+            bets=bets, wins=wins, losses=losses, pushes=pushes, staked=staked, profit=profit,
+            roi=(profit / staked * 100) if staked else None,
+            hit_rate=(wins / bets * 100) if bets else None,
+            units_won=profit / STAKE,
+        ))
+    return stats
+
+def calculate_roi():
+    """Prints ROI, hit rate and units won from the incrementally maintained pick_stats."""
+    try:
+        totals = get_pick_stats()[0]
+        if not totals["bets"]:
             print("\nNo completed picks to calculate ROI yet.")
             return
 
-        total_profit = 0
-        total_staked = 0
-
-        for result, pick_odds in picks:
-            total_staked += stake
-            if result == "WIN":
-                profit = (pick_odds - 1) * stake
-                total_profit += profit
-
-        if total_staked > 0:
-            roi = (total_profit / total_staked) * 100
-            print(f"\n--- Performance Metrics ---")
-            print(f"Total Bets: {len(picks)}")
-            print(f"Total Staked: ${total_staked:,.2f}")
-            print(f"Total Profit: ${total_profit:,.2f}")
-            print(f"**Return on Investment (ROI): {roi:.2f}%**")
+        print(f"\n--- Performance Metrics ---")
+        print(f"Total Bets: {totals['bets']} ({totals['wins']}W-{totals['losses']}L-{totals['pushes']}P)")
+        print(f"Hit Rate: {totals['hit_rate']:.1f}%")
+        print(f"Total Staked: ${totals['staked']:,.2f}")
+        print(f"Total Profit: ${totals['profit']:,.2f} ({totals['units_won']:+.2f} units)")
+        if totals["roi"] is not None:
+            print(f"**Return on Investment (ROI): {totals['roi']:.2f}%**")
         else:
-            print("\nCannot calculate ROI. Total staked is zero.")
+            print("Cannot calculate ROI. Total staked is zero.")
+
+        for label, column in (("Market", "market"), ("Confidence", "confidence_level")):
+            print(f"\nBy {label}:")
+            for group in get_pick_stats(group_by=(column,)):
+                roi = "N/A" if group["roi"] is None else f"{group['roi']:.2f}%"
+                hit_rate = "N/A" if group["hit_rate"] is None else f"{group['hit_rate']:.1f}%"
+                print(f"  {group[column] or '(none)'}: {group['bets']} bets, hit rate {hit_rate}, "
+                      f"{group['units_won']:+.2f} units, ROI {roi}")
 
     except sqlite3.Error as e:
         print(f"Database error during ROI calculation: {e}")
-    finally:
-        if conn:
-            conn.close()
 
 def main_menu():
-    """Presents a menu to the user for interacting with the report."""
-    while True:
-        picks_data = display_pick_report()
-        if not picks_data:
-            break
+    """Presents a menu to the user for interacting with the report.
 
+    The full pick report is printed once and then only on request; each pass
+    just reprints the ROI summary from pick_stats.
+    """
+    migrate(DATABASE_NAME, verbose=False)
+    if not has_picks():
+        print("No picks found in the database. Run `generate_picks.py` first!")
+        return
+    display_pick_report()
+    while True:
         calculate_roi()
 
         print("\nOptions:")
         print("1. Enter results for a pick")
-        print("2. Exit")
+        print("2. Show the pick report")
+        print("3. Exit")
         choice = input("Enter your choice: ").strip()
 
         if choice == '1':
@@ -152,9 +280,17 @@ def main_menu():
             except ValueError:
                 print("Invalid ID. Please enter a number.")
         elif choice == '2':
+            display_pick_report()
+        elif choice == '3':
             break
         else:
             print("Invalid choice. Please try again.")
 
 if __name__ == "__main__":
-    main_menu()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Pick report, results entry and ROI.")
+    parser.add_argument("--rebuild-stats", action="store_true", help="recompute pick_stats from all settled picks and exit")
+    args = parser.parse_args()
+    if args.rebuild_stats:
+        rebuild_pick_stats()
+    else:
+        main_menu()
\ No newline at end of file
@@ -0,0 +1,247 @@
+import argparse
+import hashlib
+import json
+import pathlib
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import metrics
+from analyze_picks import get_pick_stats
+from database import BUSY_TIMEOUT_MS
+from migrations import migrate
+from odds_store import SUMMARY_COLUMNS, outcome_summaries
+from sports_config import SPORTS
+
+DATABASE_NAME = "picks.db"
+HOST = "127.0.0.1"
+PORT = 8765
+MAX_CACHED_RESPONSES = 256  # rendered bodies kept per snapshot; distinct query strings beyond this are rendered per request
+
+PICK_COLUMNS = (
+    "id", "game_id", "commence_time", "away_team", "home_team", "market", "pick", "odds",
+    "confidence_level", "rationale", "result",
+)
+
+def open_read_only(path=None):
+    """Opens a read-only connection, so the server can never take the write lock."""
+    uri = pathlib.Path(path or DATABASE_NAME).resolve().as_uri() + "?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    return conn
+
+class Snapshot:
+    """Every fixture, pick, per-book consensus and ROI figure, read in one transaction.
+
+    Built once per database change and shared by all request threads; rendered
+    response bodies and their ETags are memoized on it until it is replaced.
+    """
+
+    def __init__(self, conn, data_version):
+        self.data_version = data_version
+        self.built_at = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        self.responses = {}
+        conn.execute("BEGIN")  # one read transaction, so every table is seen at the same point
+        try:
+            self.fixtures = []
+            for cfg in SPORTS.values():
+                for league in cfg["leagues"]:
+                    cursor = conn.execute(f"SELECT {', '.join(cfg['fields'])} FROM {league['table']}")
+                    for row in cursor:
+                        self.fixtures.append(dict(zip(cfg["fields"], row), league=league["name"]))
+            self.fixtures.sort(key=lambda fixture: (fixture["commence_time"] or "", fixture["id"]))
+            self.fixtures_by_id = {fixture["id"]: fixture for fixture in self.fixtures}
+
+            self.picks = [dict(zip(PICK_COLUMNS, row)) for row in conn.execute('''
+                SELECT p.id, p.game_id, f.commence_time, f.away_team, f.home_team, p.market, p.pick, p.odds,
+                       p.confidence_level, p.rationale, p.result
+                FROM nfl_picks AS p
+                LEFT JOIN nfl_fixtures AS f ON f.id = p.game_id
+                ORDER BY p.id DESC
+            ''')]
+            self.picks_by_game = {}
+            for pick in self.picks:
+                self.picks_by_game.setdefault(pick["game_id"], []).append(pick)
+
+            self.consensus = {}
+            for row in outcome_summaries(conn, list(self.fixtures_by_id)):
+                self.consensus.setdefault(row[0], []).append(dict(zip(SUMMARY_COLUMNS[1:], row[1:])))
+
+            self.roi = {
+                "totals": get_pick_stats(conn=conn)[0],
+                "by_market": get_pick_stats(("market",), conn),
+                "by_confidence": get_pick_stats(("confidence_level",), conn),
+            }
+        finally:
+            conn.rollback()
+
+class SnapshotCache:
+    """Hands out the current Snapshot, rebuilding it only after another connection commits.
+
+    PRAGMA data_version on the server's own connection changes whenever any other
+    connection commits, so checking it costs one pragma per request instead of a re-read.
+    """
+
+    def __init__(self, path=None):
+        self.conn = open_read_only(path)
+        self.lock = threading.Lock()
+        self.snapshot = None
+
+    def current(self):
+        with self.lock:
+            data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+            if self.snapshot is None or self.snapshot.data_version != data_version:
+                with metrics.span("api_snapshot_build"):
+                    self.snapshot = Snapshot(self.conn, data_version)
+                metrics.incr("api_snapshot_builds")
+            return self.snapshot
+
+    def close(self):
+        self.conn.close()
+
+def _filtered(rows, query):
+    """Applies the view commands' since/until/team/limit/offset filters to fixture or pick dicts."""
+    since = query.get("since")
+    until = query.get("until")
+    team = (query.get("team") or "").lower()
+    league = query.get("league")
+    if since:
+        rows = [row for row in rows if (row["commence_time"] or "") >= since]
+    if until:
+        rows = [row for row in rows if row["commence_time"] and row["commence_time"] < until]
+    if team:
+        rows = [row for row in rows if team in (row["home_team"] or "").lower() or team in (row["away_team"] or "").lower()]
+    if league:
+        rows = [row for row in rows if row.get("league", "NFL").lower() == league.lower()]
+    offset = int(query.get("offset") or 0)
+    limit = query.get("limit")
+    return rows[offset:offset + int(limit)] if limit else rows[offset:]
+
+def _fixture_detail(snapshot, fixture_id):
+    fixture = snapshot.fixtures_by_id.get(fixture_id)
+    if fixture is None:
+        return None
+    return dict(fixture, picks=snapshot.picks_by_game.get(fixture_id, []), consensus=snapshot.consensus.get(fixture_id, []))
+
+def _odds(snapshot, fixture_id):
+    fixture = snapshot.fixtures_by_id.get(fixture_id)
+    if fixture is None:
+        return None
+    best = {name: value for name, value in fixture.items() if name not in ("id", "commence_time", "home_team", "away_team", "league")}
+    return {"fixture_id": fixture_id, "best": best, "consensus": snapshot.consensus.get(fixture_id, [])}
+
+def route(snapshot, path, query):
+    """Returns the JSON-ready payload for a GET path, or None if there is no such resource."""
+    parts = [part for part in path.split("/") if part]
+    if not parts:
+        return {
+            "endpoints": ["/fixtures", "/fixtures/<id>", "/odds/<id>", "/picks", "/roi"],
+            "data_version": snapshot.data_version,
+            "built_at": snapshot.built_at,
+        }
+    if parts == ["fixtures"]:
+        return _filtered(snapshot.fixtures, query)
+    if parts == ["picks"]:
+        return _filtered(snapshot.picks, query)
+    if parts == ["roi"]:
+        return snapshot.roi
+    if len(parts) == 2 and parts[0] == "fixtures":
+        return _fixture_detail(snapshot, parts[1])
+    if len(parts) == 2 and parts[0] == "odds":
+        return _odds(snapshot, parts[1])
+    return None
+
+def _etag_matches(header, etag):
+    """True if an If-None-Match header names this ETag (weak comparison, as RFC 9110 asks for GET)."""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "pickatron"
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def _respond(self, send_body):
+        metrics.incr("api_requests")
+        try:
+            snapshot = self.server.cache.current()
+        except sqlite3.Error as e:
+            self._send(503, json.dumps({"error": f"database error: {e}"}).encode(), None, send_body)
+            return
+        rendered = snapshot.responses.get(self.path)
+        if rendered is None:
+            url = urlsplit(self.path)
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            try:
+                payload = route(snapshot, url.path, query)
+            except ValueError:
+                self._send(400, b'{"error":"limit and offset must be integers"}', None, send_body)
+                return
+            if payload is None:
+                self._send(404, b'{"error":"not found"}', None, send_body)
+                return
+            body = json.dumps(payload, separators=(",", ":")).encode()
+            rendered = f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"', body
+            if len(snapshot.responses) < MAX_CACHED_RESPONSES:
+                snapshot.responses[self.path] = rendered
+        etag, body = rendered
+        if _etag_matches(self.headers.get("If-None-Match"), etag):
+            metrics.incr("api_not_modified")
+            self._send(304, b"", etag, send_body=False)
+            return
+        self._send(200, body, etag, send_body)
+
+    def _send(self, status, body, etag, send_body):
+        self.send_response(status)
+        if status != 304:
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")  # always revalidate; a match costs a 304
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+def serve(host=HOST, port=PORT, path=None, verbose=False):
+    """Serves fixtures, odds, picks and ROI as JSON until interrupted."""
+    if migrate(path or DATABASE_NAME, verbose=False) is None:
+        return
+    try:
+        cache = SnapshotCache(path)
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    server.cache = cache
+    server.verbose = verbose
+    print(f"Serving {path or DATABASE_NAME} read-only on http://{host}:{server.server_address[1]}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Server stopped.")
+    finally:
+        server.server_close()
+        cache.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve fixtures, odds, picks and ROI as JSON over local HTTP.")
+    parser.add_argument("--host", default=HOST, help=f"address to bind (default {HOST})")
+    parser.add_argument("--port", type=int, default=PORT, help=f"port to listen on (default {PORT})")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args()
+    serve(args.host, args.port, verbose=args.verbose)
@@ -0,0 +1,384 @@
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager, redirect_stdout
+
+import database
+from migrations import migrate
+from extract_plan import PLANS
+from import_data import _fixture_row, _upsert_fixtures
+from sports_config import SPORTS
+
+def synthetic_events(n_events, n_books, soccer=False, seed=0, markets=None):
+    """Builds an odds API payload shaped like /v4/sports/{sport}/odds for benchmarking.
+
+    markets limits each bookmaker to a subset of market keys (e.g. ["h2h", "totals"]).
+    """
+    rng = random.Random(seed)
+    markets_filter = set(markets or ())
+    events = []
+    for i in range(n_events):
+        home, away = f"Home Team {i}", f"Away Team {i}"
+        bookmakers = []
+        for b in range(n_books):
+            def price():
+                return round(rng.uniform(1.2, 6.0), 2)
+            if soccer:
+                line = rng.choice([1.5, 2.5, 3.5])
+                markets = [
+                    {"key": "h2h", "outcomes": [
+                        {"name": home, "price": price()},
+                        {"name": away, "price": price()},
+                        {"name": "Draw", "price": price()},
+                    ]},
+                    {"key": "totals", "outcomes": [
+                        {"name": "Over", "price": price(), "point": line},
+                        {"name": "Under", "price": price(), "point": line},
+                    ]},
+                    {"key": "btts", "outcomes": [
+                        {"name": "Yes", "price": price()},
+                        {"name": "No", "price": price()},
+                    ]},
+                ]
+            else:
+                spread = rng.choice([-7.5, -3.5, -2.5, 1.5, 3.5, 6.5])
+                total = rng.choice([41.5, 44.5, 47.5])
+                markets = [
+                    {"key": "h2h", "outcomes": [
+                        {"name": home, "price": price()},
+                        {"name": away, "price": price()},
+                    ]},
+                    {"key": "spreads", "outcomes": [
+                        {"name": home, "price": price(), "point": spread},
+                        {"name": away, "price": price(), "point": -spread},
+                    ]},
+                    {"key": "totals", "outcomes": [
+                        {"name": "Over", "price": price(), "point": total},
+                        {"name": "Under", "price": price(), "point": total},
+                    ]},
+                ]
+            if markets_filter:
+                markets = [market for market in markets if market["key"] in markets_filter]
+            bookmakers.append({"key": f"book{b}", "title": f"Book {b}", "markets": markets})
+        events.append({
+            "id": f"{'epl' if soccer else 'nfl'}{i:06d}",
+            "commence_time": f"2026-10-{18 + i % 10:02d}T{12 + i % 8:02d}:00:00Z",
+            "home_team": home,
+            "away_team": away,
+            "bookmakers": bookmakers,
+        })
+    return events
+
+def _best_of(repeat, func, *args):
+    """Returns (best wall time in seconds, result) over `repeat` runs."""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def _record(results, stage, label, size, seconds):
+    """Appends one measurement to results (when collecting) in the --json layout."""
+    if results is not None:
+        results.append({"stage": stage, "label": label, "size": size, "seconds": seconds})
+
+def bench_extraction(sizes, n_books, repeat, results=None, markets=None):
+    """Times each sport's compiled extraction plan (PLANS[...].extract) over synthetic payloads."""
+    engines = [
+        ("NFL", False, PLANS["American Football"].extract),
+        ("EPL", True, PLANS["Soccer"].extract),
+    ]
+    print(f"--- Extraction ({n_books} bookmakers per event) ---")
+    for label, soccer, extract in engines:
+        for n_events in sizes:
+            events = synthetic_events(n_events, n_books, soccer=soccer, markets=markets)
+
+            def run():
+                return [extract(e.get('bookmakers', []), e['home_team'], e['away_team']) for e in events]
+
+            seconds, _ = _best_of(repeat, run)
+            _record(results, "extract", f"{label} plan", n_events, seconds)
+            print(f"  {label} {n_events:>6} events: {seconds * 1000:8.1f} ms ({seconds / n_events * 1e6:7.2f} us/event)")
+
+def _league_payloads(n_leagues, n_events, n_books, markets=None):
+    """Serializes one synthetic odds payload per league, cycling through the configured leagues.
+
+    Returns [(sport_name, table, payload bytes)]; event ids are prefixed per league so
+    repeated leagues store distinct fixtures.
+    """
+    import import_data
+
+    jobs = list(import_data._league_jobs())
+    payloads = []
+    for k in range(n_leagues):
+        sport_name, league, _, _ = jobs[k % len(jobs)]
+        events = synthetic_events(n_events, n_books, soccer=sport_name == "Soccer", seed=k, markets=markets)
+        for event in events:
+            event["id"] = f"l{k}-{event['id']}"
+        payloads.append((sport_name, league["table"], json.dumps(events).encode()))
+    return payloads
+
+def _chunks(payload, size):
+    """Splits a payload into fixed-size chunks, as iter_content delivers it."""
+    return (payload[i:i + size] for i in range(0, len(payload), size))
+
+def bench_ingest(sizes, n_books, repeat, results=None, markets=None, n_leagues=2):
+    """Times the import path from serialized payloads: streaming JSON decode alone, then decode -> extract -> store.
+
+    Decoding is read-only and reports the best of `repeat` runs; the full import
+    writes to a fresh database per size, so it is timed once.
+    """
+    import import_data
+
+    print(f"--- Ingest ({n_leagues} leagues, {n_books} bookmakers per event) ---")
+    for n_events in sizes:
+        payloads = _league_payloads(n_leagues, n_events, n_books, markets)
+        total_bytes = sum(len(payload) for _, _, payload in payloads)
+
+        def decode():
+            count = 0
+            for _, _, payload in payloads:
+                for _ in import_data._iter_json_array(_chunks(payload, import_data._STREAM_CHUNK_SIZE)):
+                    count += 1
+            return count
+
+        def import_all(conn):
+            for sport_name, table, payload in payloads:
+                items = [import_data._league_item(sport_name, game)
+                         for game in import_data._iter_json_array(_chunks(payload, import_data._STREAM_CHUNK_SIZE))]
+                rows = [row for row, _ in items]
+                ladders = [ladder for _, league_ladders in items for ladder in league_ladders]
+                import_data._store_league(conn, sport_name, table, rows, ladders=ladders)
+
+        timings = [("decode", _best_of(repeat, decode)[0])]
+        with _temp_database(import_data) as path:
+            timings.append(("decode+store", _time_once(import_all, database.get_connection(path))[0]))
+
+        for label, seconds in timings:
+            _record(results, "ingest", f"{n_leagues} leagues {label}", n_events, seconds)
+            print(f"  {n_events:>6} events x {n_leagues} leagues  {label:<12} {seconds * 1000:9.1f} ms "
+                  f"({total_bytes / seconds / 1e6:7.1f} MB/s)")
+
+@contextmanager
+def _temp_database(*modules):
+    """Points database and the given modules' DATABASE_NAME at a fresh schema in a temp dir."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        patched = [database, *modules]
+        saved = [module.DATABASE_NAME for module in patched]
+        for module in patched:
+            module.DATABASE_NAME = path
+        try:
+            migrate(path, verbose=False)
+            yield path
+        finally:
+            database.close_connections()
+            for module, name in zip(patched, saved):
+                module.DATABASE_NAME = name
+
+def _load_fixtures(path, sport_name, events):
+    """Upserts synthetic events into the sport's first league table."""
+    table = SPORTS[sport_name]["leagues"][0]["table"]
+    conn = sqlite3.connect(path)
+    try:
+        rows = [_fixture_row(sport_name, event) for event in events]
+        return _upsert_fixtures(conn, table, SPORTS[sport_name]["fields"], rows)
+    finally:
+        conn.close()
+
+def _time_once(func, *args):
+    """Returns (wall time in seconds, result) for one run of a stateful step."""
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+def bench_pipeline(sizes, n_books, repeat, results=None, markets=None):
+    """Times store -> report stages on a fresh database per size.
+
+    Writes (upserts, pick saves, settlement) change state, so they are timed once;
+    read-only steps (views, ROI) report the best of `repeat` runs.
+    """
+    import analyze_picks
+    import generate_picks
+    import import_data
+    import view_data
+    import view_epl
+    import view_picks
+
+    leagues = [("NFL", "American Football", False, view_data.view_fixtures),
+               ("EPL", "Soccer", True, view_epl.view_epl_fixtures)]
+    modules = (analyze_picks, generate_picks, import_data, view_data, view_epl, view_picks)
+    print(f"--- Store and report ({n_books} bookmakers per event) ---")
+    for n_events in sizes:
+        with _temp_database(*modules) as path:
+            conn = database.get_connection(path)
+            timings = []
+            for label, sport_name, soccer, view in leagues:
+                table = SPORTS[sport_name]["leagues"][0]["table"]
+                events = synthetic_events(n_events, n_books, soccer=soccer, markets=markets)
+                rows = [_fixture_row(sport_name, event) for event in events]
+                timings.append(("upsert", f"{label} insert",
+                                _time_once(import_data._store_league, conn, sport_name, table, rows)[0]))
+                timings.append(("upsert", f"{label} update",
+                                _time_once(import_data._store_league, conn, sport_name, table, rows)[0]))
+                for output_format in ("text", "jsonl"):
+                    timings.append(("view", f"{label} {output_format}", _best_of(
+                        repeat, lambda: view(output_format=output_format, out=io.StringIO()))[0]))
+                timings.append(("view", f"{label} team filter", _best_of(
+                    repeat, lambda: view(team="Team 1", limit=50, out=io.StringIO()))[0]))
+
+            fixtures = [row for row in conn.execute("SELECT id, total_points, total_over_odds FROM nfl_fixtures")]
+
+            def save_picks():
+                for game_id, total_points, over_odds in fixtures:
+                    generate_picks._save_pick(conn, game_id, "Total", f"Over {total_points}", "Medium", "Synthetic.", over_odds)
+
+            def settle_picks():
+                rng = random.Random(n_events)
+                cursor = conn.cursor()
+                cursor.execute("BEGIN IMMEDIATE")
+                for (pick_id,) in conn.execute("SELECT id FROM nfl_picks").fetchall():
+                    analyze_picks._set_pick_result(cursor, pick_id, rng.choice(["WIN", "LOSS", "PUSH"]))
+                conn.commit()
+
+            with redirect_stdout(io.StringIO()):
+                timings.append(("picks", "NFL save", _time_once(save_picks)[0]))
+                timings.append(("picks", "NFL settle", _time_once(settle_picks)[0]))
+                timings.append(("roi", "calculate_roi", _best_of(repeat, analyze_picks.calculate_roi)[0]))
+                timings.append(("roi", "rebuild_pick_stats", _best_of(repeat, analyze_picks.rebuild_pick_stats)[0]))
+                timings.append(("view", "picks text", _best_of(
+                    repeat, lambda: view_picks.view_picks(out=io.StringIO()))[0]))
+
+        for stage, label, seconds in timings:
+            _record(results, stage, label, n_events, seconds)
+            print(f"  {n_events:>6} events  {stage:<7} {label:<22} {seconds * 1000:9.2f} ms "
+                  f"({seconds / n_events * 1e6:8.2f} us/event)")
+
+# Measurements faster than this are too noisy to compare against a baseline
+MIN_COMPARABLE_SECONDS = 0.005
+
+def compare_to_baseline(results, baseline, max_regression):
+    """Returns [(stage, label, size, old, new)] for measurements slower than the baseline by more than max_regression."""
+    previous = {(r["stage"], r["label"], r["size"]): r["seconds"] for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        old = previous.get((r["stage"], r["label"], r["size"]))
+        if old is None or max(old, r["seconds"]) < MIN_COMPARABLE_SECONDS:
+            continue
+        if r["seconds"] > old * (1 + max_regression):
+            regressions.append((r["stage"], r["label"], r["size"], old, r["seconds"]))
+    return regressions
+
+def bench_pick_generation(n_fixtures, latency, concurrency_levels):
+    """Measures batch pick throughput against the offline stub model."""
+    import generate_picks
+
+    print(f"--- Pick generation ({n_fixtures} fixtures, stub latency {latency * 1000:.0f} ms) ---")
+    for concurrency in concurrency_levels:
+        with _temp_database(generate_picks) as path:
+            _load_fixtures(path, "American Football", synthetic_events(n_fixtures, 3))
+            start = time.perf_counter()
+            with redirect_stdout(io.StringIO()):
+                saved, failed = generate_picks.generate_picks_batch(
+                    generate_picks.StubModel(latency=latency), concurrency=concurrency, timeout=10, retries=0,
+                    use_cache=False,
+                )
+            elapsed = time.perf_counter() - start
+        print(f"  concurrency {concurrency:>3}: {saved} picks in {elapsed:6.2f} s ({saved / elapsed:7.1f} picks/s, {failed} failed)")
+
+def bench_startup(repeat):
+    """Measures process start-up for CLI commands, the way cron invokes them."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    cli = os.path.join(here, "pickatron.py")
+    commands = [
+        ("interpreter only", ["-c", "pass"]),
+        ("pickatron --help", [cli, "--help"]),
+        ("pickatron view picks", [cli, "view", "picks"]),
+        ("pickatron view nfl", [cli, "view", "nfl"]),
+        ("import import_data", ["-c", "import import_data"]),
+        ("import generate_picks", ["-c", "import generate_picks"]),
+        ("import google.generativeai", ["-c", "import google.generativeai"]),
+    ]
+    print(f"--- Start-up time (median of {repeat} runs) ---")
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, PYTHONPATH=here, PYTHONWARNINGS="ignore")
+        subprocess.run([sys.executable, cli, "init"], cwd=tmp, env=env, capture_output=True, check=True)
+        for label, command in commands:
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                completed = subprocess.run([sys.executable, *command], cwd=tmp, env=env, capture_output=True)
+                timings.append(time.perf_counter() - start)
+            status = "" if completed.returncode == 0 else f"  (exit {completed.returncode})"
+            print(f"  {label:<28} {statistics.median(timings) * 1000:8.1f} ms{status}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pickatron performance benchmarks.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000], help="events per league")
+    parser.add_argument("--books", type=int, default=30, help="bookmakers per event")
+    parser.add_argument("--markets", nargs="+", help="market keys each bookmaker offers (default: all for the sport)")
+    parser.add_argument("--stages", nargs="+", choices=["ingest", "extract", "pipeline"],
+                        default=["ingest", "extract", "pipeline"], help="which suites to run")
+    parser.add_argument("--leagues", type=int, default=2,
+                        help="league payloads decoded and stored per size by the ingest stage (default 2)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement (best is reported)")
+    parser.add_argument("--picks", type=int, default=0, help="also benchmark batch pick generation for N fixtures")
+    parser.add_argument("--startup", action="store_true", help="also benchmark CLI start-up and import times")
+    parser.add_argument("--pick-latency", type=float, default=0.05, help="simulated seconds per stub model call")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="results file from an earlier --json run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.25,
+                        help="fail if a measurement is this fraction slower than the baseline (default 0.25)")
+    args = parser.parse_args()
+
+    results = []
+    if "ingest" in args.stages:
+        bench_ingest(args.sizes, args.books, args.repeat, results, args.markets, args.leagues)
+    if "extract" in args.stages:
+        bench_extraction(args.sizes, args.books, args.repeat, results, args.markets)
+    if "pipeline" in args.stages:
+        bench_pipeline(args.sizes, args.books, args.repeat, results, args.markets)
+    if args.picks:
+        bench_pick_generation(args.picks, args.pick_latency, [1, 4, 16])
+    if args.startup:
+        bench_startup(max(args.repeat, 5))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "python": platform.python_version(),
+                "sqlite": sqlite3.sqlite_version,
+                "books": args.books,
+                "markets": args.markets,
+                "leagues": args.leagues,
+                "repeat": args.repeat,
+                "results": results,
+            }, f, indent=2)
+        print(f"Wrote {len(results)} results to {args.json}.")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if (baseline.get("books"), baseline.get("markets"), baseline.get("leagues", args.leagues)) != (
+                args.books, args.markets, args.leagues):
+            print(f"Warning: baseline used {baseline.get('books')} books, markets {baseline.get('markets')} and "
+                  f"{baseline.get('leagues')} leagues; results are not like for like.")
+        regressions = compare_to_baseline(results, baseline, args.max_regression)
+        for stage, label, size, old, new in regressions:
+            print(f"REGRESSION {stage} {label} @ {size}: {old * 1000:.2f} ms -> {new * 1000:.2f} ms "
+                  f"({(new / old - 1) * 100:+.0f}%)")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.max_regression:.0%} against {args.baseline}.")
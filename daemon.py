@@ -0,0 +1,470 @@
+import argparse
+import asyncio
+import signal
+import sqlite3
+import threading
+import time
+import concurrent.futures
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import requests
+
+import generate_picks
+import import_data
+import metrics
+import scheduler
+from database import close_connections, get_connection, release_connection
+from migrations import migrate
+from quota import QuotaManager
+
+EVENT_QUEUE_SIZE = 256  # parsed events waiting for extraction
+ITEM_QUEUE_SIZE = 256  # extracted rows waiting for the writer
+STORE_BATCH_SIZE = 200  # rows per write transaction when a league is larger
+REPORT_INTERVAL = 30.0  # seconds between stage reports
+PUT_POLL = 0.5  # seconds a fetch thread waits on a full events queue before re-checking for shutdown
+
+_STOP = object()  # end of the stream, passed from stage to stage
+_END = object()  # end of one league's events; the store stage flushes that league
+
+class StageStats:
+    """Items handled and busy time for one stage, plus the queue that feeds it."""
+
+    def __init__(self, name, queue=None):
+        self.name = name
+        self.queue = queue
+        self.items = 0
+        self.busy = 0.0
+        self._reported = 0
+
+    def done(self, count, seconds):
+        self.items += count
+        self.busy += seconds
+        metrics.incr(f"pipeline_{self.name}_items", count)
+
+    def report(self, interval, total=False):
+        """One report fragment: items, throughput since the last report (or overall), and queue depth."""
+        rate = ((self.items if total else self.items - self._reported) / interval) if interval > 0 else 0.0
+        self._reported = self.items
+        text = f"{self.name} {self.items} ({rate:.1f}/s, busy {self.busy:.1f}s)"
+        if self.queue is not None:
+            metrics.set_gauge(f"pipeline_{self.name}_queue_depth", self.queue.qsize())
+            text += f" q {self.queue.qsize()}/{self.queue.maxsize}"
+        return text
+
+class Pipeline:
+    """fetch -> extract -> store -> generate, as asyncio stages joined by bounded queues.
+
+    Fetching streams each league's payload on a worker thread, handing events to
+    the loop one at a time; a full queue blocks that thread, so a slow writer or
+    model slows the download instead of buffering it. Every database call runs on
+    one writer thread. Fixtures whose odds changed (with no pick yet, or only
+    one made before the move) are queued for the model; while the model lags,
+    the store stage waits on that queue and the backpressure reaches the fetcher.
+    """
+
+    def __init__(self, session, pick_model, concurrency=4, timeout=60.0, retries=2, backoff=1.0,
+                 budget=None, book_odds=False, once=False, report_interval=REPORT_INTERVAL):
+        self.session = session
+        self.pick_model = pick_model
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.budget = budget
+        self.book_odds = book_odds
+        self.once = once
+        self.report_interval = report_interval
+        # Queues, the stop event and the stats that watch them are made in run():
+        # before Python 3.10 they bind to the loop current at creation, not asyncio.run's
+        self.events = None
+        self.items = None
+        self.fixtures = None
+        self.stats = {}
+        self.stopping = None
+        self.saved = 0
+        self.failed = 0
+        self.in_flight = 0
+        self._slots = threading.BoundedSemaphore(concurrency)  # held by each model call until it returns
+        self.queued_ids = set()  # fixtures waiting for or being given a pick
+        self.state = {}
+        self._halt = threading.Event()  # tells a fetch thread to stop reading mid-league
+        self._db = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pickatron-db")
+        self.quota = None
+        self._seeding = None
+
+    async def _on_db(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._db, func, *args)
+
+    def stop(self):
+        if self.stopping is None:
+            return
+        if not self.stopping.is_set():
+            print("Stopping: finishing in-flight work...")
+        self.stopping.set()
+        self._halt.set()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        self.events = asyncio.Queue(EVENT_QUEUE_SIZE)
+        self.items = asyncio.Queue(ITEM_QUEUE_SIZE)
+        self.fixtures = asyncio.Queue(self.concurrency * 2)
+        self.stopping = asyncio.Event()
+        self.stats = {
+            "fetch": StageStats("fetch"),
+            "extract": StageStats("extract", self.events),
+            "store": StageStats("store", self.items),
+            "generate": StageStats("generate", self.fixtures),
+        }
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError):
+                pass  # not on the main thread or platform; KeyboardInterrupt still stops the loop
+        self.quota = await self._on_db(QuotaManager, self.budget, import_data.DATABASE_NAME)
+        started = time.perf_counter()
+        self._seeding = asyncio.create_task(self._seed_pending())
+        stages = [
+            asyncio.create_task(self._fetch_stage()),
+            asyncio.create_task(self._extract_stage()),
+            asyncio.create_task(self._store_stage()),
+        ] + [asyncio.create_task(self._generate_worker()) for _ in range(self.concurrency)]
+        reporter = asyncio.create_task(self._report_loop())
+        try:
+            await asyncio.gather(*stages)
+        finally:
+            # Release any fetch thread waiting on the events queue before its consumer goes away
+            self._halt.set()
+            for task in stages + [self._seeding]:
+                task.cancel()
+            reporter.cancel()
+            await asyncio.gather(*stages, self._seeding, reporter, return_exceptions=True)
+            await self._on_db(self._save_quota)
+            await self._on_db(close_connections)
+            self._db.shutdown(wait=True)
+            self._report(time.perf_counter() - started, final=True)
+
+    # --- fetch ---------------------------------------------------------------------
+
+    def _plan_round(self, now):
+        """Runs on the writer thread. Returns [(sport_name, league, regions, markets, filters, due ids)] due now.
+
+        Same cadence as the scheduler: a full pull per league every DISCOVERY_INTERVAL,
+        otherwise only the fixtures whose refresh interval has elapsed.
+        """
+        conn = get_connection(import_data.DATABASE_NAME)
+        try:
+            last_fetched = self.state.setdefault("last_fetched", {})
+            last_discovery = self.state.setdefault("last_discovery", {})
+            jobs = []
+            for sport_name, league, regions, markets in self.quota.plan(import_data._league_jobs()):
+                discovered = last_discovery.get(league["name"])
+                if discovered is None or now - discovered >= scheduler.DISCOVERY_INTERVAL:
+                    jobs.append((sport_name, league, regions, markets, None, None))
+                    continue
+                fixtures = scheduler._upcoming_fixtures(conn, league["table"], now)
+                filters, due_ids, _ = scheduler.plan_league_request(fixtures, last_fetched, now)
+                if filters:
+                    jobs.append((sport_name, league, regions, markets, filters, due_ids))
+            return jobs
+        finally:
+            release_connection(conn)
+
+    def _next_wake(self, now, failed):
+        """Runs on the writer thread once a round is stored. Returns when the next round is due."""
+        conn = get_connection(import_data.DATABASE_NAME)
+        try:
+            last_fetched = self.state["last_fetched"]
+            last_discovery = self.state["last_discovery"]
+            wake = now + (scheduler.RETRY_DELAY if failed else scheduler.DISCOVERY_INTERVAL)
+            upcoming_ids = set()
+            for _, league, _, _ in import_data._league_jobs():
+                if league["name"] in last_discovery:
+                    wake = min(wake, last_discovery[league["name"]] + scheduler.DISCOVERY_INTERVAL)
+                fixtures = scheduler._upcoming_fixtures(conn, league["table"], now)
+                upcoming_ids.update(fixture_id for fixture_id, _ in fixtures)
+                _, _, next_due = scheduler.plan_league_request(fixtures, last_fetched, now)
+                if next_due is not None:
+                    wake = min(wake, next_due)
+            for fixture_id in [f for f in last_fetched if f not in upcoming_ids]:
+                del last_fetched[fixture_id]
+            return max(wake, now + scheduler.MIN_SLEEP)
+        finally:
+            release_connection(conn)
+
+    def _stream_into(self, loop, sport_name, league, regions, markets, filters):
+        """Fetch thread: streams one league, blocking on the events queue. Returns the fetched ids."""
+        ids = []
+        for game in import_data._stream_league(self.session, sport_name, league, regions, markets, filters, self.quota):
+            if self._halt.is_set() or not self._put_event(loop, (sport_name, league, game)):
+                break
+            ids.append(game["id"])
+        return ids
+
+    def _put_event(self, loop, event):
+        """Fetch thread: waits for room on the events queue. Returns False if the daemon halts first.
+
+        The wait is bounded so a thread whose consumer was cancelled notices the
+        halt instead of blocking shutdown forever.
+        """
+        future = asyncio.run_coroutine_threadsafe(self.events.put(event), loop)
+        while True:
+            try:
+                future.result(timeout=PUT_POLL)
+                return True
+            except concurrent.futures.TimeoutError:
+                if self._halt.is_set():
+                    future.cancel()
+                    return False
+            except concurrent.futures.CancelledError:
+                return False
+
+    async def _fetch_stage(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while not self.stopping.is_set():
+                now = datetime.now(timezone.utc)
+                failed = False
+                for sport_name, league, regions, markets, filters, due_ids in await self._on_db(self._plan_round, now):
+                    if self.stopping.is_set():
+                        break
+                    name = league["name"]
+                    print(f"{name}: {'full refresh' if filters is None else f'refreshing {len(due_ids)} fixtures due'}")
+                    start = time.perf_counter()
+                    try:
+                        fetched = await asyncio.to_thread(
+                            self._stream_into, loop, sport_name, league, regions, markets, filters
+                        )
+                    except requests.exceptions.RequestException as e:
+                        print(f"{name}: error fetching data from API: {e}")
+                        failed = True
+                        continue
+                    except (KeyError, ValueError) as e:
+                        print(f"{name}: invalid API response: {e}")
+                        failed = True
+                        continue
+                    finally:
+                        # Flush whatever arrived, even from a league that failed part way
+                        await self.events.put((sport_name, league, _END))
+                    self.stats["fetch"].done(len(fetched), time.perf_counter() - start)
+                    # Mark every requested id, including any the API no longer lists
+                    for fixture_id in (fetched if filters is None else due_ids):
+                        self.state["last_fetched"][fixture_id] = now
+                    if filters is None:
+                        self.state["last_discovery"][name] = now
+
+                # Let the round reach the database before planning the next one
+                await self.events.join()
+                await self.items.join()
+                await self._on_db(self._save_quota)
+                if self.once or self.stopping.is_set():
+                    break
+                wake = await self._on_db(self._next_wake, now, failed)
+                print(f"Next refresh at {scheduler._format_time(wake)}.")
+                delay = (wake - datetime.now(timezone.utc)).total_seconds()
+                try:
+                    await asyncio.wait_for(self.stopping.wait(), timeout=max(delay, 0))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            await self.events.put(_STOP)
+
+    # --- extract -------------------------------------------------------------------
+
+    async def _extract_stage(self):
+        while True:
+            message = await self.events.get()
+            try:
+                if message is _STOP:
+                    await self.items.put(_STOP)
+                    return
+                sport_name, league, game = message
+                if game is _END:
+                    await self.items.put(message)
+                    continue
+                start = time.perf_counter()
+                try:
+                    item = import_data._league_item(sport_name, game, self.book_odds)
+                except (KeyError, TypeError, ValueError) as e:
+                    print(f"  {league['name']}: skipping malformed event: {e}")
+                    continue
+                self.stats["extract"].done(1, time.perf_counter() - start)
+                await self.items.put((sport_name, league, item))
+            finally:
+                self.events.task_done()
+
+    # --- store ---------------------------------------------------------------------
+
+    def _write(self, sport_name, league, items):
+        """Writer thread: stores one batch. Returns the fixtures that need a pick, or None on error."""
+        conn = get_connection(import_data.DATABASE_NAME)
+        try:
+            rows = [row for row, _ in items]
+            ladders = [ladder for _, event_ladders in items for ladder in event_ladders]
+            changed = []
+            inserted, updated, snapshots = import_data._store_league(
+                conn, sport_name, league["table"], rows, self.book_odds, ladders, changed
+            )
+            print(f"  {league['name']}: {len(rows)} fixtures. Inserted: {inserted}, Updated: {updated}, Odds snapshots: {snapshots}.")
+        except sqlite3.Error as e:
+            print(f"  {league['name']}: database error: {e}")
+            return None
+        finally:
+            release_connection(conn)
+        # Picks are generated for NFL fixtures only
+        if league["table"] != "nfl_fixtures" or not changed:
+            return []
+        return generate_picks.get_pending_fixtures_from_db(ids=changed, refresh=True)
+
+    async def _flush(self, sport_name, league, items):
+        start = time.perf_counter()
+        pending = await self._on_db(self._write, sport_name, league, items)
+        if pending is None:
+            return
+        self.stats["store"].done(len(items), time.perf_counter() - start)
+        await self._offer(pending)
+
+    async def _offer(self, fixtures):
+        """Queues fixtures for the model, skipping any already queued; waits while the queue is full."""
+        for fixture in fixtures:
+            if self.stopping.is_set():
+                return  # left pending in the database; picked up by the next start
+            if fixture[0] in self.queued_ids:
+                continue
+            self.queued_ids.add(fixture[0])
+            await self.fixtures.put(fixture)
+
+    async def _store_stage(self):
+        pending = {}  # league name -> (sport_name, league, items)
+        while True:
+            message = await self.items.get()
+            try:
+                if message is _STOP:
+                    break
+                sport_name, league, item = message
+                batch = pending.setdefault(league["name"], (sport_name, league, []))[2]
+                if item is not _END:
+                    batch.append(item)
+                if batch and (item is _END or len(batch) >= STORE_BATCH_SIZE):
+                    del pending[league["name"]]
+                    await self._flush(sport_name, league, batch)
+                elif item is _END:
+                    del pending[league["name"]]
+            finally:
+                self.items.task_done()
+        for sport_name, league, batch in pending.values():
+            if batch:
+                await self._flush(sport_name, league, batch)
+        await self._seeding  # the stop markers must follow every queued fixture
+        for _ in range(self.concurrency):
+            await self.fixtures.put(_STOP)
+
+    async def _seed_pending(self):
+        """Queues upcoming NFL fixtures an earlier run left without a pick, or with one made before their odds moved."""
+        fixtures = await self._on_db(generate_picks.get_pending_fixtures_from_db, None, None, True)
+        if fixtures:
+            print(f"{len(fixtures)} upcoming fixtures have no pick or a stale one; queueing them.")
+        await self._offer(fixtures)
+
+    # --- generate ------------------------------------------------------------------
+
+    async def _generate_worker(self):
+        while True:
+            fixture = await self.fixtures.get()
+            if fixture is _STOP:
+                return
+            if self.stopping.is_set():
+                continue  # drain so the store stage is never left blocked
+            game_id = fixture[0]
+            self.in_flight += 1
+            start = time.perf_counter()
+            try:
+                response = await asyncio.to_thread(
+                    generate_picks._generate_with_retries, self.pick_model, generate_picks._build_prompt(fixture),
+                    self.timeout, self.retries, self.backoff, self._slots,
+                )
+                parsed = generate_picks._parse_pick(response.text, fixture) if response and response.text else None
+                if not parsed:
+                    print(f"Failed to parse response for game {game_id}.")
+                    self.failed += 1
+                    continue
+                await self._on_db(generate_picks.save_pick_to_db, game_id, *parsed)
+                self.saved += 1
+            except Exception as e:
+                print(f"An error occurred while generating pick for {game_id}: {e}")
+                self.failed += 1
+            finally:
+                self.in_flight -= 1
+                self.queued_ids.discard(game_id)
+                self.stats["generate"].done(1, time.perf_counter() - start)
+
+    # --- reporting -----------------------------------------------------------------
+
+    def _save_quota(self):
+        if self.quota:
+            try:
+                self.quota.save()
+            except sqlite3.Error as e:
+                print(f"Database error while recording API usage: {e}")
+
+    def _report(self, interval, final=False):
+        parts = [stats.report(interval, total=final) for stats in self.stats.values()]
+        metrics.set_gauge("pipeline_generate_in_flight", self.in_flight)
+        label = "Pipeline stopped" if final else "Pipeline"
+        print(f"{label}: {' | '.join(parts)} | picks saved {self.saved}, failed {self.failed}, in flight {self.in_flight}")
+
+    async def _report_loop(self):
+        last = time.perf_counter()
+        while True:
+            await asyncio.sleep(self.report_interval)
+            now = time.perf_counter()
+            self._report(now - last)
+            last = now
+
+def run_daemon(once=False, budget=None, stub=False, concurrency=4, timeout=60.0, retries=2, use_cache=True,
+               book_odds=False, http_cache=None, cache_ttl=None, report_interval=REPORT_INTERVAL):
+    """Runs the fetch -> extract -> store -> generate pipeline until stopped (or for one round with once=True)."""
+    if not import_data.API_KEY and http_cache != "replay":
+        print("Error: ODDS_API_KEY not found. Please check your .env file.")
+        return
+
+    if migrate(import_data.DATABASE_NAME, verbose=False) is None:
+        return
+    pick_model = generate_picks._with_cache(
+        generate_picks.StubModel() if stub else generate_picks.get_model(), use_cache
+    )
+    session = import_data._open_session(1, http_cache, cache_ttl)
+    pipeline = Pipeline(
+        session, pick_model, concurrency=concurrency, timeout=timeout, retries=retries,
+        budget=budget, book_odds=book_odds, once=once, report_interval=report_interval,
+    )
+    try:
+        asyncio.run(pipeline.run())
+    except KeyboardInterrupt:
+        print("Daemon stopped.")
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+    finally:
+        session.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run fetch, extract, store and pick generation as one long-running pipeline.")
+    parser.add_argument("--once", action="store_true", help="run a single round, drain the pipeline and exit")
+    parser.add_argument("--budget", type=int, help="daily odds API quota budget; trims markets/regions to fit")
+    parser.add_argument("--stub", action="store_true", help="use the offline stub model instead of Gemini")
+    parser.add_argument("--concurrency", type=int, default=4, help="maximum concurrent model calls")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds allowed per model call")
+    parser.add_argument("--retries", type=int, default=2, help="retries per fixture after a failed call")
+    parser.add_argument("--no-cache", action="store_true", help="always call the model, bypassing the response cache")
+    parser.add_argument("--book-odds", action="store_true", help="also store every bookmaker's quotes (odds_store)")
+    parser.add_argument("--http-cache", choices=["cache", "record", "replay"],
+                        help="serve responses from the on-disk cache, record every response, or replay offline")
+    parser.add_argument("--cache-ttl", type=int, help="seconds a cached response stays fresh in cache mode")
+    parser.add_argument("--report-interval", type=float, default=REPORT_INTERVAL,
+                        help="seconds between per-stage queue depth and throughput reports")
+    args = parser.parse_args()
+    run_daemon(
+        once=args.once, budget=args.budget, stub=args.stub, concurrency=args.concurrency, timeout=args.timeout,
+        retries=args.retries, use_cache=not args.no_cache, book_odds=args.book_odds,
+        http_cache=args.http_cache, cache_ttl=args.cache_ttl, report_interval=args.report_interval,
+    )
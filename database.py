@@ -1,144 +1,133 @@
+import json
 import sqlite3
+import threading
 
 DATABASE_NAME = "picks.db"
 
-def create_database():
-    """Ensures the SQLite database file exists."""
-    conn = None
-    try:
-        conn = sqlite3.connect(DATABASE_NAME)
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
-    finally:
-        if conn:
-            conn.close()
+# Applied to every shared connection. WAL lets readers run alongside the importer and
+# pick generator; busy_timeout makes writers wait for the lock instead of failing.
+BUSY_TIMEOUT_MS = 5000
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -20000",  # ~20 MB page cache
+    "PRAGMA temp_store = MEMORY",
+)
+STATEMENT_CACHE_SIZE = 256
 
-def create_fixtures_table():
-    """Creates the nfl_fixtures table if it doesn't exist."""
-    conn = None
-    try:
-        conn = sqlite3.connect(DATABASE_NAME)
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS nfl_fixtures (
-                id TEXT PRIMARY KEY,
-                commence_time TEXT,
-                home_team TEXT,
-                away_team TEXT,
-                moneyline_home_odds REAL,
-                moneyline_away_odds REAL,
-                spread_points REAL,
-                spread_home_odds REAL,
-                spread_away_odds REAL,
-                total_points REAL,
-                total_over_odds REAL,
-                total_under_odds REAL
-            )
-        ''')
-        conn.commit()
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
-    finally:
-        if conn:
-            conn.close()
+_local = threading.local()
 
-def create_picks_table():
-    """Creates the nfl_picks table if it doesn't exist."""
-    conn = None
-    try:
-        conn = sqlite3.connect(DATABASE_NAME)
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS nfl_picks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                game_id TEXT,
-                market TEXT,
-                pick TEXT,
-                odds REAL,
-                confidence_level TEXT,
-                rationale TEXT,
-                FOREIGN KEY (game_id) REFERENCES nfl_fixtures(id)
-            )
-        ''')
-        conn.commit()
-        # In case table existed without 'odds' column, attempt to add it
-        try:
-            cursor.execute("ALTER TABLE nfl_picks ADD COLUMN odds REAL")
-            conn.commit()
-        except sqlite3.Error:
-            # Likely already exists; ignore
-            pass
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
-    finally:
-        if conn:
-            conn.close()
+def tune_connection(conn):
+    """Applies the shared pragmas to a connection."""
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def get_connection(path=None):
+    """Returns this thread's shared connection to `path` (default DATABASE_NAME).
+
+    Connections are opened and tuned once per thread and then reused, so their
+    prepared-statement caches persist across calls. Callers hand them back with
+    release_connection() instead of closing them.
+    """
+    path = path or DATABASE_NAME
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(path)
+    if conn is None:
+        conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, cached_statements=STATEMENT_CACHE_SIZE)
+        connections[path] = tune_connection(conn)
+    return conn
+
+def release_connection(conn):
+    """Finishes a unit of work on a shared connection, rolling back anything left uncommitted."""
+    if conn.in_transaction:
+        conn.rollback()
+
+def close_connections():
+    """Closes every shared connection opened by the calling thread."""
+    for conn in getattr(_local, "connections", {}).values():
+        conn.close()
+    _local.connections = {}
+
+def get_odds_as_of(fixture_id, as_of):
+    """Returns (captured_at, odds) for the latest snapshot at or before as_of, or None.
 
-def create_epl_fixtures_table():
-    """Creates the epl_fixtures table for EPL odds."""
+    as_of is an ISO-8601 UTC string in the same format as captured_at
+    (e.g. "2025-09-21T17:00:00Z"). The lookup is a single primary-key seek.
+    """
     conn = None
     try:
-        conn = sqlite3.connect(DATABASE_NAME)
+        conn = get_connection(DATABASE_NAME)
         cursor = conn.cursor()
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS epl_fixtures (
-                id TEXT PRIMARY KEY,
-                commence_time TEXT,
-                home_team TEXT,
-                away_team TEXT,
-                -- 3-way moneyline
-                home_win_odds REAL,
-                draw_odds REAL,
-                away_win_odds REAL,
-                -- totals (goals)
-                total_goals REAL,
-                over_odds REAL,
-                under_odds REAL,
-                -- BTTS
-                btts_yes_odds REAL,
-                btts_no_odds REAL
-            )
-        ''')
-        conn.commit()
+            SELECT captured_at, odds FROM odds_history
+            WHERE fixture_id = ? AND captured_at <= ?
+            ORDER BY captured_at DESC
+            LIMIT 1
+        ''', (fixture_id, as_of))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        captured_at, odds = row
+        return captured_at, tuple(json.loads(odds))
     except sqlite3.Error as e:
         print(f"Database error: {e}")
+        return None
     finally:
         if conn:
-            conn.close()
-def view_nfl_fixtures():
-    """Reads and prints the contents of the nfl_fixtures table."""
+            release_connection(conn)
+
+def view_nfl_fixtures(limit=None, offset=0, since=None, until=None, team=None, output_format="text", out=None):
+    """Streams the nfl_fixtures table, filtered and paged in SQL."""
+    from report import build_filters, paging, write_rows
+
+    def render(fixture):
+        game_id, commence_time, home_team, away_team = fixture
+        return (
+            f"Game ID: {game_id}\n"
+            f"  Starts: {commence_time}\n"
+            f"  Matchup: {away_team} @ {home_team}\n"
+            + "-" * 25 + "\n"
+        )
+
     conn = None
     try:
-        conn = sqlite3.connect(DATABASE_NAME)
+        conn = get_connection(DATABASE_NAME)
         cursor = conn.cursor()
-        
+
         # Select only the columns needed for this view
-        cursor.execute("SELECT id, commence_time, home_team, away_team FROM nfl_fixtures ORDER BY commence_time")
-        
-        fixtures = cursor.fetchall()
-        
-        if not fixtures:
-            print("No NFL fixtures found in the database.")
-            return
-
-        print("--- Upcoming NFL Fixtures ---")
-        for fixture in fixtures:
-            # The order now matches the SELECT statement
-            game_id, commence_time, home_team, away_team = fixture
-            print(f"Game ID: {game_id}")
-            print(f"  Starts: {commence_time}")
-            print(f"  Matchup: {away_team} @ {home_team}")
-            print("-" * 25)
-            
+        where, params = build_filters("commence_time", ("home_team", "away_team"), since, until, team)
+        limit_clause, limit_params = paging(limit, offset)
+        cursor.execute(
+            f"SELECT id, commence_time, home_team, away_team FROM nfl_fixtures {where} "
+            f"ORDER BY commence_time {limit_clause}",
+            params + limit_params,
+        )
+
+        write_rows(
+            cursor, ("id", "commence_time", "home_team", "away_team"), output_format, render,
+            title="--- Upcoming NFL Fixtures ---",
+            empty_message="No NFL fixtures found in the database.",
+            out=out,
+        )
+
     except sqlite3.Error as e:
         print(f"Database error: {e}")
     finally:
         if conn:
-            conn.close()
+            release_connection(conn)
 
 if __name__ == "__main__":
-    create_database()
-    create_fixtures_table()
-    create_picks_table()
-    create_epl_fixtures_table()
-    view_nfl_fixtures()
+    import argparse
+
+    from migrations import migrate
+    from report import add_view_arguments, view_options
+
+    parser = argparse.ArgumentParser(description="Migrate picks.db and list NFL fixtures.")
+    add_view_arguments(parser)
+    args = parser.parse_args()
+    migrate()
+    view_nfl_fixtures(**view_options(args))
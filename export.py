@@ -0,0 +1,258 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import sqlite3
+from datetime import datetime, timezone
+
+from database import get_connection, release_connection
+from migrations import migrate
+from sports_config import SPORTS
+
+DATABASE_NAME = "picks.db"
+EXPORT_DIR = "export"
+MANIFEST = "_manifest.json"
+FORMATS = {"parquet": "parquet", "arrow": "arrow"}  # format -> file extension
+COMPRESSIONS = ("zstd", "lz4", "none")
+
+# Written as dictionary-encoded strings: few distinct values repeated on every row
+_CATEGORICAL = {"home_team", "away_team", "market", "confidence_level", "result", "bookmaker", "outcome"}
+_TIMESTAMPS = {"commence_time", "captured_at"}
+_STRINGS = {"fixture_id", "game_id", "pick", "rationale"}
+
+def _slug(name):
+    return name.lower().replace(" ", "_")
+
+_TIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"  # how every table stores commence_time and captured_at
+
+def _timestamp(value):
+    """Parses a stored timestamp; a malformed one is written as NULL rather than failing the export."""
+    try:
+        return datetime.strptime(value, _TIME_FORMAT).replace(tzinfo=timezone.utc) if value else None
+    except (TypeError, ValueError):
+        return None
+
+def _arrow_table(pa, columns, rows):
+    """Builds a typed Arrow table from row tuples; odds and points are float64, ids keep their SQLite type."""
+    arrays = []
+    for i, column in enumerate(columns):
+        values = [row[i] for row in rows]
+        if column in _TIMESTAMPS:
+            arrays.append(pa.array([_timestamp(v) for v in values], type=pa.timestamp("s", tz="UTC")))
+        elif column in _CATEGORICAL:
+            arrays.append(pa.array(values, type=pa.string()).dictionary_encode())
+        elif column in _STRINGS or column == "id" and isinstance(values[0], str):
+            arrays.append(pa.array(values, type=pa.string()))
+        elif column == "id":
+            arrays.append(pa.array(values, type=pa.int64()))
+        else:
+            arrays.append(pa.array(values, type=pa.float64()))
+    return pa.Table.from_arrays(arrays, names=list(columns))
+
+def _digest(rows):
+    return hashlib.blake2b(repr(rows).encode(), digest_size=12).hexdigest()
+
+def _league_tables():
+    """Yields (sport_name, league name, fixtures table, odds fields) for every configured league."""
+    for sport_name, cfg in SPORTS.items():
+        for league in cfg["leagues"]:
+            yield sport_name, league["name"], league["table"], cfg["fields"]
+
+def _dataset_names():
+    """Every dataset directory export() may write."""
+    names = {"book_odds", "nfl_picks"}
+    for _, _, table, _ in _league_tables():
+        names.update((table, table.replace("_fixtures", "_odds_history")))
+    return names
+
+def _partitioned(rows, date_of):
+    """Groups rows (already ordered by date) into {date: rows}."""
+    return {date: list(group) for date, group in itertools.groupby(rows, key=date_of)}
+
+def _snapshot_datasets(conn):
+    """Yields (dataset, sport_name, league, columns, {date: rows}) for the tables that are rewritten per partition.
+
+    Fixtures, picks and the latest per-book quotes change in place, so each of
+    their partitions is compared by content and rewritten only when it differs.
+    """
+    for sport_name, league, table, fields in _league_tables():
+        rows = conn.execute(
+            f"SELECT {', '.join(fields)} FROM {table} ORDER BY commence_time, id"
+        ).fetchall()
+        yield table, sport_name, league, fields, _partitioned(rows, lambda row: (row[1] or "unknown")[:10])
+
+        columns = ("fixture_id", "commence_time", "bookmaker", "market", "outcome", "point", "price", "captured_at")
+        rows = conn.execute(f'''
+            SELECT q.fixture_id, f.commence_time, b.key, m.key, o.name, q.point, q.price, q.captured_at
+            FROM {table} AS f
+            JOIN book_odds AS q ON q.fixture_id = f.id
+            JOIN odds_bookmakers AS b ON b.id = q.bookmaker_id
+            JOIN odds_markets AS m ON m.id = q.market_id
+            JOIN odds_outcomes AS o ON o.id = q.outcome_id
+            ORDER BY f.commence_time, q.fixture_id, q.market_id, q.outcome_id, q.point, q.bookmaker_id
+        ''').fetchall()
+        yield "book_odds", sport_name, league, columns, _partitioned(rows, lambda row: (row[1] or "unknown")[:10])
+
+    # Picks are NFL-only; partitioned by the kickoff of the game they are on
+    columns = ("id", "game_id", "commence_time", "market", "pick", "odds", "confidence_level", "rationale", "result")
+    rows = conn.execute('''
+        SELECT p.id, p.game_id, f.commence_time, p.market, p.pick, p.odds, p.confidence_level, p.rationale, p.result
+        FROM nfl_picks AS p
+        LEFT JOIN nfl_fixtures AS f ON f.id = p.game_id
+        ORDER BY f.commence_time, p.id
+    ''').fetchall()
+    yield "nfl_picks", "American Football", "NFL", columns, _partitioned(rows, lambda row: (row[2] or "unknown")[:10])
+
+def _history_datasets(conn, watermarks, watermark_ids):
+    """Yields (dataset, sport_name, league, columns, {date: rows}, newest captured_at, ids at it) of odds_history rows not yet exported.
+
+    odds_history is append-only, so only snapshots captured at or after the
+    dataset's watermark are read; they are partitioned by capture date and
+    appended as new files. captured_at has one-second resolution and a later
+    import can add rows in the watermark's own second, so the watermark is
+    inclusive and the fixture ids already exported at it are skipped.
+    """
+    for sport_name, league, table, fields in _league_tables():
+        dataset = table.replace("_fixtures", "_odds_history")
+        watermark = watermarks.get(dataset, "")
+        seen = watermark_ids.get(dataset)
+        rows = conn.execute(f'''
+            SELECT h.fixture_id, h.captured_at, h.odds
+            FROM odds_history AS h
+            JOIN {table} AS f ON f.id = h.fixture_id
+            WHERE h.captured_at >= ?
+            ORDER BY h.captured_at, h.fixture_id
+        ''', (watermark,)).fetchall()
+        # A manifest from before ids were recorded exported its whole watermark second
+        rows = [row for row in rows if row[1] != watermark or (seen is not None and row[0] not in seen)]
+        if not rows:
+            continue
+        newest = rows[-1][1]
+        newest_ids = [fixture_id for fixture_id, captured_at, _ in rows if captured_at == newest]
+        if newest == watermark:
+            newest_ids = sorted(set(seen) | set(newest_ids))
+        # The snapshot's JSON array is ordered like fields[4:]; spread it into typed columns
+        columns = ("fixture_id", "captured_at") + tuple(fields[4:])
+        rows = [(fixture_id, captured_at, *json.loads(odds)) for fixture_id, captured_at, odds in rows]
+        yield dataset, sport_name, league, columns, _partitioned(rows, lambda row: row[1][:10]), newest, newest_ids
+
+def _partition_dir(out_dir, dataset, sport_name, league, date):
+    # Hive-style key=value directories, so pyarrow.dataset(..., partitioning="hive") recovers the keys
+    return os.path.join(out_dir, dataset, f"sport={_slug(sport_name)}", f"league={league}", f"date={date}")
+
+def _write(pa, table, path, file_format, compression):
+    """Writes one Arrow table atomically as Parquet or an Arrow IPC file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    codec = None if compression == "none" else compression
+    if file_format == "parquet":
+        import pyarrow.parquet as pq
+
+        pq.write_table(table, tmp, compression=codec or "none")
+    else:
+        options = pa.ipc.IpcWriteOptions(compression=codec)
+        with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema, options=options) as writer:
+            writer.write_table(table)
+    os.replace(tmp, path)
+
+def _load_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def export(out_dir=EXPORT_DIR, file_format="parquet", compression="zstd", full=False, path=None):
+    """Exports fixtures, picks, per-book odds and odds history as partitioned, typed, compressed files.
+
+    Layout: <out_dir>/<dataset>/sport=<sport>/league=<league>/date=<YYYY-MM-DD>/part-*.<ext>.
+    A manifest records each partition's content digest and each history dataset's
+    last captured_at, so a re-run rewrites only partitions whose rows changed and
+    appends only new history. full=True (or a change of format/compression) starts over.
+    Returns (partitions written, partitions unchanged), or None on error.
+    """
+    try:
+        import pyarrow as pa
+    except ImportError:
+        print("Export needs pyarrow: pip install pyarrow")
+        return None
+
+    manifest = None if full else _load_manifest(out_dir)
+    if manifest and (manifest.get("format"), manifest.get("compression")) != (file_format, compression):
+        print("Export format or compression changed; rewriting every partition.")
+        manifest = None
+    if manifest is None:
+        for name in _dataset_names():
+            shutil.rmtree(os.path.join(out_dir, name), ignore_errors=True)
+        manifest = {"partitions": {}, "watermarks": {}, "watermark_ids": {}}
+    extension = FORMATS[file_format]
+    old_partitions = manifest["partitions"]
+    partitions = {}
+    written = unchanged = 0
+
+    migrate(path or DATABASE_NAME, verbose=False)
+    conn = None
+    try:
+        conn = get_connection(path or DATABASE_NAME)
+        for dataset, sport_name, league, columns, by_date in _snapshot_datasets(conn):
+            for date, rows in by_date.items():
+                directory = _partition_dir(out_dir, dataset, sport_name, league, date)
+                key = os.path.relpath(directory, out_dir)
+                digest = _digest(rows)
+                partitions[key] = digest
+                if old_partitions.get(key) == digest:
+                    unchanged += 1
+                    continue
+                _write(pa, _arrow_table(pa, columns, rows), os.path.join(directory, f"part-0.{extension}"),
+                       file_format, compression)
+                written += 1
+        # Partitions with no rows left (e.g. a fixture moved to another date) are removed
+        for key in old_partitions.keys() - partitions.keys():
+            shutil.rmtree(os.path.join(out_dir, key), ignore_errors=True)
+
+        watermarks = dict(manifest["watermarks"])
+        watermark_ids = dict(manifest.get("watermark_ids", {}))
+        for dataset, sport_name, league, columns, by_date, newest, newest_ids in _history_datasets(
+            conn, watermarks, watermark_ids
+        ):
+            stamp = newest.replace(':', '').replace('-', '')
+            for date, rows in by_date.items():
+                directory = _partition_dir(out_dir, dataset, sport_name, league, date)
+                # Named by content too: a later run can end on the same second as this one
+                part = f"part-{stamp}-{_digest(rows)[:8]}.{extension}"
+                _write(pa, _arrow_table(pa, columns, rows), os.path.join(directory, part), file_format, compression)
+                written += 1
+            watermarks[dataset] = newest
+            watermark_ids[dataset] = newest_ids
+
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return None
+    finally:
+        if conn:
+            release_connection(conn)
+
+    manifest = {
+        "format": file_format, "compression": compression, "partitions": partitions,
+        "watermarks": watermarks, "watermark_ids": watermark_ids,
+    }
+    os.makedirs(out_dir, exist_ok=True)
+    tmp = os.path.join(out_dir, f"{MANIFEST}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, os.path.join(out_dir, MANIFEST))
+    print(f"Export to {out_dir}: {written} partition files written, {unchanged} unchanged.")
+    return written, unchanged
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export fixtures, picks and odds history to partitioned Parquet/Arrow files.")
+    parser.add_argument("--out", default=EXPORT_DIR, help=f"output directory (default {EXPORT_DIR})")
+    parser.add_argument("--format", dest="file_format", choices=FORMATS, default="parquet",
+                        help="parquet (default) or arrow IPC files, which can be memory-mapped")
+    parser.add_argument("--compression", choices=COMPRESSIONS, default="zstd",
+                        help="column compression; use none with --format arrow for zero-copy reads")
+    parser.add_argument("--full", action="store_true", help="rewrite every partition instead of only changed ones")
+    args = parser.parse_args()
+    export(args.out, args.file_format, args.compression, args.full)
@@ -0,0 +1,164 @@
+from sports_config import SPORTS
+
+# Placeholders in an extract spec that stand for the event's team names
+ROLES = ("$home", "$away")
+
+def _resolve(name, teams, ignore_case):
+    """Maps a spec outcome name (or "$home"/"$away") to the name it matches for an event."""
+    if name in ROLES:
+        name = teams[name]
+        return (name or "").lower() if ignore_case else name
+    return name.lower() if ignore_case else name
+
+class _BestPrice:
+    """Highest price per named outcome across every book, e.g. moneyline or BTTS."""
+
+    def __init__(self, spec, column):
+        self.ignore_case = spec.get("ignore_case", False)
+        # Reversed so that, when two spec names resolve to the same outcome name,
+        # the one declared first wins (the order the old if/elif chains checked)
+        self.pairs = [(name, column[field]) for name, field in reversed(list(spec["outcomes"].items()))]
+        if any(name in ROLES for name, _ in self.pairs):
+            self.static = None
+        else:
+            self.static = {_resolve(name, {}, self.ignore_case): col for name, col in self.pairs}
+
+    def context(self, teams):
+        """Outcome name -> column for one event."""
+        if self.static is not None:
+            return self.static
+        return {_resolve(name, teams, self.ignore_case): col for name, col in self.pairs}
+
+    def run(self, outcomes, values, table):
+        ignore_case = self.ignore_case
+        for o in outcomes:
+            name = o.get("name")
+            if ignore_case:
+                name = (name or "").lower()
+            col = table.get(name)
+            if col is None:
+                continue
+            price = o.get("price")
+            if price is None:
+                continue
+            current = values[col]
+            values[col] = price if current is None or price > current else current
+
+class _BestLine:
+    """(point, first price, second price) for a two-sided line market such as spreads or totals.
+
+    best_spread keeps the best-priced pair within each market, so the last book
+    quoting a complete pair wins. best_total keeps the best-priced pair across
+    every book. Both match the original per-sport extractors exactly.
+    """
+
+    def __init__(self, spec, column):
+        self.ignore_case = spec.get("ignore_case", False)
+        self.sides = spec["sides"]
+        self.point_col, self.first_col, self.second_col = (column[field] for field in spec["fields"])
+        self.run = self._run_spread if spec["rule"] == "best_spread" else self._run_total
+
+    def context(self, teams):
+        """(first side name, second side name) for one event."""
+        return tuple(_resolve(side, teams, self.ignore_case) for side in self.sides)
+
+    def _run_spread(self, outcomes, values, sides):
+        first, second = sides
+        ignore_case = self.ignore_case
+        best = None
+        point = first_price = second_price = None
+        for o in outcomes:
+            name = o.get("name")
+            if ignore_case:
+                name = (name or "").lower()
+            if name == first:
+                first_price = o.get("price")
+                point = o.get("point")
+            elif name == second:
+                second_price = o.get("price")
+            if first_price is not None and second_price is not None and point is not None:
+                score = abs(first_price) + abs(second_price)
+                if best is None or score > best:
+                    best = score
+                    values[self.point_col] = point
+                    values[self.first_col] = first_price
+                    values[self.second_col] = second_price
+                point = first_price = second_price = None
+
+    def _run_total(self, outcomes, values, sides):
+        first, second = sides
+        ignore_case = self.ignore_case
+        point = first_price = second_price = None
+        for o in outcomes:
+            name = o.get("name")
+            if ignore_case:
+                name = (name or "").lower()
+            if name == first:
+                first_price = o.get("price")
+                point = o.get("point")
+            elif name == second:
+                second_price = o.get("price")
+                point = o.get("point") if point is None else point
+            if first_price is not None and second_price is not None and point is not None:
+                if values[self.point_col] is None or (abs(first_price) + abs(second_price)) > (
+                    abs(values[self.first_col] or 0) + abs(values[self.second_col] or 0)
+                ):
+                    values[self.point_col] = point
+                    values[self.first_col] = first_price
+                    values[self.second_col] = second_price
+
+RULES = {
+    "best_price": _BestPrice,
+    "best_spread": _BestLine,
+    "best_total": _BestLine,
+}
+
+class ExtractionPlan:
+    """A sport's "extract" specs compiled into a market key -> rule dispatch table.
+
+    Column positions and fixed outcome names are resolved once here. Per event
+    only the team names are resolved, so the loop over books, markets and
+    outcomes is a dict lookup per market plus direct comparisons per outcome.
+    """
+
+    def __init__(self, fields, specs):
+        self.columns = list(fields[4:])
+        column = {field: i for i, field in enumerate(self.columns)}
+        self.width = len(self.columns)
+        self._rule_list = []
+        self.dispatch = {}  # market key -> (rule.run, index of the rule's per-event context)
+        covered = set()
+        for spec in specs:
+            if spec["rule"] not in RULES:
+                raise ValueError(f"Unknown extraction rule {spec['rule']!r}")
+            targets = spec["fields"] if "fields" in spec else list(spec["outcomes"].values())
+            missing = [field for field in targets if field not in column]
+            if missing:
+                raise ValueError(f"Extraction spec writes unknown fields {missing}")
+            covered.update(targets)
+            rule = RULES[spec["rule"]](spec, column)
+            for key in spec["markets"]:
+                self.dispatch[key] = (rule.run, len(self._rule_list))
+            self._rule_list.append(rule)
+        uncovered = [field for field in self.columns if field not in covered]
+        if uncovered:
+            raise ValueError(f"No extraction spec fills {uncovered}")
+
+    def extract(self, bookmakers, home_team, away_team):
+        """Returns the best prices for one event as a tuple ordered like fields[4:]."""
+        values = [None] * self.width
+        if not bookmakers:
+            return tuple(values)
+        teams = {"$home": home_team, "$away": away_team}
+        contexts = [rule.context(teams) for rule in self._rule_list]
+        dispatch = self.dispatch
+        for bm in bookmakers:
+            for market in bm.get("markets", []):
+                entry = dispatch.get(market.get("key"))
+                if entry is not None:
+                    run, index = entry
+                    run(market.get("outcomes", []), values, contexts[index])
+        return tuple(values)
+
+# One compiled plan per configured sport, reused for every event
+PLANS = {sport_name: ExtractionPlan(cfg["fields"], cfg["extract"]) for sport_name, cfg in SPORTS.items()}
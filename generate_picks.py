@@ -1,16 +1,36 @@
+import argparse
 import os
+import random
+import re
 import sqlite3
-import google.generativeai as genai
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from types import SimpleNamespace
 from dotenv import load_dotenv
+import metrics
+from analyze_picks import _apply_stats_delta, _stats_delta
+from llm_cache import CachedModel, LLMCache
+from database import get_connection, release_connection
 
 # Load API keys from .env file
 load_dotenv()
 GOOGLE_CSE_KEY = os.getenv("GOOGLE_CSE_KEY")
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
-# Set up Gemini API configuration
-genai.configure(api_key=GOOGLE_API_KEY)
-model = genai.GenerativeModel('gemini-1.5-flash')
+MODEL_NAME = 'gemini-1.5-flash'
+_model = None
+
+def get_model():
+    """Returns the Gemini model, importing and configuring the client on first use."""
+    global _model
+    if _model is None:
+        import google.generativeai as genai
+
+        genai.configure(api_key=GOOGLE_API_KEY)
+        _model = genai.GenerativeModel(MODEL_NAME)
+    return _model
 
 DATABASE_NAME = "picks.db"
 
@@ -18,7 +38,7 @@ def get_fixtures_from_db():
     """Fetches a single upcoming NFL fixture with betting odds from the database."""
     conn = None
     try:
-        conn = sqlite3.connect(DATABASE_NAME)
+        conn = get_connection(DATABASE_NAME)
         cursor = conn.cursor()
         cursor.execute('''
             SELECT
@@ -42,74 +62,153 @@ def get_fixtures_from_db():
         return None
     finally:
         if conn:
-            conn.close()
+            release_connection(conn)
 
-def save_pick_to_db(game_id, market, pick, confidence, rationale, odds):
-    """Saves a generated pick into the nfl_picks table, avoiding duplicates."""
+_FIXTURE_COLUMNS = '''
+    f.id,
+    f.home_team,
+    f.away_team,
+    f.moneyline_home_odds,
+    f.moneyline_away_odds,
+    f.spread_points,
+    f.spread_home_odds,
+    f.spread_away_odds,
+    f.total_points,
+    f.total_over_odds,
+    f.total_under_odds
+'''
+
+def get_pending_fixtures_from_db(now=None, ids=None, refresh=False):
+    """Fetches every upcoming NFL fixture that has no pick yet, soonest first.
+
+    ids, if given, limits the lookup to those fixtures. With refresh, fixtures
+    with an open pick made before their latest odds snapshot are included too,
+    so a line move earns a new request (unchanged prompts are answered by the cache).
+    """
+    if now is None:
+        now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    if ids is not None and not ids:
+        return []
+    id_filter = f"AND f.id IN ({', '.join('?' for _ in ids)})" if ids else ""
+    moved_filter = '''
+              OR EXISTS (
+                  SELECT 1 FROM nfl_picks AS p JOIN odds_history_latest AS h ON h.fixture_id = p.game_id
+                  WHERE p.game_id = f.id AND p.result IS NULL AND p.picked_at < h.captured_at
+              )''' if refresh else ""
     conn = None
     try:
-        conn = sqlite3.connect(DATABASE_NAME)
+        conn = get_connection(DATABASE_NAME)
         cursor = conn.cursor()
-        
-        # Check if a pick for this market and game already exists
-        cursor.execute('''
-            SELECT id, odds FROM nfl_picks
-            WHERE game_id = ? AND market = ?
-        ''', (game_id, market))
-        existing = cursor.fetchone()
-        if existing:
-            pick_id, existing_odds = existing
-            if existing_odds is None and odds is not None:
-                cursor.execute('UPDATE nfl_picks SET pick = ?, odds = ?, confidence_level = ?, rationale = ? WHERE id = ?', (pick, odds, confidence, rationale, pick_id))
-                conn.commit()
-                print(f"Updated existing pick with odds for {game_id} ({market}).")
+        cursor.execute(f'''
+            SELECT {_FIXTURE_COLUMNS}
+            FROM nfl_fixtures AS f
+            WHERE f.commence_time >= ?
+              AND (NOT EXISTS (SELECT 1 FROM nfl_picks AS p WHERE p.game_id = f.id){moved_filter})
+              {id_filter}
+            ORDER BY f.commence_time
+        ''', (now, *(ids or ())))
+        return cursor.fetchall()
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return []
+    finally:
+        if conn:
+            release_connection(conn)
+
+def _mark_reviewed(cursor, game_id, picked_at):
+    """Stamps a fixture's open picks as made against its current odds.
+
+    A re-pick may choose a different market; the fixture's other open picks were
+    reconsidered by that same call, so they stop counting as stale too.
+    """
+    cursor.execute(
+        "UPDATE nfl_picks SET picked_at = ? WHERE game_id = ? AND result IS NULL", (picked_at, game_id)
+    )
+
+def _save_pick(conn, game_id, market, pick, confidence, rationale, odds):
+    """Writes one pick on an open connection, avoiding duplicates."""
+    with metrics.span("pick_save"):
+        _write_pick(conn, game_id, market, pick, confidence, rationale, odds)
+
+def _write_pick(conn, game_id, market, pick, confidence, rationale, odds):
+    cursor = conn.cursor()
+    picked_at = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    # Check if a pick for this market and game already exists, and whether the
+    # fixture's odds have moved since it was made (only open picks are redone)
+    cursor.execute('''
+        SELECT p.id, p.odds, p.confidence_level, p.result, p.result IS NULL AND p.picked_at < h.captured_at
+        FROM nfl_picks AS p LEFT JOIN odds_history_latest AS h ON h.fixture_id = p.game_id
+        WHERE p.game_id = ? AND p.market = ?
+    ''', (game_id, market))
+    existing = cursor.fetchone()
+    if existing:
+        pick_id, existing_odds, existing_confidence, result, stale = existing
+        if (existing_odds is None and odds is not None) or stale:
+            cursor.execute(
+                'UPDATE nfl_picks SET pick = ?, odds = ?, confidence_level = ?, rationale = ?, picked_at = ? WHERE id = ?',
+                (pick, odds, confidence, rationale, picked_at, pick_id),
+            )
+            if result is not None:
+                # A settled pick moves its pick_stats contribution in the same transaction
+                _apply_stats_delta(cursor, market, existing_confidence, _stats_delta(result, existing_odds, sign=-1))
+                _apply_stats_delta(cursor, market, confidence, _stats_delta(result, odds))
+            _mark_reviewed(cursor, game_id, picked_at)
+            conn.commit()
+            if stale:
+                print(f"Re-picked {game_id} ({market}) after its odds moved.")
             else:
-                print(f"Pick for {game_id} ({market}) already exists. Skipping.")
-            return
+                print(f"Updated existing pick with odds for {game_id} ({market}).")
+        else:
+            _mark_reviewed(cursor, game_id, picked_at)
+            conn.commit()
+            print(f"Pick for {game_id} ({market}) already exists. Skipping.")
+        return
 
-        cursor.execute('''
-            INSERT INTO nfl_picks (game_id, market, pick, odds, confidence_level, rationale)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (game_id, market, pick, odds, confidence, rationale))
-        conn.commit()
-        print(f"Successfully saved pick for {game_id} ({market}).")
+    cursor.execute('''
+        INSERT INTO nfl_picks (game_id, market, pick, odds, confidence_level, rationale, picked_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (game_id, market, pick, odds, confidence, rationale, picked_at))
+    _mark_reviewed(cursor, game_id, picked_at)
+    conn.commit()
+    metrics.incr("picks_saved")
+    print(f"Successfully saved pick for {game_id} ({market}).")
+
+def save_pick_to_db(game_id, market, pick, confidence, rationale, odds):
+    """Saves a generated pick into the nfl_picks table, avoiding duplicates."""
+    conn = None
+    try:
+        conn = get_connection(DATABASE_NAME)
+        _save_pick(conn, game_id, market, pick, confidence, rationale, odds)
     except sqlite3.Error as e:
         print(f"Database error: {e}")
     finally:
         if conn:
-            conn.close()
+            release_connection(conn)
 
-def generate_and_save_picks():
-    """Main function to generate and save a pick for a single upcoming fixture."""
-    fixture = get_fixtures_from_db()
-    
-    if not fixture:
-        print("No fixtures found. Please run `import_data.py` first.")
-        return
+def _fmt(value):
+    """Safely formats odds that might be missing (None)."""
+    return "N/A" if value is None else f"{value}"
 
-    print("Generating a single pick with Gemini...")
-    
+def _build_prompt(fixture):
+    """Renders the analyst prompt for one fixture row."""
     (game_id, home_team, away_team,
      moneyline_home, moneyline_away,
      spread_points, spread_home, spread_away,
      total_points, total_over, total_under) = fixture
 
-    # Safely format odds that might be missing (None)
-    def fmt(value):
-        return "N/A" if value is None else f"{value}"
-
-    home_spread_points = fmt(spread_points)
-    away_spread_points = fmt(-spread_points) if spread_points is not None else "N/A"
+    home_spread_points = _fmt(spread_points)
+    away_spread_points = _fmt(-spread_points) if spread_points is not None else "N/A"
 
-    prompt = f"""
+    return f"""
         You are an expert sports betting analyst. Your task is to provide a single, confident pick for an NFL game.
         
         Game: {away_team} @ {home_team}
         
         Current Betting Odds:
-        - Moneyline: {home_team} ({fmt(moneyline_home)}) / {away_team} ({fmt(moneyline_away)})
-        - Spread: {home_team} {home_spread_points} ({fmt(spread_home)}) / {away_team} {away_spread_points} ({fmt(spread_away)})
-        - Total: Over {fmt(total_points)} ({fmt(total_over)}) / Under {fmt(total_points)} ({fmt(total_under)})
+        - Moneyline: {home_team} ({_fmt(moneyline_home)}) / {away_team} ({_fmt(moneyline_away)})
+        - Spread: {home_team} {home_spread_points} ({_fmt(spread_home)}) / {away_team} {away_spread_points} ({_fmt(spread_away)})
+        - Total: Over {_fmt(total_points)} ({_fmt(total_over)}) / Under {_fmt(total_points)} ({_fmt(total_under)})
 
         Analyze the matchup and provide your top betting pick.
         
@@ -120,44 +219,140 @@ def generate_and_save_picks():
         Confidence: [High, Medium, or Low]
         Rationale: [A brief, two-sentence explanation of why you made this pick, citing key factors like matchups, form, or injuries.]
     """
+
+def _parse_pick(text, fixture):
+    """Parses a model response into (market, pick, confidence, rationale, odds), or None."""
+    (game_id, home_team, away_team,
+     moneyline_home, moneyline_away,
+     spread_points, spread_home, spread_away,
+     total_points, total_over, total_under) = fixture
+
+    lines = text.strip().split('\n')
+    data = {line.split(': ')[0].strip().lower(): line.split(': ')[1].strip() for line in lines if ': ' in line}
+
+    market = data.get('market')
+    pick = data.get('pick')
+    confidence = data.get('confidence')
+    rationale = data.get('rationale')
+
+    # Determine odds for chosen outcome
+    chosen_odds = None
+    if market and pick:
+        market_lower = market.lower()
+        pick_lower = pick.lower()
+        home_lower = (home_team or '').lower()
+        away_lower = (away_team or '').lower()
+
+        if market_lower == 'moneyline':
+            if home_lower and home_lower in pick_lower:
+                chosen_odds = moneyline_home
+            elif away_lower and away_lower in pick_lower:
+                chosen_odds = moneyline_away
+        elif market_lower == 'spread':
+            # If pick mentions home team, use home spread odds; if away team, use away spread odds
+            if home_lower and home_lower in pick_lower:
+                chosen_odds = spread_home
+            elif away_lower and away_lower in pick_lower:
+                chosen_odds = spread_away
+        elif market_lower == 'total' or market_lower == 'totals':
+            if 'over' in pick_lower:
+                chosen_odds = total_over
+            elif 'under' in pick_lower:
+                chosen_odds = total_under
+
+    if market and pick and confidence and rationale:
+        return market, pick, confidence, rationale, chosen_odds
+    return None
+
+class StubModel:
+    """Offline stand-in for the Gemini model with the same generate_content() interface.
+
+    Always takes the Over at the quoted total after an optional simulated latency,
+    so batch runs can be tested and benchmarked without network access.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    def generate_content(self, prompt):
+        if self.latency:
+            time.sleep(self.latency)
+        match = re.search(r"Total: Over (\S+)", prompt)
+        line = match.group(1) if match else "N/A"
+        return SimpleNamespace(text=(
+            "Market: Total\n"
+            f"Pick: Over {line}\n"
+            "Confidence: Low\n"
+            "Rationale: Stub model response for offline runs. No analysis was performed."
+        ))
+
+def _with_cache(pick_model, use_cache):
+    """Wraps a model in the persistent response cache so unchanged fixtures skip the call.
+
+    Without the cache the wrapper only times each call as the llm_call span.
+    """
+    return CachedModel(pick_model, LLMCache() if use_cache else None, namespace=MODEL_NAME)
+
+def _call_with_timeout(model, prompt, timeout, slots=None):
+    """Runs model.generate_content(prompt), raising TimeoutError after `timeout` seconds.
+
+    A call that times out is abandoned on a daemon thread rather than cancelled.
+    slots, a shared BoundedSemaphore, is held until the call really returns, so
+    abandoned calls still count against the concurrency limit; waiting for a free
+    slot counts against the timeout.
+    """
+    result = {}
+    if slots is not None and not slots.acquire(timeout=timeout):
+        raise TimeoutError(f"no free model call slot within {timeout}s")
+
+    def target():
+        try:
+            result["response"] = model.generate_content(prompt)
+        except Exception as e:
+            result["error"] = e
+        finally:
+            if slots is not None:
+                slots.release()
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        raise TimeoutError(f"model call exceeded {timeout}s")
+    if "error" in result:
+        raise result["error"]
+    return result["response"]
+
+def _generate_with_retries(model, prompt, timeout, retries, backoff, slots=None):
+    """Calls the model with a per-call timeout, retrying failures with jittered exponential backoff."""
+    for attempt in range(retries + 1):
+        try:
+            return _call_with_timeout(model, prompt, timeout, slots)
+        except Exception:
+            if attempt == retries:
+                raise
+            delay = backoff * (2 ** attempt)
+            time.sleep(delay + random.uniform(0, delay / 2))
+
+def generate_and_save_picks(use_cache=True):
+    """Main function to generate and save a pick for a single upcoming fixture."""
+    fixture = get_fixtures_from_db()
     
+    if not fixture:
+        print("No fixtures found. Please run `import_data.py` first.")
+        return
+
+    print("Generating a single pick with Gemini...")
+    game_id = fixture[0]
+
     try:
-        response = model.generate_content(prompt)
+        response = _with_cache(get_model(), use_cache).generate_content(_build_prompt(fixture))
+        if getattr(response, 'cached', False):
+            print(f"Odds for {game_id} unchanged since the last call. Using cached response.")
         if response and response.text:
-            lines = response.text.strip().split('\n')
-            data = {line.split(': ')[0].strip().lower(): line.split(': ')[1].strip() for line in lines if ': ' in line}
-
-            market = data.get('market')
-            pick = data.get('pick')
-            confidence = data.get('confidence')
-            rationale = data.get('rationale')
-            
-            # Determine odds for chosen outcome
-            chosen_odds = None
-            if market and pick:
-                market_lower = market.lower()
-                pick_lower = pick.lower()
-                home_lower = (home_team or '').lower()
-                away_lower = (away_team or '').lower()
-
-                if market_lower == 'moneyline':
-                    if home_lower and home_lower in pick_lower:
-                        chosen_odds = moneyline_home
-                    elif away_lower and away_lower in pick_lower:
-                        chosen_odds = moneyline_away
-                elif market_lower == 'spread':
-                    # If pick mentions home team, use home spread odds; if away team, use away spread odds
-                    if home_lower and home_lower in pick_lower:
-                        chosen_odds = spread_home
-                    elif away_lower and away_lower in pick_lower:
-                        chosen_odds = spread_away
-                elif market_lower == 'total' or market_lower == 'totals':
-                    if 'over' in pick_lower:
-                        chosen_odds = total_over
-                    elif 'under' in pick_lower:
-                        chosen_odds = total_under
-            
-            if market and pick and confidence and rationale:
+            parsed = _parse_pick(response.text, fixture)
+            if parsed:
+                market, pick, confidence, rationale, chosen_odds = parsed
                 save_pick_to_db(game_id, market, pick, confidence, rationale, chosen_odds)
             else:
                 print(f"Failed to parse response for game {game_id}. Response: {response.text}")
@@ -167,5 +362,78 @@ def generate_and_save_picks():
     except Exception as e:
         print(f"An error occurred while generating pick for {game_id}: {e}")
 
+def generate_picks_batch(pick_model=None, concurrency=4, timeout=60.0, retries=2, backoff=1.0, use_cache=True,
+                         refresh=False):
+    """Generates picks for every upcoming fixture without one, running model calls concurrently.
+
+    With refresh, fixtures whose odds moved since their open pick are re-picked too.
+
+    At most `concurrency` model calls run at once, counting calls abandoned after a
+    timeout until they return; each fixture has its own timeout and retry budget.
+    Results are saved by this thread over a single connection.
+    Returns (saved, failed).
+    """
+    fixtures = get_pending_fixtures_from_db(refresh=refresh)
+    if not fixtures:
+        print("No upcoming fixtures without picks. Nothing to generate.")
+        return 0, 0
+    pick_model = _with_cache(pick_model or get_model(), use_cache)
+
+    print(f"Generating picks for {len(fixtures)} fixtures with up to {concurrency} concurrent calls...")
+    saved = 0
+    failed = 0
+    slots = threading.BoundedSemaphore(concurrency)
+    conn = None
+    try:
+        conn = get_connection(DATABASE_NAME)
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = {
+                pool.submit(_generate_with_retries, pick_model, _build_prompt(fixture), timeout, retries, backoff, slots): fixture
+                for fixture in fixtures
+            }
+            for future in as_completed(futures):
+                fixture = futures[future]
+                game_id = fixture[0]
+                try:
+                    response = future.result()
+                except Exception as e:
+                    print(f"An error occurred while generating pick for {game_id}: {e}")
+                    failed += 1
+                    continue
+                parsed = _parse_pick(response.text, fixture) if response and response.text else None
+                if not parsed:
+                    print(f"Failed to parse response for game {game_id}.")
+                    failed += 1
+                    continue
+                market, pick, confidence, rationale, chosen_odds = parsed
+                _save_pick(conn, game_id, market, pick, confidence, rationale, chosen_odds)
+                saved += 1
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+    finally:
+        if conn:
+            release_connection(conn)
+    print(f"Batch complete. Saved: {saved}, Failed: {failed}.")
+    return saved, failed
+
 if __name__ == "__main__":
-    generate_and_save_picks()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate picks with Gemini.")
+    parser.add_argument("--batch", action="store_true", help="generate picks for every upcoming fixture without one")
+    parser.add_argument("--concurrency", type=int, default=4, help="maximum concurrent model calls in batch mode")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds allowed per model call")
+    parser.add_argument("--retries", type=int, default=2, help="retries per fixture after a failed call")
+    parser.add_argument("--stub", action="store_true", help="use the offline stub model instead of Gemini")
+    parser.add_argument("--no-cache", action="store_true", help="always call the model, bypassing the response cache")
+    parser.add_argument("--refresh", action="store_true", help="in batch mode, also re-pick fixtures whose odds moved")
+    args = parser.parse_args()
+    if args.batch:
+        generate_picks_batch(
+            pick_model=StubModel() if args.stub else None,
+            concurrency=args.concurrency,
+            timeout=args.timeout,
+            retries=args.retries,
+            use_cache=not args.no_cache,
+            refresh=args.refresh,
+        )
+    else:
+        generate_and_save_picks(use_cache=not args.no_cache)
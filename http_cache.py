@@ -0,0 +1,181 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+
+import metrics
+
+CACHE_DIR = ".http_cache"
+DEFAULT_TTL = 15 * 60  # seconds a cached response is served in "cache" mode
+MODES = ("cache", "record", "replay")
+_CHUNK_SIZE = 64 * 1024
+_SECRET_PARAMS = {"apiKey"}
+_KEPT_HEADERS = ("content-type", "x-requests-used", "x-requests-remaining", "x-requests-last")
+# Error statuses worth keeping: the 422 that triggers the optional-markets fallback.
+# Rate limits and server errors are transient and are never stored.
+_CACHED_ERRORS = {422}
+
+def cache_key(url):
+    """Returns (readable key, file name) for a request URL, ignoring the API key.
+
+    The key is the path plus the sorted query (regions, markets and any filters),
+    so the same sport_key/regions/markets request maps to the same entry.
+    """
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query) if k not in _SECRET_PARAMS)
+    readable = f"{parts.path}?{urlencode(query)}"
+    digest = hashlib.sha256(readable.encode()).hexdigest()[:20]
+    sport_key = parts.path.rstrip("/").split("/")[-2] if parts.path.count("/") >= 2 else "request"
+    return readable, f"{sport_key}-{digest}.json.gz"
+
+class CachedResponse:
+    """The parts of requests.Response that the importer uses, served from a cached body.
+
+    With path the body is streamed from the gzip cache file (after its metadata
+    line) on each read, so a large payload is never held in memory.
+    """
+
+    from_cache = True
+
+    def __init__(self, url, status_code, headers, body=None, path=None):
+        self.url = url
+        self.status_code = status_code
+        self.headers = requests.structures.CaseInsensitiveDict(headers)
+        self._body = body
+        self._path = path
+
+    @property
+    def content(self):
+        if self._body is None:
+            self._body = b"".join(self.iter_content())
+        return self._body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error (cached) for url: {self.url}", response=self)
+
+    def iter_content(self, chunk_size=_CHUNK_SIZE, decode_unicode=False):
+        if self._body is not None:
+            for start in range(0, len(self._body), chunk_size):
+                yield self._body[start:start + chunk_size]
+            return
+        with gzip.open(self._path, "rb") as f:
+            f.readline()  # metadata
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+    def json(self):
+        return json.loads(self.content)
+
+    def close(self):
+        pass
+
+class CachingSession:
+    """Wraps a requests.Session so GETs are recorded to and replayed from gzip files on disk.
+
+    mode "cache" serves entries younger than ttl and fetches (and stores) the rest,
+    "record" always fetches and stores, and "replay" never touches the network:
+    a missing entry raises ConnectionError. Only 2xx responses and the 422 that
+    the optional-markets fallback relies on are stored; any other status (429,
+    5xx) is passed through uncached, so it cannot be served for a whole TTL or
+    overwrite a good recording.
+    """
+
+    def __init__(self, session, mode="cache", ttl=DEFAULT_TTL, cache_dir=CACHE_DIR):
+        if mode not in MODES:
+            raise ValueError(f"Unknown HTTP cache mode {mode!r}; expected one of {MODES}")
+        self.session = session
+        self.mode = mode
+        self.ttl = ttl
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, url):
+        readable, name = cache_key(url)
+        return readable, os.path.join(self.cache_dir, name)
+
+    def _load(self, url, path):
+        """Reads an entry's metadata; the body stays on disk until it is iterated."""
+        with gzip.open(path, "rb") as f:
+            meta = json.loads(f.readline())
+        return CachedResponse(url, meta["status"], meta["headers"], path=path), meta["stored_at"]
+
+    def _store(self, readable, path, response):
+        """Streams a live response into the entry's gzip file, chunk by chunk."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        headers = {k: v for k, v in response.headers.items() if k.lower() in _KEPT_HEADERS}
+        meta = {"key": readable, "status": response.status_code, "headers": headers, "stored_at": time.time()}
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with gzip.open(tmp, "wb") as f:
+                f.write(json.dumps(meta).encode() + b"\n")
+                for chunk in response.iter_content(chunk_size=_CHUNK_SIZE):
+                    f.write(chunk)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def get(self, url, **kwargs):
+        readable, path = self._path(url)
+        if self.mode != "record" and os.path.exists(path):
+            cached, stored_at = self._load(url, path)
+            if self.mode == "replay" or time.time() - stored_at <= self.ttl:
+                self.hits += 1
+                metrics.incr("http_cache_hits")
+                return cached
+        if self.mode == "replay":
+            raise requests.exceptions.ConnectionError(f"No recorded response for {readable} in {self.cache_dir}")
+
+        self.misses += 1
+        metrics.incr("http_cache_misses")
+        kwargs.pop("stream", None)
+        response = self.session.get(url, stream=True, **kwargs)
+        try:
+            if 200 <= response.status_code < 300 or response.status_code in _CACHED_ERRORS:
+                # Written straight to disk, then replayed from there like any hit
+                self._store(readable, path, response)
+                live, _ = self._load(url, path)
+            else:
+                metrics.incr("http_cache_uncached_errors")
+                live = CachedResponse(url, response.status_code, response.headers,
+                                      b"".join(response.iter_content(chunk_size=_CHUNK_SIZE)))
+        finally:
+            response.close()
+        live.from_cache = False
+        return live
+
+    def close(self):
+        self.session.close()
+
+    def mount(self, prefix, adapter):
+        self.session.mount(prefix, adapter)
+
+def clear(cache_dir=CACHE_DIR):
+    """Deletes every cached response."""
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or clear the importer's HTTP response cache.")
+    parser.add_argument("--clear", action="store_true", help="delete all cached responses")
+    args = parser.parse_args()
+    if args.clear:
+        clear()
+        print("HTTP cache cleared.")
+    else:
+        entries = [name for name in os.listdir(CACHE_DIR) if name.endswith(".json.gz")] if os.path.isdir(CACHE_DIR) else []
+        size = sum(os.path.getsize(os.path.join(CACHE_DIR, name)) for name in entries)
+        print("--- HTTP Cache ---")
+        print(f"Entries: {len(entries)}  Size on disk: {size / 1024:.1f} KiB")
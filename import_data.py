@@ -1,7 +1,27 @@
+import argparse
+import codecs
+import hashlib
+import itertools
+import json
+import queue
+import re
 import requests
 import sqlite3
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Optional
+from urllib.parse import urlencode
 from dotenv import load_dotenv
+from database import get_connection, release_connection
+import metrics
+import odds_store
+from line_ladder import build_ladders, store_ladders
+from extract_plan import PLANS
+from migrations import migrate
+from quota import QuotaManager
 from sports_config import SPORTS
 
 # This line loads the environment variables from your .env file
@@ -10,328 +30,415 @@ load_dotenv()
 # Get your API key from the environment variable named "ODDS_API_KEY"
 API_KEY = os.getenv("ODDS_API_KEY")
 
-def _build_odds_url(sport_key: str, regions: str, markets: list[str]) -> str:
+def _build_odds_url(sport_key: str, regions: str, markets: list[str], filters: Optional[dict] = None) -> str:
     markets_param = ",".join(markets)
-    return f"https://api.the-odds-api.com/v4/sports/{sport_key}/odds/?apiKey={API_KEY}&regions={regions}&markets={markets_param}"
+    url = f"https://api.the-odds-api.com/v4/sports/{sport_key}/odds/?apiKey={API_KEY}&regions={regions}&markets={markets_param}"
+    if filters:
+        # e.g. commenceTimeFrom/commenceTimeTo/eventIds to pull only some fixtures
+        url += "&" + urlencode(filters, safe=":,")
+    return url
 
 DATABASE_NAME = "picks.db"
 
-def _extract_best_prices(bookmakers, home_team, away_team):
-    """Extracts best available odds across bookmakers for moneyline, spread, and totals."""
-    moneyline_home = None
-    moneyline_away = None
-    spread_points = None
-    spread_home = None
-    spread_away = None
-    total_points = None
-    total_over = None
-    total_under = None
-
-    if not bookmakers:
-        return (moneyline_home, moneyline_away, spread_points, spread_home, spread_away, total_points, total_over, total_under)
-
-    for bm in bookmakers:
-        markets = bm.get('markets', [])
-        for market in markets:
-            key = market.get('key')
-            outcomes = market.get('outcomes', [])
-            if key == 'h2h':
-                # Moneyline
-                for o in outcomes:
-                    if o.get('name') == home_team:
-                        price = o.get('price')
-                        if price is not None:
-                            moneyline_home = price if moneyline_home is None else max(moneyline_home, price)
-                    elif o.get('name') == away_team:
-                        price = o.get('price')
-                        if price is not None:
-                            moneyline_away = price if moneyline_away is None else max(moneyline_away, price)
-            elif key == 'spreads':
-                # Spreads (assume same point for both outcomes within a market snapshot)
-                # Choose the line with highest absolute price or first valid
-                best_price_sum = None
-                candidate_points = None
-                candidate_home = None
-                candidate_away = None
-                for o in outcomes:
-                    if o.get('name') == home_team:
-                        candidate_home = o.get('price')
-                        candidate_points = o.get('point')
-                    elif o.get('name') == away_team:
-                        candidate_away = o.get('price')
-                        # keep existing candidate_points if already from home
-                    # When both sides seen, evaluate
-                    if candidate_home is not None and candidate_away is not None and candidate_points is not None:
-                        score = abs(candidate_home) + abs(candidate_away)
-                        if best_price_sum is None or score > best_price_sum:
-                            best_price_sum = score
-                            spread_points = candidate_points
-                            spread_home = candidate_home
-                            spread_away = candidate_away
-                        candidate_points = None
-                        candidate_home = None
-                        candidate_away = None
-            elif key == 'totals':
-                # Totals (Over/Under)
-                candidate_total = None
-                over = None
-                under = None
-                for o in outcomes:
-                    if o.get('name') == 'Over':
-                        over = o.get('price')
-                        candidate_total = o.get('point')
-                    elif o.get('name') == 'Under':
-                        under = o.get('price')
-                        candidate_total = o.get('point') if candidate_total is None else candidate_total
-                    if over is not None and under is not None and candidate_total is not None:
-                        # Prefer highest combined price
-                        if total_points is None or (abs(over) + abs(under)) > (abs(total_over or 0) + abs(total_under or 0)):
-                            total_points = candidate_total
-                            total_over = over
-                            total_under = under
-
-    return (moneyline_home, moneyline_away, spread_points, spread_home, spread_away, total_points, total_over, total_under)
-
-def _extract_epl_odds(bookmakers, home_team, away_team):
-    """Extract best available odds for EPL: 3-way result, totals (goals), BTTS."""
-    home_win = None
-    draw = None
-    away_win = None
-    total_goals = None
-    over_odds = None
-    under_odds = None
-    btts_yes = None
-    btts_no = None
-
-    if not bookmakers:
-        return (home_win, draw, away_win, total_goals, over_odds, under_odds, btts_yes, btts_no)
-
-    for bm in bookmakers:
-        for market in bm.get('markets', []):
-            key = market.get('key')
-            outcomes = market.get('outcomes', [])
-            if key in ('h2h_3_way', 'h2h'):  # some books may use h2h for 3-way
-                for o in outcomes:
-                    name = (o.get('name') or '').lower()
-                    price = o.get('price')
-                    if price is None:
-                        continue
-                    if name == (home_team or '').lower():
-                        home_win = price if home_win is None else max(home_win, price)
-                    elif name == (away_team or '').lower():
-                        away_win = price if away_win is None else max(away_win, price)
-                    elif name == 'draw':
-                        draw = price if draw is None else max(draw, price)
-            elif key == 'totals':
-                cand_total = None
-                cand_over = None
-                cand_under = None
-                for o in outcomes:
-                    if o.get('name') == 'Over':
-                        cand_over = o.get('price')
-                        cand_total = o.get('point')
-                    elif o.get('name') == 'Under':
-                        cand_under = o.get('price')
-                        cand_total = o.get('point') if cand_total is None else cand_total
-                    if cand_over is not None and cand_under is not None and cand_total is not None:
-                        if total_goals is None or (abs(cand_over) + abs(cand_under)) > (abs(over_odds or 0) + abs(under_odds or 0)):
-                            total_goals = cand_total
-                            over_odds = cand_over
-                            under_odds = cand_under
-            elif key == 'btts':
-                for o in outcomes:
-                    name = (o.get('name') or '').lower()
-                    price = o.get('price')
-                    if name == 'yes' and price is not None:
-                        btts_yes = price if btts_yes is None else max(btts_yes, price)
-                    elif name == 'no' and price is not None:
-                        btts_no = price if btts_no is None else max(btts_no, price)
-
-    return (home_win, draw, away_win, total_goals, over_odds, under_odds, btts_yes, btts_no)
-
-def fetch_and_store_all():
-    """Fetches upcoming fixtures for all configured sports/leagues and upserts odds."""
-    # Check if the API key was successfully loaded
-    if not API_KEY:
+def _create_session(pool_size: int = 10) -> requests.Session:
+    """Builds a keep-alive session whose connection pool is shared by all league requests."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def _open_session(pool_size, http_cache=None, cache_ttl=None):
+    """Returns the pooled session, wrapped in the on-disk response cache when a mode is given."""
+    session = _create_session(pool_size=pool_size)
+    if not http_cache:
+        return session
+    from http_cache import DEFAULT_TTL, CachingSession
+
+    return CachingSession(session, mode=http_cache, ttl=DEFAULT_TTL if cache_ttl is None else cache_ttl)
+
+_STREAM_CHUNK_SIZE = 64 * 1024
+_IN_CHUNK = 500  # fixture ids per IN (...) query
+_ROW_QUEUE_SIZE = 1000
+STORE_BATCH_SIZE = 200  # events per write transaction, so a league is never held whole in memory
+_JSON_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+def _iter_json_array(chunks):
+    """Yields the elements of a top-level JSON array as its bytes arrive.
+
+    Only the element currently being decoded is buffered, so memory use is bounded by
+    the largest single event rather than the whole payload.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    state = "start"  # start -> first -> (next <-> value) -> done
+    for chunk in itertools.chain(chunks, [None]):
+        final = chunk is None
+        buffer += utf8.decode(b"" if final else chunk, final=final)
+        pos = 0
+        while True:
+            pos = _JSON_WHITESPACE.match(buffer, pos).end()
+            if pos == len(buffer):
+                break
+            char = buffer[pos]
+            if state == "start":
+                if char != "[":
+                    raise ValueError("Expected a JSON array in the API response")
+                pos += 1
+                state = "first"
+                continue
+            if state in ("first", "next") and char == "]":
+                return
+            if state == "next":
+                if char != ",":
+                    raise ValueError(f"Unexpected {char!r} between JSON array elements")
+                pos += 1
+                state = "value"
+                continue
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if final:
+                    raise
+                break  # element not complete yet; read the next chunk
+            if not final and not isinstance(value, (dict, list)):
+                # A bare number is only complete once its separator has arrived
+                after = _JSON_WHITESPACE.match(buffer, end).end()
+                if after == len(buffer) or buffer[after] not in ",]":
+                    break
+            yield value
+            pos = end
+            state = "next"
+        buffer = buffer[pos:]
+    raise ValueError("Truncated JSON array in the API response")
+
+def _open_league_stream(session, sport_name, league, regions, markets, filters=None, quota=None):
+    """Requests odds for one league, retrying without the sport's optional markets (e.g. BTTS) on a 422."""
+    league_name = league["name"]
+    sport_key = league["sport_key"]
+    url = _build_odds_url(sport_key, regions, markets, filters)
+    print(f"  League {league_name}: requesting markets {markets}")
+    try:
+        with metrics.span("http_fetch"):
+            response = session.get(url, stream=True)
+        if quota and not getattr(response, "from_cache", False):
+            quota.observe(response, sport_key, regions, markets)
+        response.raise_for_status()
+    except requests.exceptions.HTTPError as http_err:
+        optional = SPORTS[sport_name].get("optional_markets", [])
+        if getattr(http_err.response, 'status_code', None) == 422 and any(m in optional for m in markets):
+            http_err.response.close()
+            reduced_markets = [m for m in markets if m not in optional]
+            print(f"  422 for {league_name}. Retrying with {reduced_markets}...")
+            with metrics.span("http_fetch"):
+                response = session.get(_build_odds_url(sport_key, regions, reduced_markets, filters), stream=True)
+            if quota and not getattr(response, "from_cache", False):
+                quota.observe(response, sport_key, regions, reduced_markets)
+            response.raise_for_status()
+        else:
+            raise
+    return response
+
+def _stream_league(session, sport_name, league, regions, markets, filters=None, quota=None):
+    """Yields one league's events as they are parsed off the response body."""
+    response = _open_league_stream(session, sport_name, league, regions, markets, filters, quota)
+    done = object()
+    decode_seconds = 0.0  # reading and parsing the body, excluding the consumer's work per event
+    try:
+        events = _iter_json_array(response.iter_content(chunk_size=_STREAM_CHUNK_SIZE))
+        while True:
+            start = time.perf_counter()
+            game = next(events, done)
+            decode_seconds += time.perf_counter() - start
+            if game is done:
+                break
+            yield game
+    finally:
+        metrics.observe("json_decode", decode_seconds)
+        response.close()
+
+def _queue_league_rows(session, sport_name, league, regions, markets, rows_queue, stop, quota=None, book_odds=False):
+    """Worker: extracts each event as it is parsed and queues its row for the writer."""
+    try:
+        for game in _stream_league(session, sport_name, league, regions, markets, quota=quota):
+            if stop.is_set():
+                return
+            rows_queue.put((sport_name, league, _league_item(sport_name, game, book_odds)))
+    except Exception as exc:
+        rows_queue.put((sport_name, league, exc))
+        return
+    rows_queue.put((sport_name, league, None))
+
+def _build_upsert_sql(table, fields):
+    """Builds one INSERT ... ON CONFLICT(id) DO UPDATE statement for a fixtures table."""
+    columns = ", ".join(fields)
+    placeholders = ", ".join("?" for _ in fields)
+    assignments = ", ".join(f"{field} = excluded.{field}" for field in fields if field != "id")
+    return (
+        f"INSERT INTO {table} ({columns}) VALUES ({placeholders}) "
+        f"ON CONFLICT(id) DO UPDATE SET {assignments}"
+    )
+
+def _upsert_fixtures(conn, table, fields, rows):
+    """Applies all rows to a fixtures table in one transaction. Returns (inserted, updated)."""
+    if not rows:
+        return 0, 0
+    sql = _build_upsert_sql(table, fields)
+    ids = list(dict.fromkeys(row[0] for row in rows))
+    with conn:
+        cursor = conn.cursor()
+        # Probe the batch's own ids by primary key rather than counting the whole table
+        existing = set()
+        for start in range(0, len(ids), _IN_CHUNK):
+            chunk = ids[start:start + _IN_CHUNK]
+            cursor.execute(f"SELECT id FROM {table} WHERE id IN ({', '.join('?' for _ in chunk)})", chunk)
+            existing.update(fixture_id for fixture_id, in cursor)
+        cursor.executemany(sql, rows)
+    inserted = len(ids) - len(existing)
+    return inserted, len(rows) - inserted
+
+def _fixture_row(sport_name, game):
+    """Turns one API event into a row ordered like SPORTS[sport_name]["fields"]."""
+    home_team = game['home_team']
+    away_team = game['away_team']
+    with metrics.span("odds_extract"):
+        odds = PLANS[sport_name].extract(game.get('bookmakers', []), home_team, away_team)
+    return (game['id'], game['commence_time'], home_team, away_team) + odds
+
+def _league_item(sport_name, game, book_odds=False):
+    """One event as the writer stores it: (fixture row, line ladders).
+
+    With book_odds the fixture row is replaced by (fixture header, per-book quotes).
+    Ladders are (fixture id, market, LineLadder) for every spread/total line offered.
+    """
+    if not book_odds:
+        row = _fixture_row(sport_name, game)
+    else:
+        header = (game['id'], game['commence_time'], game['home_team'], game['away_team'])
+        with metrics.span("odds_extract"):
+            row = header, odds_store.event_quotes(game)
+    with metrics.span("ladder_build"):
+        ladders = [(game['id'], market, ladder) for market, ladder in build_ladders(sport_name, game)]
+    return row, ladders
+
+def _odds_snapshot(row):
+    """Returns (compact JSON, content hash) for the odds columns of a fixture row.
+
+    Numbers are written as floats, as the REAL odds columns store them, so a line
+    parsed as -3 from a payload and read back as -3.0 from book_odds hash the same.
+    """
+    values = [float(v) if isinstance(v, int) else v for v in row[4:]]
+    odds = json.dumps(values, separators=(",", ":"))
+    return odds, hashlib.blake2b(odds.encode(), digest_size=8).hexdigest()
+
+def _record_odds_history(conn, rows, captured_at):
+    """Appends an odds_history snapshot for every row whose odds changed. Returns their fixture ids."""
+    if not rows:
+        return []
+    cursor = conn.cursor()
+    ids = [row[0] for row in rows]
+    placeholders = ", ".join("?" for _ in ids)
+    cursor.execute(
+        f"SELECT fixture_id, odds_hash FROM odds_history_latest WHERE fixture_id IN ({placeholders})",
+        ids,
+    )
+    latest = dict(cursor.fetchall())
+
+    snapshots = []
+    heads = []
+    for row in rows:
+        odds, odds_hash = _odds_snapshot(row)
+        if latest.get(row[0]) == odds_hash:
+            continue
+        latest[row[0]] = odds_hash
+        snapshots.append((row[0], captured_at, odds))
+        heads.append((row[0], odds_hash, captured_at))
+
+    with conn:
+        cursor.executemany(
+            "INSERT OR REPLACE INTO odds_history (fixture_id, captured_at, odds) VALUES (?, ?, ?)",
+            snapshots,
+        )
+        cursor.executemany(
+            "INSERT OR REPLACE INTO odds_history_latest (fixture_id, odds_hash, captured_at) VALUES (?, ?, ?)",
+            heads,
+        )
+    return [fixture_id for fixture_id, _, _ in snapshots]
+
+def _store_league(conn, sport_name, table, rows, book_odds=False, ladders=None, changed=None):
+    """Upserts one league's rows and snapshots changed odds. Returns (inserted, updated, snapshots).
+
+    With book_odds, rows are (fixture header, quotes) items from _league_item: the
+    quotes go to book_odds and the fixture rows are derived from what was stored.
+    ladders, (fixture id, market, LineLadder) tuples, replace all stored ladders of these rows.
+    changed, if a list, is extended with the ids of fixtures whose odds changed.
+    """
+    fields = SPORTS[sport_name]["fields"]
+    with metrics.span("db_upsert"):
+        captured_at = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        if book_odds:
+            stored = odds_store.store_quotes(conn, [(header[0], quotes) for header, quotes in rows], captured_at)
+            metrics.incr("book_quotes", stored)
+            rows = odds_store.derive_fixture_rows(conn, sport_name, [header for header, _ in rows])
+        inserted, updated = _upsert_fixtures(conn, table, fields, rows)
+        changed_ids = _record_odds_history(conn, rows, captured_at)
+        if ladders is not None:
+            store_ladders(conn, ladders, captured_at, [row[0] for row in rows])
+    snapshots = len(changed_ids)
+    if changed is not None:
+        changed.extend(changed_ids)
+    metrics.incr("fixtures_inserted", inserted)
+    metrics.incr("fixtures_updated", updated)
+    metrics.incr("odds_snapshots", snapshots)
+    return inserted, updated, snapshots
+
+def _store_items(conn, sport_name, table, items, book_odds=False, changed=None):
+    """Stores a batch of _league_item results with _store_league. Returns (inserted, updated, snapshots)."""
+    rows = [row for row, _ in items]
+    ladders = [ladder for _, event_ladders in items for ladder in event_ladders]
+    return _store_league(conn, sport_name, table, rows, book_odds, ladders, changed)
+
+def _batches(items, size=STORE_BATCH_SIZE):
+    """Yields lists of up to `size` items from an iterable, pulling only one batch at a time."""
+    items = iter(items)
+    while True:
+        batch = list(itertools.islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+def _league_jobs():
+    """Yields (sport_name, league, regions, markets) for every configured league."""
+    for sport_name, sport_cfg in SPORTS.items():
+        for league in sport_cfg["leagues"]:
+            yield sport_name, league, sport_cfg["regions"], sport_cfg["markets"]
+
+def fetch_and_store_all(concurrent=False, max_workers=4, budget=None, http_cache=None, cache_ttl=None, book_odds=False):
+    """Fetches upcoming fixtures for all configured sports/leagues and upserts odds.
+
+    With concurrent=True the league requests run in a bounded thread pool over one
+    pooled session; every payload is still written by this thread on a single connection.
+    With a daily budget (quota units) the run is trimmed to fit; usage is always recorded.
+    http_cache ("cache", "record" or "replay") routes requests through http_cache.CachingSession.
+    book_odds also keeps every bookmaker's quotes in book_odds (see odds_store).
+    """
+    # Check if the API key was successfully loaded (replay never reaches the API)
+    if not API_KEY and http_cache != "replay":
         print("Error: ODDS_API_KEY not found. Please check your .env file.")
         return
 
+    migrate(DATABASE_NAME, verbose=False)
     conn = None
+    quota = None
+    session = _open_session(max(max_workers, 1), http_cache, cache_ttl)
     try:
-        conn = sqlite3.connect(DATABASE_NAME)
-        cursor = conn.cursor()
+        conn = get_connection(DATABASE_NAME)
+        quota = QuotaManager(daily_budget=budget, path=DATABASE_NAME)
+        jobs = quota.plan(_league_jobs())
+
+        totals = {}  # league name -> [inserted, updated, snapshots] over the batches written so far
 
-        for sport_name, sport_cfg in SPORTS.items():
-            regions = sport_cfg["regions"]
-            markets = sport_cfg["markets"]
-            leagues = sport_cfg["leagues"]
-            print(f"Fetching {sport_name} data...")
-
-            for league in leagues:
-                league_name = league["name"]
-                sport_key = league["sport_key"]
-                table = league["table"]
-                url = _build_odds_url(sport_key, regions, markets)
-                print(f"  League {league_name}: requesting markets {markets}")
+        def write(sport_name, league, items):
+            counts = _store_items(conn, sport_name, league["table"], items, book_odds)
+            league_totals = totals.setdefault(league["name"], [0, 0, 0])
+            for i, count in enumerate(counts):
+                league_totals[i] += count
+
+        def finish(league):
+            inserted, updated, snapshots = totals.pop(league["name"], (0, 0, 0))
+            print(f"  {league['name']} upserts complete. Inserted: {inserted}, Updated: {updated}, Odds snapshots: {snapshots}.")
+
+        if concurrent:
+            print(f"Fetching {len(jobs)} leagues with up to {max_workers} concurrent requests...")
+            # Workers stream and extract; this thread is the only DB writer. The bounded
+            # queue applies backpressure if parsing outpaces the writer.
+            rows_queue = queue.Queue(maxsize=_ROW_QUEUE_SIZE)
+            stop = threading.Event()
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                futures = []
+                for sport_name, league, regions, markets in jobs:
+                    # Every job is submitted before any response arrives, so each one
+                    # reserves its cost; otherwise all would see the full allowance.
+                    if not quota.reserve(regions, markets):
+                        print(f"  Quota: not enough requests left for {league['name']}, skipping.")
+                        continue
+                    futures.append(pool.submit(
+                        _queue_league_rows, session, sport_name, league, regions, markets, rows_queue, stop, quota, book_odds
+                    ))
                 try:
-                    response = requests.get(url)
-                    response.raise_for_status()
-                except requests.exceptions.HTTPError as http_err:
-                    if getattr(http_err.response, 'status_code', None) == 422 and sport_name == "Soccer":
-                        reduced_markets = [m for m in markets if m != "btts"]
-                        print(f"  422 for {league_name}. Retrying with {reduced_markets}...")
-                        response = requests.get(_build_odds_url(sport_key, regions, reduced_markets))
-                        response.raise_for_status()
-                    else:
-                        raise
-
-                data = response.json()
-                inserted = 0
-                updated = 0
-
-                if sport_name == "American Football":
-                    for game in data:
-                        game_id = game['id']
-                        commence_time = game['commence_time']
-                        home_team = game['home_team']
-                        away_team = game['away_team']
-                        bookmakers = game.get('bookmakers', [])
-                        (
-                            moneyline_home,
-                            moneyline_away,
-                            spread_points,
-                            spread_home,
-                            spread_away,
-                            total_points,
-                            total_over,
-                            total_under,
-                        ) = _extract_best_prices(bookmakers, home_team, away_team)
-
-                        cursor.execute(f"SELECT id FROM {table} WHERE id = ?", (game_id,))
-                        exists = cursor.fetchone()
-
-                        if not exists:
-                            cursor.execute(
-                                f"""
-                                INSERT INTO {table} (
-                                    id, commence_time, home_team, away_team,
-                                    moneyline_home_odds, moneyline_away_odds,
-                                    spread_points, spread_home_odds, spread_away_odds,
-                                    total_points, total_over_odds, total_under_odds
-                                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                                """,
-                                (
-                                    game_id, commence_time, home_team, away_team,
-                                    moneyline_home, moneyline_away,
-                                    spread_points, spread_home, spread_away,
-                                    total_points, total_over, total_under,
-                                )
-                            )
-                            inserted += 1
-                        else:
-                            cursor.execute(
-                                f"""
-                                UPDATE {table} SET
-                                    commence_time = ?,
-                                    home_team = ?,
-                                    away_team = ?,
-                                    moneyline_home_odds = ?,
-                                    moneyline_away_odds = ?,
-                                    spread_points = ?,
-                                    spread_home_odds = ?,
-                                    spread_away_odds = ?,
-                                    total_points = ?,
-                                    total_over_odds = ?,
-                                    total_under_odds = ?
-                                WHERE id = ?
-                                """,
-                                (
-                                    commence_time,
-                                    home_team,
-                                    away_team,
-                                    moneyline_home,
-                                    moneyline_away,
-                                    spread_points,
-                                    spread_home,
-                                    spread_away,
-                                    total_points,
-                                    total_over,
-                                    total_under,
-                                    game_id,
-                                )
-                            )
-                            updated += 1
-
-                elif sport_name == "Soccer":
-                    for match in data:
-                        match_id = match['id']
-                        commence_time = match['commence_time']
-                        home_team = match['home_team']
-                        away_team = match['away_team']
-                        bookmakers = match.get('bookmakers', [])
-
-                        (home_win, draw, away_win, total_goals, over_odds, under_odds, btts_yes, btts_no) = _extract_epl_odds(bookmakers, home_team, away_team)
-
-                        cursor.execute(f"SELECT id FROM {table} WHERE id = ?", (match_id,))
-                        exists = cursor.fetchone()
-
-                        if not exists:
-                            cursor.execute(
-                                f"""
-                                INSERT INTO {table} (
-                                    id, commence_time, home_team, away_team,
-                                    home_win_odds, draw_odds, away_win_odds,
-                                    total_goals, over_odds, under_odds,
-                                    btts_yes_odds, btts_no_odds
-                                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                                """,
-                                (
-                                    match_id, commence_time, home_team, away_team,
-                                    home_win, draw, away_win,
-                                    total_goals, over_odds, under_odds,
-                                    btts_yes, btts_no,
-                                )
-                            )
-                            inserted += 1
-                        else:
-                            cursor.execute(
-                                f"""
-                                UPDATE {table} SET
-                                    commence_time = ?,
-                                    home_team = ?,
-                                    away_team = ?,
-                                    home_win_odds = ?,
-                                    draw_odds = ?,
-                                    away_win_odds = ?,
-                                    total_goals = ?,
-                                    over_odds = ?,
-                                    under_odds = ?,
-                                    btts_yes_odds = ?,
-                                    btts_no_odds = ?
-                                WHERE id = ?
-                                """,
-                                (
-                                    commence_time, home_team, away_team,
-                                    home_win, draw, away_win,
-                                    total_goals, over_odds, under_odds,
-                                    btts_yes, btts_no,
-                                    match_id,
-                                )
-                            )
-                            updated += 1
-
-                conn.commit()
-                print(f"  {league_name} upserts complete. Inserted: {inserted}, Updated: {updated}.")
-        
+                    pending_rows = {}
+                    remaining = len(futures)
+                    while remaining:
+                        sport_name, league, item = rows_queue.get()
+                        if isinstance(item, Exception):
+                            raise item
+                        if item is None:
+                            remaining -= 1
+                            batch = pending_rows.pop(league["name"], None)
+                            if batch:
+                                write(sport_name, league, batch)
+                            finish(league)
+                            continue
+                        batch = pending_rows.setdefault(league["name"], [])
+                        batch.append(item)
+                        if len(batch) >= STORE_BATCH_SIZE:
+                            write(sport_name, league, pending_rows.pop(league["name"]))
+                finally:
+                    stop.set()
+                    # Unblock any worker still waiting on a full queue so the pool can exit
+                    while not all(future.done() for future in futures):
+                        try:
+                            rows_queue.get(timeout=0.1)
+                        except queue.Empty:
+                            pass
+        else:
+            current_sport = None
+            for sport_name, league, regions, markets in jobs:
+                if sport_name != current_sport:
+                    print(f"Fetching {sport_name} data...")
+                    current_sport = sport_name
+                if not quota.can_afford(regions, markets):
+                    # Usage headers show less left than planned; stop before a 429
+                    print(f"  Quota: not enough requests left for {league['name']}, skipping.")
+                    continue
+                items = (
+                    _league_item(sport_name, game, book_odds)
+                    for game in _stream_league(session, sport_name, league, regions, markets, quota=quota)
+                )
+                for batch in _batches(items):
+                    write(sport_name, league, batch)
+                finish(league)
+
     except requests.exceptions.RequestException as e:
         print(f"Error fetching data from API: {e}")
     except sqlite3.Error as e:
         print(f"Database error: {e}")
     except KeyError as e:
         print(f"Key error in API response: Missing expected key {e}")
+    except ValueError as e:
+        print(f"Invalid JSON in API response: {e}")
     finally:
+        session.close()
+        if quota:
+            try:
+                quota.save()
+            except sqlite3.Error as e:
+                print(f"Database error while recording API usage: {e}")
         if conn:
-            conn.close()
+            release_connection(conn)
 
 if __name__ == "__main__":
-    fetch_and_store_all()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Import fixtures and odds for all configured leagues.")
+    parser.add_argument("--concurrent", action="store_true", help="fetch leagues in parallel")
+    parser.add_argument("--workers", type=int, default=4, help="maximum concurrent league requests")
+    parser.add_argument("--budget", type=int, help="daily odds API quota budget; trims markets/regions to fit")
+    parser.add_argument("--http-cache", choices=["cache", "record", "replay"],
+                        help="serve responses from the on-disk cache, record every response, or replay offline")
+    parser.add_argument("--cache-ttl", type=int, help="seconds a cached response stays fresh in cache mode")
+    parser.add_argument("--book-odds", action="store_true", help="also store every bookmaker's quotes (odds_store)")
+    args = parser.parse_args()
+    fetch_and_store_all(
+        concurrent=args.concurrent, max_workers=args.workers, budget=args.budget,
+        http_cache=args.http_cache, cache_ttl=args.cache_ttl, book_odds=args.book_odds,
+    )
@@ -0,0 +1,213 @@
+import argparse
+import json
+import sqlite3
+from bisect import bisect_left, bisect_right
+
+from database import get_connection, release_connection
+from sports_config import SPORTS
+
+DATABASE_NAME = "picks.db"
+ALTERNATE_PREFIX = "alternate_"  # e.g. alternate_spreads/alternate_totals feed the same ladder
+_IN_CHUNK = 500  # fixture ids per IN (...) query
+
+def ladder_specs(sport_name):
+    """[(ladder market, API market keys, (first side, second side), ignore_case, is_spread)] from the extract specs.
+
+    Every line rule (best_spread/best_total) gets a ladder; its alternate_* market
+    is folded in when the payload has one.
+    """
+    specs = []
+    for spec in SPORTS[sport_name]["extract"]:
+        if spec["rule"] not in ("best_spread", "best_total"):
+            continue
+        keys = list(spec["markets"]) + [ALTERNATE_PREFIX + key for key in spec["markets"]]
+        specs.append((spec["markets"][0], keys, tuple(spec["sides"]), spec.get("ignore_case", False),
+                      spec["rule"] == "best_spread"))
+    return specs
+
+class LineLadder:
+    """Best price per side, across books, at every line offered for one fixture's spread or total.
+
+    Lines are sorted ascending; a spread's line is the first (home) side's point,
+    so the away price at line L is for away +(-L). Prefix and suffix maxima are
+    built once, so "best price at or below / at or above a line" is a bisect
+    plus an index, O(log n).
+    """
+
+    def __init__(self, sides, rows):
+        self.sides = tuple(side.lower() for side in sides)
+        rows = sorted(rows)
+        self.points = [row[0] for row in rows]
+        # per side: (prices, books), None where that side has no price at the line
+        self.prices = ([row[1] for row in rows], [row[3] for row in rows])
+        self.books = ([row[2] for row in rows], [row[4] for row in rows])
+        self._below = tuple(self._running_best(prices, range(len(rows))) for prices in self.prices)
+        self._above = tuple(self._running_best(prices, range(len(rows) - 1, -1, -1)) for prices in self.prices)
+        self.main_index = self._closest_to_even()
+
+    @staticmethod
+    def _running_best(prices, order):
+        """Index of the best price seen so far, walking lines in `order`."""
+        best = [None] * len(prices)
+        current = None
+        for i in order:
+            if prices[i] is not None and (current is None or prices[i] > prices[current]):
+                current = i
+            best[i] = current
+        return best
+
+    def _closest_to_even(self):
+        # Decimal odds: the fairest line is where the two sides' implied probabilities are closest
+        best = None
+        best_gap = None
+        for i, (first, second) in enumerate(zip(*self.prices)):
+            if first is None or second is None:
+                continue
+            gap = abs(1 / first - 1 / second)
+            if best_gap is None or gap < best_gap:
+                best, best_gap = i, gap
+        return best
+
+    def _side(self, side):
+        return self.sides.index(side.lower()) if isinstance(side, str) else side
+
+    def _quote(self, side, i):
+        if i is None:
+            return None
+        return self.points[i], self.prices[side][i], self.books[side][i]
+
+    def at(self, point):
+        """(first price, first book, second price, second book) at exactly this line, or None."""
+        i = bisect_left(self.points, point)
+        if i == len(self.points) or self.points[i] != point:
+            return None
+        return self.prices[0][i], self.books[0][i], self.prices[1][i], self.books[1][i]
+
+    def best_at_or_below(self, side, point):
+        """(line, price, book) of the side's best price on any line <= point, or None."""
+        i = bisect_right(self.points, point) - 1
+        return self._quote(self._side(side), self._below[self._side(side)][i]) if i >= 0 else None
+
+    def best_at_or_above(self, side, point):
+        """(line, price, book) of the side's best price on any line >= point, or None."""
+        i = bisect_left(self.points, point)
+        return self._quote(self._side(side), self._above[self._side(side)][i]) if i < len(self.points) else None
+
+    def nearest(self, point):
+        """The offered line closest to point (ties go to the lower line), or None if the ladder is empty."""
+        i = bisect_left(self.points, point)
+        candidates = [self.points[j] for j in (i - 1, i) if 0 <= j < len(self.points)]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda line: (abs(line - point), line))
+
+    def main_line(self):
+        """(line, first price, second price) of the line closest to even money, or None."""
+        i = self.main_index
+        return None if i is None else (self.points[i], self.prices[0][i], self.prices[1][i])
+
+    def rows(self):
+        return list(zip(self.points, self.prices[0], self.books[0], self.prices[1], self.books[1]))
+
+    def to_json(self):
+        """Compact JSON: sides plus one [line, first price, first book, second price, second book] per line."""
+        return json.dumps({"sides": self.sides, "lines": self.rows()}, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, text):
+        data = json.loads(text)
+        return cls(data["sides"], [tuple(row) for row in data["lines"]])
+
+    def __len__(self):
+        return len(self.points)
+
+def build_ladders(sport_name, game):
+    """Returns [(market, LineLadder)] for one API event, one per line market the event is quoted in."""
+    home, away = game["home_team"], game["away_team"]
+    ladders = []
+    for market, keys, sides, ignore_case, is_spread in ladder_specs(sport_name):
+        names = [home if side == "$home" else away if side == "$away" else side for side in sides]
+        if ignore_case:
+            names = [(name or "").lower() for name in names]
+        first, second = names
+        lines = {}  # line -> [first price, first book, second price, second book]
+        for bm in game.get("bookmakers", []):
+            for m in bm.get("markets", []):
+                if m.get("key") not in keys:
+                    continue
+                for o in m.get("outcomes", []):
+                    name, price, point = o.get("name"), o.get("price"), o.get("point")
+                    if ignore_case:
+                        name = (name or "").lower()
+                    if price is None or point is None or name not in (first, second):
+                        continue
+                    slot = 0 if name == first else 2
+                    line = -point if is_spread and slot == 2 else point
+                    entry = lines.setdefault(line, [None, None, None, None])
+                    if entry[slot] is None or price > entry[slot]:
+                        entry[slot], entry[slot + 1] = price, bm.get("key")
+        if lines:
+            ladders.append((market, LineLadder(
+                ("home", "away") if is_spread else sides, [(line, *entry) for line, entry in lines.items()]
+            )))
+    return ladders
+
+def store_ladders(conn, ladders, captured_at, fixture_ids=None):
+    """Replaces the stored ladders of a batch with [(fixture_id, market, LineLadder)]. Returns the count.
+
+    fixture_ids is the whole batch (by default, the fixtures in ladders): their
+    existing rows are deleted first, so a market that is no longer offered loses its ladder.
+    """
+    rows = [
+        (fixture_id, market, ladder.main_line()[0] if ladder.main_index is not None else None,
+         ladder.to_json(), captured_at)
+        for fixture_id, market, ladder in ladders
+    ]
+    ids = list(dict.fromkeys(fixture_ids if fixture_ids is not None else (row[0] for row in rows)))
+    if not ids:
+        return 0
+    with conn:
+        for start in range(0, len(ids), _IN_CHUNK):
+            chunk = ids[start:start + _IN_CHUNK]
+            conn.execute(f"DELETE FROM line_ladders WHERE fixture_id IN ({', '.join('?' for _ in chunk)})", chunk)
+        conn.executemany('''
+            INSERT OR REPLACE INTO line_ladders (fixture_id, market, main_point, ladder, captured_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', rows)
+    return len(rows)
+
+def load_ladder(fixture_id, market, path=None):
+    """Returns the stored LineLadder for a fixture's market, or None."""
+    conn = None
+    try:
+        conn = get_connection(path or DATABASE_NAME)
+        row = conn.execute(
+            "SELECT ladder FROM line_ladders WHERE fixture_id = ? AND market = ?", (fixture_id, market)
+        ).fetchone()
+        return LineLadder.from_json(row[0]) if row else None
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return None
+    finally:
+        if conn:
+            release_connection(conn)
+
+def print_ladder(fixture_id, market):
+    """Prints every line of a stored ladder with the main line marked."""
+    ladder = load_ladder(fixture_id, market)
+    if ladder is None:
+        print(f"No {market} ladder stored for {fixture_id}.")
+        return
+    first, second = (side.title() for side in ladder.sides)
+    print(f"--- {market} ladder for {fixture_id} ({len(ladder)} lines) ---")
+    for i, (point, first_price, first_book, second_price, second_book) in enumerate(ladder.rows()):
+        marker = "  <- main" if i == ladder.main_index else ""
+        print(f"  {point:+7g}  {first} {first_price or 'N/A'} ({first_book or '-'})  "
+              f"{second} {second_price or 'N/A'} ({second_book or '-'}){marker}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show a fixture's stored alternate-line ladder.")
+    parser.add_argument("fixture_id")
+    parser.add_argument("--market", default="totals", help="spreads or totals (default totals)")
+    args = parser.parse_args()
+    print_ladder(args.fixture_id, args.market)
@@ -0,0 +1,156 @@
+import argparse
+import hashlib
+import sqlite3
+import threading
+import time
+from types import SimpleNamespace
+
+import metrics
+from database import tune_connection
+
+CACHE_DATABASE_NAME = "llm_cache.db"
+
+DEFAULT_TTL = 24 * 60 * 60  # seconds a cached response stays valid
+DEFAULT_MAX_ENTRIES = 5000
+
+class LLMCache:
+    """Persistent SQLite cache of model responses keyed by a hash of the rendered prompt.
+
+    Entries expire after `ttl` seconds and the least recently used entries are
+    evicted once more than `max_entries` are stored. Hit, miss and eviction
+    counters are kept in the same database so they survive across runs.
+    """
+
+    def __init__(self, path=CACHE_DATABASE_NAME, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = tune_connection(sqlite3.connect(path, check_same_thread=False))
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache (last_used_at);
+            CREATE TABLE IF NOT EXISTS llm_cache_stats (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+        ''')
+
+    @staticmethod
+    def make_key(prompt, namespace=""):
+        """Hashes the prompt (team names plus every odds field) together with the model name."""
+        return hashlib.sha256(f"{namespace}\n{prompt}".encode()).hexdigest()
+
+    def _bump(self, name, amount=1):
+        self._conn.execute(
+            "INSERT INTO llm_cache_stats (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount),
+        )
+
+    def get(self, key):
+        """Returns the cached response text for key, or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row and now - row[1] <= self.ttl:
+                self._conn.execute("UPDATE llm_cache SET last_used_at = ? WHERE key = ?", (now, key))
+                self._bump("hits")
+                metrics.incr("llm_cache_hits")
+                return row[0]
+            if row:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._bump("expired")
+            self._bump("misses")
+            metrics.incr("llm_cache_misses")
+            return None
+
+    def put(self, key, response):
+        """Stores a response, then drops expired entries and trims to max_entries."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, response, created_at, last_used_at) VALUES (?, ?, ?, ?)",
+                (key, response, now, now),
+            )
+            expired = self._conn.execute(
+                "DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl,)
+            ).rowcount
+            evicted = self._conn.execute('''
+                DELETE FROM llm_cache WHERE key IN (
+                    SELECT key FROM llm_cache ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+                )
+            ''', (self.max_entries,)).rowcount
+            if expired:
+                self._bump("expired", expired)
+            if evicted:
+                self._bump("evictions", evicted)
+
+    def stats(self):
+        """Returns the persisted counters plus the current number of entries."""
+        with self._lock:
+            stats = dict(self._conn.execute("SELECT name, value FROM llm_cache_stats"))
+            stats["entries"] = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        for name in ("hits", "misses", "expired", "evictions"):
+            stats.setdefault(name, 0)
+        return stats
+
+    def clear(self):
+        """Deletes every cached response and resets the counters."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.execute("DELETE FROM llm_cache_stats")
+
+    def close(self):
+        self._conn.close()
+
+class CachedModel:
+    """Wraps any generate_content(prompt) model so identical prompts are answered from the cache.
+
+    Only real model calls are timed (as the llm_call span), so cache hits do not
+    pull down the latency percentiles; hits and misses are counted by LLMCache.get.
+    With cache=None every prompt goes to the model, still timed.
+    """
+
+    def __init__(self, model, cache, namespace=""):
+        self.model = model
+        self.cache = cache
+        self.namespace = namespace
+
+    def generate_content(self, prompt):
+        if self.cache is None:
+            with metrics.span("llm_call"):
+                return self.model.generate_content(prompt)
+        key = self.cache.make_key(prompt, self.namespace)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return SimpleNamespace(text=cached, cached=True)
+        with metrics.span("llm_call"):
+            response = self.model.generate_content(prompt)
+        if response and response.text:
+            self.cache.put(key, response.text)
+        return response
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or clear the LLM response cache.")
+    parser.add_argument("--clear", action="store_true", help="delete all cached responses and counters")
+    args = parser.parse_args()
+    cache = LLMCache()
+    if args.clear:
+        cache.clear()
+        print("LLM cache cleared.")
+    else:
+        stats = cache.stats()
+        lookups = stats["hits"] + stats["misses"]
+        hit_rate = (stats["hits"] / lookups * 100) if lookups else 0.0
+        print("--- LLM Cache ---")
+        print(f"Entries: {stats['entries']}")
+        print(f"Hits: {stats['hits']}  Misses: {stats['misses']}  Hit rate: {hit_rate:.1f}%")
+        print(f"Expired: {stats['expired']}  Evicted: {stats['evictions']}")
+    cache.close()
@@ -0,0 +1,161 @@
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+# In-process registry shared by every module in a run, which may be a daemon that
+# never exits. Spans keep exact count/total/min/max, but percentiles come from a
+# uniform reservoir sample of at most RESERVOIR_SIZE durations, so memory stays
+# bounded; runs shorter than that still get exact percentiles.
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+_timings = {}
+_started_at = time.time()
+
+PREFIX = "pickatron"
+QUANTILES = (0.5, 0.9, 0.99)
+RESERVOIR_SIZE = 1024
+
+class _Timing:
+    """One span's running statistics plus a reservoir sample of its durations (Algorithm R)."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self.sample = []
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+        if len(self.sample) < RESERVOIR_SIZE:
+            self.sample.append(seconds)
+        else:
+            slot = random.randrange(self.count)
+            if slot < RESERVOIR_SIZE:
+                self.sample[slot] = seconds
+
+def incr(name, amount=1):
+    """Adds amount to a counter."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+def set_gauge(name, value):
+    """Sets a gauge to its latest value."""
+    with _lock:
+        _gauges[name] = value
+
+def observe(name, seconds):
+    """Records one duration for a timing span."""
+    with _lock:
+        timing = _timings.get(name)
+        if timing is None:
+            timing = _timings[name] = _Timing()
+        timing.add(seconds)
+
+@contextmanager
+def span(name):
+    """Times the enclosed block as one observation of `name` (recorded even if it raises)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+def percentile(values, q):
+    """Nearest-rank percentile of a non-empty list (q in 0..1)."""
+    ordered = sorted(values)
+    rank = max(math.ceil(q * len(ordered)), 1)
+    return ordered[rank - 1]
+
+def reset():
+    """Clears every counter, gauge and timing."""
+    global _started_at
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _timings.clear()
+        _started_at = time.time()
+
+def summary():
+    """Returns the run's counters, gauges and per-span timing statistics as a dict."""
+    with _lock:
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+        timings = {name: (t.count, t.total, t.min, t.max, list(t.sample)) for name, t in _timings.items()}
+        started_at = _started_at
+    spans = {}
+    for name, (count, total, low, high, sample) in sorted(timings.items()):
+        spans[name] = {
+            "count": count,
+            "total_seconds": total,
+            "min_seconds": low,
+            "max_seconds": high,
+            **{f"p{round(q * 100)}_seconds": percentile(sample, q) for q in QUANTILES},
+        }
+    return {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(started_at)),
+        "duration_seconds": time.time() - started_at,
+        "counters": dict(sorted(counters.items())),
+        "gauges": dict(sorted(gauges.items())),
+        "spans": spans,
+    }
+
+def _write_atomic(path, text):
+    # node_exporter's textfile collector may read at any moment; never expose a partial file
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+def write_json(path):
+    """Writes summary() as a JSON run summary."""
+    _write_atomic(path, json.dumps(summary(), indent=2) + "\n")
+
+def _metric_name(name):
+    return f"{PREFIX}_" + re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+def prometheus_text():
+    """Renders summary() in the Prometheus text exposition format."""
+    data = summary()
+    lines = []
+    for name, value in data["counters"].items():
+        metric = _metric_name(name) + "_total"
+        lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+    for name, value in data["gauges"].items():
+        metric = _metric_name(name)
+        lines += [f"# TYPE {metric} gauge", f"{metric} {value}"]
+    for name, stats in data["spans"].items():
+        metric = _metric_name(name) + "_seconds"
+        lines.append(f"# TYPE {metric} summary")
+        for q in QUANTILES:
+            lines.append(f'{metric}{{quantile="{q}"}} {stats[f"p{round(q * 100)}_seconds"]:.6f}')
+        lines.append(f"{metric}_sum {stats['total_seconds']:.6f}")
+        lines.append(f"{metric}_count {stats['count']}")
+    metric = f"{PREFIX}_last_run_timestamp_seconds"
+    lines += [f"# TYPE {metric} gauge", f"{metric} {time.time():.0f}"]
+    return "\n".join(lines) + "\n"
+
+def write_prometheus(path):
+    """Writes the run's metrics as a node_exporter textfile (*.prom)."""
+    _write_atomic(path, prometheus_text())
+
+def print_summary():
+    """Prints a short human-readable timing table."""
+    data = summary()
+    print("--- Run metrics ---")
+    for name, stats in data["spans"].items():
+        print(f"  {name:<14} n={stats['count']:<6} total {stats['total_seconds'] * 1000:9.1f} ms  "
+              f"p50 {stats['p50_seconds'] * 1000:8.2f} ms  p99 {stats['p99_seconds'] * 1000:8.2f} ms")
+    for name, value in data["counters"].items():
+        print(f"  {name}: {value}")
+    for name, value in data["gauges"].items():
+        print(f"  {name}: {value}")
@@ -0,0 +1,372 @@
+import argparse
+import sqlite3
+import sys
+
+import database
+from database import get_connection, release_connection
+from odds_store import summary_query
+
+def _columns(cursor, table):
+    return {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+
+def _add_column(cursor, table, column, decl):
+    if column not in _columns(cursor, table):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+def _baseline(cursor):
+    """Tables previously created by database.create_*_table."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS nfl_fixtures (
+            id TEXT PRIMARY KEY,
+            commence_time TEXT,
+            home_team TEXT,
+            away_team TEXT,
+            moneyline_home_odds REAL,
+            moneyline_away_odds REAL,
+            spread_points REAL,
+            spread_home_odds REAL,
+            spread_away_odds REAL,
+            total_points REAL,
+            total_over_odds REAL,
+            total_under_odds REAL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS nfl_picks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            game_id TEXT,
+            market TEXT,
+            pick TEXT,
+            odds REAL,
+            confidence_level TEXT,
+            rationale TEXT,
+            FOREIGN KEY (game_id) REFERENCES nfl_fixtures(id)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS epl_fixtures (
+            id TEXT PRIMARY KEY,
+            commence_time TEXT,
+            home_team TEXT,
+            away_team TEXT,
+            -- 3-way moneyline
+            home_win_odds REAL,
+            draw_odds REAL,
+            away_win_odds REAL,
+            -- totals (goals)
+            total_goals REAL,
+            over_odds REAL,
+            under_odds REAL,
+            -- BTTS
+            btts_yes_odds REAL,
+            btts_no_odds REAL
+        )
+    ''')
+    # One row per distinct odds snapshot; odds is a compact JSON array ordered like
+    # SPORTS[...]["fields"][4:]. The primary key doubles as the as-of lookup index.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS odds_history (
+            fixture_id TEXT NOT NULL,
+            captured_at TEXT NOT NULL,
+            odds TEXT NOT NULL,
+            PRIMARY KEY (fixture_id, captured_at)
+        ) WITHOUT ROWID
+    ''')
+    # Hash of the most recent snapshot per fixture, used to skip unchanged odds
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS odds_history_latest (
+            fixture_id TEXT PRIMARY KEY,
+            odds_hash TEXT NOT NULL,
+            captured_at TEXT NOT NULL
+        ) WITHOUT ROWID
+    ''')
+
+def _pick_columns(cursor):
+    """odds was bolted on with a try/except ALTER; result was read by analyze_picks but never created."""
+    _add_column(cursor, "nfl_picks", "odds", "REAL")
+    _add_column(cursor, "nfl_picks", "result", "TEXT")
+
+def _query_indexes(cursor):
+    """Indexes behind the commence_time, game_id and (game_id, market) lookups."""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_nfl_fixtures_commence ON nfl_fixtures (commence_time)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_epl_fixtures_commence ON epl_fixtures (commence_time)")
+    # save_pick_to_db already refuses duplicates; drop any that slipped in before the index
+    cursor.execute('''
+        DELETE FROM nfl_picks WHERE id NOT IN (
+            SELECT MIN(id) FROM nfl_picks GROUP BY game_id, market
+        )
+    ''')
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_nfl_picks_game_market ON nfl_picks (game_id, market)")
+    # Covers the settled-picks scan behind the ROI figures
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_nfl_picks_result ON nfl_picks (result, odds)")
+
+def _pick_stats(cursor):
+    """Per (sport, market, confidence) running totals maintained by update_pick_result."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS pick_stats (
+            sport TEXT NOT NULL,
+            market TEXT NOT NULL,
+            confidence_level TEXT NOT NULL,
+            bets INTEGER NOT NULL DEFAULT 0,
+            wins INTEGER NOT NULL DEFAULT 0,
+            losses INTEGER NOT NULL DEFAULT 0,
+            pushes INTEGER NOT NULL DEFAULT 0,
+            staked REAL NOT NULL DEFAULT 0,
+            profit REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (sport, market, confidence_level)
+        ) WITHOUT ROWID
+    ''')
+    # ROI is now read from pick_stats, so the settled-picks index has no reader left
+    cursor.execute("DROP INDEX IF EXISTS idx_nfl_picks_result")
+    # Backfill from picks settled before the table existed (100-unit stakes)
+    cursor.execute('''
+        INSERT INTO pick_stats (sport, market, confidence_level, bets, wins, losses, pushes, staked, profit)
+        SELECT
+            'NFL',
+            COALESCE(market, ''),
+            COALESCE(confidence_level, ''),
+            SUM(result IN ('WIN', 'LOSS')),
+            SUM(result = 'WIN'),
+            SUM(result = 'LOSS'),
+            SUM(result = 'PUSH'),
+            SUM(CASE WHEN result IN ('WIN', 'LOSS') AND odds IS NOT NULL THEN 100 ELSE 0 END),
+            SUM(CASE
+                WHEN odds IS NULL THEN 0
+                WHEN result = 'WIN' THEN (odds - 1) * 100
+                WHEN result = 'LOSS' THEN -100
+                ELSE 0
+            END)
+        FROM nfl_picks
+        WHERE result IS NOT NULL
+        GROUP BY 2, 3
+    ''')
+
+def _api_usage(cursor):
+    """One row per odds API request with its predicted and charged quota cost."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS api_usage (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            requested_at TEXT NOT NULL,
+            sport_key TEXT NOT NULL,
+            regions TEXT NOT NULL,
+            markets TEXT NOT NULL,
+            estimated_cost INTEGER NOT NULL,
+            last_cost INTEGER,  -- x-requests-last
+            used INTEGER,       -- x-requests-used
+            remaining INTEGER   -- x-requests-remaining
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_api_usage_requested ON api_usage (requested_at)")
+
+def _book_odds(cursor):
+    """Per-bookmaker odds in long format with integer-coded bookmaker, market and outcome."""
+    cursor.execute("CREATE TABLE IF NOT EXISTS odds_bookmakers (id INTEGER PRIMARY KEY, key TEXT NOT NULL UNIQUE)")
+    cursor.execute("CREATE TABLE IF NOT EXISTS odds_markets (id INTEGER PRIMARY KEY, key TEXT NOT NULL UNIQUE)")
+    cursor.execute("CREATE TABLE IF NOT EXISTS odds_outcomes (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)")
+    # Latest quote per (fixture, market, outcome, line, book); history stays in odds_history.
+    # point is 0 for markets without a line, since primary key columns cannot be NULL.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS book_odds (
+            fixture_id TEXT NOT NULL,
+            market_id INTEGER NOT NULL REFERENCES odds_markets(id),
+            outcome_id INTEGER NOT NULL REFERENCES odds_outcomes(id),
+            point REAL NOT NULL,
+            bookmaker_id INTEGER NOT NULL REFERENCES odds_bookmakers(id),
+            price REAL NOT NULL,
+            captured_at TEXT NOT NULL,
+            PRIMARY KEY (fixture_id, market_id, outcome_id, point, bookmaker_id)
+        ) WITHOUT ROWID
+    ''')
+    # Covers best/median/count per outcome: rows arrive grouped and ordered by price
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_book_odds_price ON book_odds (fixture_id, market_id, outcome_id, point, price)"
+    )
+
+def _history_capture_index(cursor):
+    """Lets incremental exports read only odds_history rows captured after a watermark."""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_odds_history_captured ON odds_history (captured_at)")
+
+def _value_scan(cursor):
+    """Implied/fair probabilities, margins and arbitrage/value flags written by value_scan.run_scan."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS value_scan (
+            fixture_id TEXT NOT NULL,
+            source TEXT NOT NULL,  -- 'best' (wide fixture columns) or 'books' (book_odds)
+            market TEXT NOT NULL,
+            outcome TEXT NOT NULL,
+            point REAL NOT NULL,
+            price REAL NOT NULL,
+            implied_prob REAL,
+            fair_prob REAL,
+            overround REAL,
+            edge REAL,
+            books INTEGER,
+            arbitrage INTEGER NOT NULL,
+            value INTEGER NOT NULL,
+            scanned_at TEXT NOT NULL,
+            PRIMARY KEY (fixture_id, source, market, outcome, point)
+        ) WITHOUT ROWID
+    ''')
+
+def _line_ladders(cursor):
+    """Best price per side at every spread/total line, one compact JSON ladder per (fixture, market)."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS line_ladders (
+            fixture_id TEXT NOT NULL,
+            market TEXT NOT NULL,
+            main_point REAL,  -- line closest to even money
+            ladder TEXT NOT NULL,
+            captured_at TEXT NOT NULL,
+            PRIMARY KEY (fixture_id, market)
+        ) WITHOUT ROWID
+    ''')
+
+def _book_odds_order(cursor):
+    """Each quote's position in its event's payload, so stored books replay in the order the API sent them."""
+    cursor.execute("ALTER TABLE book_odds ADD COLUMN seq INTEGER NOT NULL DEFAULT 0")
+
+def _pick_times(cursor):
+    """When each pick was made, to compare with its fixture's latest odds; older picks stay NULL."""
+    _add_column(cursor, "nfl_picks", "picked_at", "TEXT")
+
+# (version, description, function). Append only; never edit a released migration.
+MIGRATIONS = [
+    (1, "baseline fixtures, picks and odds history tables", _baseline),
+    (2, "nfl_picks odds and result columns", _pick_columns),
+    (3, "indexes for commence_time, game_id and (game_id, market) queries", _query_indexes),
+    (4, "pick_stats running totals", _pick_stats),
+    (5, "api_usage quota log", _api_usage),
+    (6, "per-bookmaker book_odds store", _book_odds),
+    (7, "odds_history captured_at index", _history_capture_index),
+    (8, "value_scan results", _value_scan),
+    (9, "line_ladders alternate-line ladders", _line_ladders),
+    (10, "book_odds payload order", _book_odds_order),
+    (11, "nfl_picks picked_at", _pick_times),
+]
+
+def schema_version(path=None):
+    """Returns the schema version recorded in PRAGMA user_version."""
+    conn = get_connection(path or database.DATABASE_NAME)
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(path=None, verbose=True):
+    """Applies every pending migration, each in its own transaction. Returns the new version."""
+    conn = None
+    try:
+        conn = get_connection(path or database.DATABASE_NAME)
+        cursor = conn.cursor()
+        current = cursor.execute("PRAGMA user_version").fetchone()[0]
+        for version, description, apply in MIGRATIONS:
+            if version <= current:
+                continue
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                apply(cursor)
+                cursor.execute(f"PRAGMA user_version = {version}")
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            current = version
+            if verbose:
+                print(f"Applied migration {version}: {description}")
+        return current
+    except sqlite3.Error as e:
+        print(f"Database error during migration: {e}")
+        return None
+    finally:
+        if conn:
+            release_connection(conn)
+
+# Queries on the hot path, with representative parameters. Each must be answered
+# from an index: check_query_plans fails if any of them plans a full table scan.
+HOT_QUERIES = {
+    "pending fixtures (generate_picks)": ('''
+        SELECT f.id FROM nfl_fixtures AS f
+        WHERE f.commence_time >= ?
+          AND NOT EXISTS (SELECT 1 FROM nfl_picks AS p WHERE p.game_id = f.id)
+        ORDER BY f.commence_time
+    ''', ("2025-01-01T00:00:00Z",)),
+    "fixtures whose odds moved since their pick (generate_picks refresh)": ('''
+        SELECT f.id FROM nfl_fixtures AS f
+        WHERE f.commence_time >= ?
+          AND EXISTS (
+              SELECT 1 FROM nfl_picks AS p JOIN odds_history_latest AS h ON h.fixture_id = p.game_id
+              WHERE p.game_id = f.id AND p.result IS NULL AND p.picked_at < h.captured_at
+          )
+        ORDER BY f.commence_time
+    ''', ("2025-01-01T00:00:00Z",)),
+    "existing pick lookup (save_pick_to_db)": ('''
+        SELECT p.id, p.odds, p.confidence_level, p.result, p.result IS NULL AND p.picked_at < h.captured_at
+        FROM nfl_picks AS p LEFT JOIN odds_history_latest AS h ON h.fixture_id = p.game_id
+        WHERE p.game_id = ? AND p.market = ?
+    ''', ("g", "Total")),
+    "pick result lookup (update_pick_result)": (
+        "SELECT market, confidence_level, odds, result FROM nfl_picks WHERE id = ?", (1,),
+    ),
+    "pending picks for scored games (settle)": ('''
+        SELECT p.id FROM nfl_picks AS p JOIN nfl_fixtures AS f ON f.id = p.game_id
+        WHERE p.game_id IN (?, ?) AND p.result IS NULL
+    ''', ("a", "b")),
+    "NFL fixtures in a kickoff window": (
+        "SELECT id FROM nfl_fixtures WHERE commence_time >= ? AND commence_time < ? ORDER BY commence_time",
+        ("2025-01-01T00:00:00Z", "2025-01-08T00:00:00Z"),
+    ),
+    "EPL fixtures in a kickoff window": (
+        "SELECT id FROM epl_fixtures WHERE commence_time >= ? AND commence_time < ? ORDER BY commence_time",
+        ("2025-01-01T00:00:00Z", "2025-01-08T00:00:00Z"),
+    ),
+    "odds as of time T (get_odds_as_of)": ('''
+        SELECT captured_at, odds FROM odds_history
+        WHERE fixture_id = ? AND captured_at <= ?
+        ORDER BY captured_at DESC LIMIT 1
+    ''', ("g", "2025-01-01T00:00:00Z")),
+    "quota spent today (quota)": (
+        "SELECT SUM(COALESCE(last_cost, estimated_cost)) FROM api_usage WHERE requested_at >= ?",
+        ("2025-01-01T00:00:00Z",),
+    ),
+    "latest odds hashes (import_data)": (
+        "SELECT fixture_id, odds_hash FROM odds_history_latest WHERE fixture_id IN (?, ?)", ("a", "b"),
+    ),
+    "odds history since the last export (export)": ('''
+        SELECT h.fixture_id, h.captured_at, h.odds FROM odds_history AS h
+        JOIN nfl_fixtures AS f ON f.id = h.fixture_id
+        WHERE h.captured_at > ?
+        ORDER BY h.captured_at, h.fixture_id
+    ''', ("2025-01-01T00:00:00Z",)),
+    "ladder lookup (line_ladder)": (
+        "SELECT ladder FROM line_ladders WHERE fixture_id = ? AND market = ?", ("g", "totals"),
+    ),
+    "stored quotes for fixtures (odds_store)": (
+        "SELECT fixture_id, market_id, outcome_id, point, bookmaker_id, price FROM book_odds WHERE fixture_id IN (?, ?)",
+        ("a", "b"),
+    ),
+    "per-outcome consensus (odds_store)": summary_query(("a", "b")),
+}
+
+def check_query_plans(path=None):
+    """Runs EXPLAIN QUERY PLAN on HOT_QUERIES. Returns [(query name, plan step)] for full scans."""
+    conn = get_connection(path or database.DATABASE_NAME)
+    failures = []
+    for name, (sql, params) in HOT_QUERIES.items():
+        for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params):
+            detail = row[3]
+            if detail.startswith("SCAN ") or " TEMP B-TREE" in detail:
+                failures.append((name, detail))
+    return failures
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bring picks.db to the current schema.")
+    parser.add_argument("--check", action="store_true", help="fail if a hot query would scan a whole table")
+    args = parser.parse_args()
+    version = migrate()
+    if version is None:
+        sys.exit(1)
+    print(f"Schema is at version {version}.")
+    if args.check:
+        failures = check_query_plans()
+        for name, detail in failures:
+            print(f"FULL SCAN in {name}: {detail}")
+        if failures:
+            sys.exit(1)
+        print(f"All {len(HOT_QUERIES)} hot queries use indexes.")
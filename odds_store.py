@@ -0,0 +1,204 @@
+import argparse
+import itertools
+import sqlite3
+
+from database import get_connection, release_connection
+from extract_plan import PLANS
+from report import FORMATS, fmt, write_rows
+
+DATABASE_NAME = "picks.db"
+
+# Integer-coded dimensions of book_odds: table -> name column
+DIMENSIONS = {
+    "odds_bookmakers": "key",
+    "odds_markets": "key",
+    "odds_outcomes": "name",
+}
+NO_POINT = 0.0  # book_odds.point for markets without a line (h2h, btts); key columns cannot be NULL
+_IN_CHUNK = 500  # fixture ids per IN (...) query
+
+def event_quotes(game):
+    """Flattens one API event into (bookmaker key, market key, outcome name, point, price) quotes."""
+    quotes = []
+    for bm in game.get("bookmakers", []):
+        book = bm.get("key")
+        for market in bm.get("markets", []):
+            market_key = market.get("key")
+            for o in market.get("outcomes", []):
+                price = o.get("price")
+                if book is None or market_key is None or o.get("name") is None or price is None:
+                    continue
+                point = o.get("point")
+                quotes.append((book, market_key, o["name"], NO_POINT if point is None else point, price))
+    return quotes
+
+def _dimension_ids(cursor, table, names):
+    """Returns {name: id} for a dimension table, adding any names it does not have yet."""
+    column = DIMENSIONS[table]
+    ids = dict(cursor.execute(f"SELECT {column}, id FROM {table}"))
+    missing = [(name,) for name in set(names) if name not in ids]
+    if missing:
+        cursor.executemany(f"INSERT OR IGNORE INTO {table} ({column}) VALUES (?)", missing)
+        ids = dict(cursor.execute(f"SELECT {column}, id FROM {table}"))
+    return ids
+
+def store_quotes(conn, items, captured_at):
+    """Replaces the stored quotes of every fixture in items, a list of (fixture id, quotes). Returns the row count.
+
+    Each fixture's previous quotes are deleted first, so a book that stops
+    quoting a market drops out instead of lingering with a stale price.
+    """
+    if not items:
+        return 0
+    all_quotes = [quote for _, quotes in items for quote in quotes]
+    rows = []
+    with conn:
+        cursor = conn.cursor()
+        books = _dimension_ids(cursor, "odds_bookmakers", (q[0] for q in all_quotes))
+        markets = _dimension_ids(cursor, "odds_markets", (q[1] for q in all_quotes))
+        outcomes = _dimension_ids(cursor, "odds_outcomes", (q[2] for q in all_quotes))
+        for fixture_id, quotes in items:
+            rows.extend(
+                (fixture_id, markets[market], outcomes[outcome], point, books[book], price, captured_at, seq)
+                for seq, (book, market, outcome, point, price) in enumerate(quotes)
+            )
+        ids = [fixture_id for fixture_id, _ in items]
+        for start in range(0, len(ids), _IN_CHUNK):
+            chunk = ids[start:start + _IN_CHUNK]
+            cursor.execute(
+                f"DELETE FROM book_odds WHERE fixture_id IN ({', '.join('?' for _ in chunk)})", chunk
+            )
+        # A book listing the same outcome and line twice keeps only its last price
+        cursor.executemany('''
+            INSERT OR REPLACE INTO book_odds
+                (fixture_id, market_id, outcome_id, point, bookmaker_id, price, captured_at, seq)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+    return len(rows)
+
+def load_bookmakers(conn, fixture_ids):
+    """Rebuilds the API's bookmakers -> markets -> outcomes lists for each fixture from book_odds.
+
+    Quotes are replayed in payload order (seq), so books, markets and outcomes
+    come back in the order the API sent them and the extraction plan's
+    order-sensitive line rules give the same result as on the raw payload.
+    Every outcome carries its point; price-only rules ignore it.
+    """
+    names = {
+        table: {id_: name for name, id_ in conn.execute(f"SELECT {column}, id FROM {table}")}
+        for table, column in DIMENSIONS.items()
+    }
+    books, markets, outcomes = names["odds_bookmakers"], names["odds_markets"], names["odds_outcomes"]
+    quotes = {fixture_id: [] for fixture_id in fixture_ids}
+    ids = list(quotes)
+    for start in range(0, len(ids), _IN_CHUNK):
+        chunk = ids[start:start + _IN_CHUNK]
+        cursor = conn.execute(f'''
+            SELECT fixture_id, seq, market_id, outcome_id, point, bookmaker_id, price FROM book_odds
+            WHERE fixture_id IN ({', '.join('?' for _ in chunk)})
+        ''', chunk)
+        for row in cursor:
+            quotes[row[0]].append(row[1:])
+
+    bookmakers = {}
+    for fixture_id, rows in quotes.items():
+        rows.sort()
+        event_books = bookmakers[fixture_id] = []
+        for _, market_id, outcome_id, point, bookmaker_id, price in rows:
+            # event_quotes flattened one book, then one market, at a time; a change of key starts the next
+            book, market = books[bookmaker_id], markets[market_id]
+            if not event_books or event_books[-1]["key"] != book:
+                event_books.append({"key": book, "markets": []})
+            book_markets = event_books[-1]["markets"]
+            if not book_markets or book_markets[-1]["key"] != market:
+                book_markets.append({"key": market, "outcomes": []})
+            book_markets[-1]["outcomes"].append({"name": outcomes[outcome_id], "price": price, "point": point})
+    return bookmakers
+
+def derive_fixture_rows(conn, sport_name, headers):
+    """Builds wide fixture rows from stored quotes.
+
+    headers are (id, commence_time, home_team, away_team) tuples; the odds
+    columns are filled by the sport's extraction plan over the stored books.
+    """
+    plan = PLANS[sport_name]
+    bookmakers = load_bookmakers(conn, [header[0] for header in headers])
+    return [header + plan.extract(bookmakers[header[0]], header[2], header[3]) for header in headers]
+
+SUMMARY_COLUMNS = ("fixture_id", "market", "outcome", "point", "books", "best_price", "best_bookmaker", "median_price")
+
+def summary_query(fixture_ids):
+    """Returns (sql, params) for the stored quotes of some fixtures, grouped by outcome and ordered by price.
+
+    idx_book_odds_price returns the rows in exactly this order, so there is no sort.
+    """
+    placeholders = ", ".join("?" for _ in fixture_ids)
+    sql = f'''
+        SELECT fixture_id, market_id, outcome_id, point, price, bookmaker_id FROM book_odds
+        WHERE fixture_id IN ({placeholders})
+        ORDER BY fixture_id, market_id, outcome_id, point, price
+    '''
+    return sql, list(fixture_ids)
+
+def outcome_summaries(conn, fixture_ids):
+    """Yields one SUMMARY_COLUMNS row per outcome and line: book count, best price and its book, median price.
+
+    One pass over the index-ordered quotes; each outcome's prices arrive sorted,
+    so the best is the last and the median is read from the middle.
+    """
+    names = {
+        table: {id_: name for name, id_ in conn.execute(f"SELECT {column}, id FROM {table}")}
+        for table, column in DIMENSIONS.items()
+    }
+    books, markets, outcomes = names["odds_bookmakers"], names["odds_markets"], names["odds_outcomes"]
+    ids = list(dict.fromkeys(fixture_ids))
+    for start in range(0, len(ids), _IN_CHUNK):
+        sql, params = summary_query(ids[start:start + _IN_CHUNK])
+        rows = conn.execute(sql, params)
+        for (fixture_id, market_id, outcome_id, point), group in itertools.groupby(rows, key=lambda r: r[:4]):
+            group = list(group)
+            prices = [row[4] for row in group]
+            n = len(prices)
+            median = prices[n // 2] if n % 2 else (prices[n // 2 - 1] + prices[n // 2]) / 2
+            yield (
+                fixture_id, markets[market_id], outcomes[outcome_id], point,
+                n, prices[-1], books[group[-1][5]], median,
+            )
+
+def _render_summary(row):
+    fixture_id, market, outcome, point, books, best, best_book, median = row
+    line = f" {point:+g}" if point != NO_POINT else ""
+    return (
+        f"{fixture_id}  {market:<10} {outcome}{line}\n"
+        f"  Books: {books}  Best: {fmt(best)} ({best_book})  Median: {fmt(median)}\n"
+    )
+
+def _render_compact(row):
+    fixture_id, market, outcome, point, books, best, best_book, median = row
+    line = f" {point:+g}" if point != NO_POINT else ""
+    return f"{market} {outcome}{line}  n={books}  best {fmt(best)} @{best_book}  median {fmt(median)}  [{fixture_id}]"
+
+def view_consensus(fixture_ids, output_format="text", out=None):
+    """Streams the best price, median price and book count of every outcome of the given fixtures."""
+    conn = None
+    try:
+        conn = get_connection(DATABASE_NAME)
+        write_rows(
+            outcome_summaries(conn, fixture_ids), SUMMARY_COLUMNS, output_format, _render_summary, _render_compact,
+            title="--- Per-Book Odds Consensus ---",
+            empty_message="No per-book odds stored for these fixtures. Run the importer with --book-odds.",
+            out=out,
+        )
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+    finally:
+        if conn:
+            release_connection(conn)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show best, median and book count per outcome from per-book odds.")
+    parser.add_argument("fixture_ids", nargs="+", help="fixture ids to summarize")
+    parser.add_argument("--format", dest="output_format", choices=FORMATS, default="text",
+                        help="text (default), compact one line per row, csv or jsonl")
+    args = parser.parse_args()
+    view_consensus(args.fixture_ids, args.output_format)
@@ -0,0 +1,242 @@
+import argparse
+import sys
+
+def _cmd_init(args):
+    import database
+    from migrations import check_query_plans, migrate
+
+    version = migrate()
+    if version is None:
+        return 1
+    print(f"Database {database.DATABASE_NAME} is at schema version {version}.")
+    if args.check:
+        failures = check_query_plans()
+        for name, detail in failures:
+            print(f"FULL SCAN in {name}: {detail}")
+        if failures:
+            return 1
+        print("All hot queries use indexes.")
+
+def _cmd_import(args):
+    from import_data import fetch_and_store_all
+
+    fetch_and_store_all(
+        concurrent=args.concurrent, max_workers=args.workers, budget=args.budget,
+        http_cache=args.http_cache, cache_ttl=args.cache_ttl, book_odds=args.book_odds,
+    )
+    if args.scan:
+        from value_scan import run_scan
+
+        run_scan()
+
+def _cmd_schedule(args):
+    from scheduler import run_scheduler
+
+    run_scheduler(once=args.once, budget=args.budget)
+
+def _cmd_daemon(args):
+    from daemon import run_daemon
+
+    run_daemon(
+        once=args.once, budget=args.budget, stub=args.stub, concurrency=args.concurrency, timeout=args.timeout,
+        retries=args.retries, use_cache=not args.no_cache, book_odds=args.book_odds,
+        http_cache=args.http_cache, cache_ttl=args.cache_ttl, report_interval=args.report_interval,
+    )
+
+def _cmd_generate(args):
+    import generate_picks
+
+    if args.batch:
+        generate_picks.generate_picks_batch(
+            pick_model=generate_picks.StubModel() if args.stub else None,
+            concurrency=args.concurrency,
+            timeout=args.timeout,
+            retries=args.retries,
+            use_cache=not args.no_cache,
+            refresh=args.refresh,
+        )
+    else:
+        generate_picks.generate_and_save_picks(use_cache=not args.no_cache)
+
+def _cmd_view(args):
+    from report import view_options
+
+    options = view_options(args)
+    if args.what == "nfl":
+        from view_data import view_fixtures
+
+        view_fixtures(**options)
+    elif args.what == "epl":
+        from view_epl import view_epl_fixtures
+
+        view_epl_fixtures(**options)
+    elif args.what == "picks":
+        from view_picks import view_picks
+
+        view_picks(**options)
+
+def _cmd_odds(args):
+    from odds_store import view_consensus
+
+    view_consensus(args.fixture_ids, args.output_format)
+
+def _cmd_ladder(args):
+    from line_ladder import print_ladder
+
+    print_ladder(args.fixture_id, args.market)
+
+def _cmd_scan(args):
+    from value_scan import run_scan, view_flags
+
+    if run_scan(args.edge, args.min_books) is None:
+        return 1
+    if args.show:
+        view_flags(args.output_format)
+
+def _cmd_export(args):
+    from export import export
+
+    if export(args.out, args.file_format, args.compression, args.full) is None:
+        return 1
+
+def _cmd_serve(args):
+    from api import serve
+
+    serve(args.host, args.port, verbose=args.verbose)
+
+def _cmd_settle(args):
+    from settle import settle
+
+    settle(args.file, args.base_url, args.days_from)
+
+def _cmd_analyze(args):
+    from analyze_picks import main_menu, rebuild_pick_stats
+
+    if args.rebuild_stats:
+        rebuild_pick_stats()
+    else:
+        main_menu()
+
+def build_parser():
+    from report import FORMATS, add_view_arguments
+
+    parser = argparse.ArgumentParser(prog="pickatron", description="Sports odds import, pick generation and reporting.")
+    parser.add_argument("--metrics", action="store_true", help="print span timings and counters when the command ends")
+    parser.add_argument("--metrics-json", metavar="PATH", help="write a JSON run summary of timings and counters")
+    parser.add_argument("--metrics-prom", metavar="PATH", help="write metrics as a node_exporter textfile (*.prom)")
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND", required=True)
+
+    init = commands.add_parser("init", help="create or migrate the database schema")
+    init.add_argument("--check", action="store_true", help="fail if a hot query would scan a whole table")
+    init.set_defaults(func=_cmd_init)
+
+    fetch = commands.add_parser("import", help="fetch fixtures and odds for all configured leagues")
+    fetch.add_argument("--concurrent", action="store_true", help="fetch leagues in parallel")
+    fetch.add_argument("--workers", type=int, default=4, help="maximum concurrent league requests")
+    fetch.add_argument("--budget", type=int, help="daily odds API quota budget; trims markets/regions to fit")
+    fetch.add_argument("--http-cache", choices=["cache", "record", "replay"],
+                       help="serve responses from the on-disk cache, record every response, or replay offline")
+    fetch.add_argument("--cache-ttl", type=int, help="seconds a cached response stays fresh in cache mode")
+    fetch.add_argument("--book-odds", action="store_true", help="also store every bookmaker's quotes for consensus queries")
+    fetch.add_argument("--scan", action="store_true", help="run the arbitrage/value scan after importing")
+    fetch.set_defaults(func=_cmd_import)
+
+    schedule = commands.add_parser("schedule", help="keep fixtures fresh, polling more often as kickoff nears")
+    schedule.add_argument("--once", action="store_true", help="run a single scheduling round and exit")
+    schedule.add_argument("--budget", type=int, help="daily odds API quota budget; trims markets/regions to fit")
+    schedule.set_defaults(func=_cmd_schedule)
+
+    daemon = commands.add_parser("daemon", help="run fetch, store and pick generation as one long-running pipeline")
+    daemon.add_argument("--once", action="store_true", help="run a single round, drain the pipeline and exit")
+    daemon.add_argument("--budget", type=int, help="daily odds API quota budget; trims markets/regions to fit")
+    daemon.add_argument("--stub", action="store_true", help="use the offline stub model instead of Gemini")
+    daemon.add_argument("--concurrency", type=int, default=4, help="maximum concurrent model calls")
+    daemon.add_argument("--timeout", type=float, default=60.0, help="seconds allowed per model call")
+    daemon.add_argument("--retries", type=int, default=2, help="retries per fixture after a failed call")
+    daemon.add_argument("--no-cache", action="store_true", help="always call the model, bypassing the response cache")
+    daemon.add_argument("--book-odds", action="store_true", help="also store every bookmaker's quotes for consensus queries")
+    daemon.add_argument("--http-cache", choices=["cache", "record", "replay"],
+                        help="serve responses from the on-disk cache, record every response, or replay offline")
+    daemon.add_argument("--cache-ttl", type=int, help="seconds a cached response stays fresh in cache mode")
+    daemon.add_argument("--report-interval", type=float, default=30.0,
+                        help="seconds between per-stage queue depth and throughput reports")
+    daemon.set_defaults(func=_cmd_daemon)
+
+    generate = commands.add_parser("generate", help="generate picks with Gemini")
+    generate.add_argument("--batch", action="store_true", help="generate picks for every upcoming fixture without one")
+    generate.add_argument("--concurrency", type=int, default=4, help="maximum concurrent model calls in batch mode")
+    generate.add_argument("--timeout", type=float, default=60.0, help="seconds allowed per model call")
+    generate.add_argument("--retries", type=int, default=2, help="retries per fixture after a failed call")
+    generate.add_argument("--stub", action="store_true", help="use the offline stub model instead of Gemini")
+    generate.add_argument("--no-cache", action="store_true", help="always call the model, bypassing the response cache")
+    generate.add_argument("--refresh", action="store_true", help="in batch mode, also re-pick fixtures whose odds moved")
+    generate.set_defaults(func=_cmd_generate)
+
+    view = commands.add_parser("view", help="print fixtures or picks")
+    view.add_argument("what", choices=["nfl", "epl", "picks"], help="which table to show")
+    add_view_arguments(view)
+    view.set_defaults(func=_cmd_view)
+
+    odds = commands.add_parser("odds", help="best price, median price and book count per outcome from per-book odds")
+    odds.add_argument("fixture_ids", nargs="+", help="fixture ids to summarize")
+    odds.add_argument("--format", dest="output_format", choices=FORMATS, default="text",
+                      help="text (default), compact one line per row, csv or jsonl")
+    odds.set_defaults(func=_cmd_odds)
+
+    ladder = commands.add_parser("ladder", help="show a fixture's alternate-line ladder with the main line marked")
+    ladder.add_argument("fixture_id", help="fixture id")
+    ladder.add_argument("--market", default="totals", help="spreads or totals (default totals)")
+    ladder.set_defaults(func=_cmd_ladder)
+
+    scan = commands.add_parser("scan", help="implied probabilities, vig removal and arbitrage/value flags")
+    scan.add_argument("--edge", type=float, default=0.03, help="minimum edge to flag as value (0.03 = 3%%)")
+    scan.add_argument("--min-books", type=int, default=3, help="books needed for a consensus price")
+    scan.add_argument("--show", action="store_true", help="list flagged outcomes after the scan")
+    scan.add_argument("--format", dest="output_format", choices=FORMATS, default="text",
+                      help="text (default), compact one line per row, csv or jsonl")
+    scan.set_defaults(func=_cmd_scan)
+
+    export = commands.add_parser("export", help="write fixtures, picks and odds history to partitioned Parquet/Arrow files")
+    export.add_argument("--out", default="export", help="output directory (default export)")
+    export.add_argument("--format", dest="file_format", choices=["parquet", "arrow"], default="parquet",
+                        help="parquet (default) or arrow IPC files, which can be memory-mapped")
+    export.add_argument("--compression", choices=["zstd", "lz4", "none"], default="zstd",
+                        help="column compression; use none with --format arrow for zero-copy reads")
+    export.add_argument("--full", action="store_true", help="rewrite every partition instead of only changed ones")
+    export.set_defaults(func=_cmd_export)
+
+    serve = commands.add_parser("serve", help="serve fixtures, odds, picks and ROI as JSON over local HTTP")
+    serve.add_argument("--host", default="127.0.0.1", help="address to bind (default 127.0.0.1)")
+    serve.add_argument("--port", type=int, default=8765, help="port to listen on (default 8765)")
+    serve.add_argument("--verbose", action="store_true", help="log every request")
+    serve.set_defaults(func=_cmd_serve)
+
+    settle = commands.add_parser("settle", help="grade pending picks from final scores")
+    settle.add_argument("--file", help="read scores from a JSON file in the scores endpoint's format")
+    settle.add_argument("--base-url", default="https://api.the-odds-api.com", help="scores API host, e.g. a local stand-in server")
+    settle.add_argument("--days-from", type=int, default=3, help="days of completed games to request (1-3)")
+    settle.set_defaults(func=_cmd_settle)
+
+    analyze = commands.add_parser("analyze", help="interactive pick report, results entry and ROI")
+    analyze.add_argument("--rebuild-stats", action="store_true", help="recompute pick_stats from all settled picks and exit")
+    analyze.set_defaults(func=_cmd_analyze)
+
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    finally:
+        if args.metrics or args.metrics_json or args.metrics_prom:
+            import metrics
+
+            if args.metrics:
+                metrics.print_summary()
+            if args.metrics_json:
+                metrics.write_json(args.metrics_json)
+            if args.metrics_prom:
+                metrics.write_prometheus(args.metrics_prom)
+
+if __name__ == "__main__":
+    sys.exit(main())
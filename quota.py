@@ -0,0 +1,183 @@
+import argparse
+import threading
+from datetime import datetime, timezone
+
+import metrics
+from database import get_connection, release_connection
+from migrations import migrate
+from sports_config import SPORTS
+
+DATABASE_NAME = "picks.db"
+
+# Dropped first when a run has to be trimmed to fit the budget
+OPTIONAL_MARKETS = tuple(sorted({m for cfg in SPORTS.values() for m in cfg.get("optional_markets", [])}))
+
+def estimate_cost(regions, markets):
+    """Predicted quota cost of one odds request: one unit per market per region."""
+    return len([r for r in regions.split(",") if r]) * len(markets)
+
+def _degrade(regions, markets):
+    """Returns the next cheaper (regions, markets) for a request, or None if nothing is left to drop.
+
+    Order: drop optional markets (btts), then every region but the first, then
+    every market but h2h.
+    """
+    kept = [m for m in markets if m not in OPTIONAL_MARKETS]
+    if kept != list(markets) and kept:
+        return regions, kept
+    region_list = regions.split(",")
+    if len(region_list) > 1:
+        return region_list[0], list(markets)
+    if len(markets) > 1 and "h2h" in markets:
+        return regions, ["h2h"]
+    return None
+
+def _header_int(headers, name):
+    try:
+        return int(float(headers.get(name)))
+    except (TypeError, ValueError):
+        return None
+
+class QuotaManager:
+    """Tracks odds API usage from the x-requests-* response headers and fits runs to a daily budget.
+
+    Usage observed during a run is kept in memory (workers may report it from
+    several threads) and written to the api_usage table by save(). Requests
+    submitted ahead of their responses hold their estimated cost via reserve()
+    until observe() sees the charge, so the allowance counts them as spent.
+    """
+
+    def __init__(self, daily_budget=None, path=None):
+        self.daily_budget = daily_budget
+        self.path = path or DATABASE_NAME
+        self._lock = threading.Lock()
+        self._pending = []
+        self.remaining = None
+        self.used = None
+        self.spent_this_run = 0
+        self._reserved = 0
+        migrate(self.path, verbose=False)
+        conn = get_connection(self.path)
+        row = conn.execute(
+            "SELECT used, remaining FROM api_usage WHERE remaining IS NOT NULL ORDER BY id DESC LIMIT 1"
+        ).fetchone()
+        if row:
+            self.used, self.remaining = row
+
+    def observe(self, response, sport_key, regions, markets):
+        """Records the usage headers from one odds API response."""
+        headers = getattr(response, "headers", None) or {}
+        last = _header_int(headers, "x-requests-last")
+        estimated = estimate_cost(regions, markets)
+        if getattr(response, "status_code", 200) >= 400 and last is None:
+            estimated = 0  # rejected requests are not charged
+        with self._lock:
+            self._reserved = max(self._reserved - estimate_cost(regions, markets), 0)
+            used = _header_int(headers, "x-requests-used")
+            remaining = _header_int(headers, "x-requests-remaining")
+            if remaining is not None:
+                self.used, self.remaining = used, remaining
+            self.spent_this_run += last if last is not None else estimated
+            metrics.incr("api_quota_used", last if last is not None else estimated)
+            if remaining is not None:
+                metrics.set_gauge("api_requests_remaining", remaining)
+            self._pending.append((
+                datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                sport_key, regions, ",".join(markets), estimated, last, used, remaining,
+            ))
+
+    def save(self):
+        """Writes usage observed so far to api_usage."""
+        with self._lock:
+            rows, self._pending = self._pending, []
+        if not rows:
+            return
+        conn = get_connection(self.path)
+        try:
+            with conn:
+                conn.executemany('''
+                    INSERT INTO api_usage
+                        (requested_at, sport_key, regions, markets, estimated_cost, last_cost, used, remaining)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', rows)
+        finally:
+            release_connection(conn)
+
+    def spent_today(self):
+        """Quota spent since midnight UTC, preferring the charged cost over the estimate."""
+        midnight = datetime.now(timezone.utc).strftime("%Y-%m-%dT00:00:00Z")
+        conn = get_connection(self.path)
+        saved = conn.execute(
+            "SELECT COALESCE(SUM(COALESCE(last_cost, estimated_cost)), 0) FROM api_usage WHERE requested_at >= ?",
+            (midnight,),
+        ).fetchone()[0]
+        with self._lock:
+            unsaved = sum(row[5] if row[5] is not None else row[4] for row in self._pending)
+        return saved + unsaved
+
+    def allowance(self):
+        """Units this run may still spend: the smaller of the day's budget left and the account's remaining quota."""
+        limits = []
+        if self.daily_budget is not None:
+            limits.append(max(self.daily_budget - self.spent_today(), 0))
+        if self.remaining is not None:
+            limits.append(self.remaining)
+        if not limits:
+            return None
+        with self._lock:
+            reserved = self._reserved
+        return max(min(limits) - reserved, 0)
+
+    def can_afford(self, regions, markets):
+        allowance = self.allowance()
+        return allowance is None or estimate_cost(regions, markets) <= allowance
+
+    def reserve(self, regions, markets):
+        """Holds a request's estimated cost against the allowance until observe() records it.
+
+        Returns False, reserving nothing, if the request does not fit.
+        """
+        if not self.can_afford(regions, markets):
+            return False
+        with self._lock:
+            self._reserved += estimate_cost(regions, markets)
+        return True
+
+    def plan(self, jobs):
+        """Fits (sport_name, league, regions, markets) jobs to the allowance.
+
+        Returns the jobs to run, with regions/markets trimmed where needed. The
+        most expensive request is degraded first; leagues are dropped only when
+        nothing is left to trim.
+        """
+        jobs = list(jobs)
+        allowance = self.allowance()
+        if allowance is None:
+            return jobs
+        planned = [[sport_name, league, regions, list(markets)] for sport_name, league, regions, markets in jobs]
+        while planned and sum(estimate_cost(job[2], job[3]) for job in planned) > allowance:
+            job = max(planned, key=lambda job: estimate_cost(job[2], job[3]))
+            cheaper = _degrade(job[2], job[3])
+            if cheaper is None:
+                planned.remove(job)
+                print(f"  Quota: skipping {job[1]['name']} to stay within {allowance} quota units.")
+            else:
+                job[2], job[3] = cheaper
+        for sport_name, league, regions, markets in planned:
+            original = next(j for j in jobs if j[1] is league)
+            if (regions, markets) != (original[2], list(original[3])):
+                print(f"  Quota: {league['name']} trimmed to regions {regions}, markets {markets}.")
+        return [tuple(job) for job in planned]
+
+def usage_report(path=None):
+    """Prints the account's last known usage and today's spend."""
+    quota = QuotaManager(path=path)
+    print("--- Odds API Usage ---")
+    print(f"Used: {quota.used if quota.used is not None else 'unknown'}  "
+          f"Remaining: {quota.remaining if quota.remaining is not None else 'unknown'}")
+    print(f"Spent today (UTC): {quota.spent_today()}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show recorded odds API quota usage.")
+    parser.parse_args()
+    usage_report()
@@ -0,0 +1,110 @@
+import csv
+import io
+import itertools
+import json
+import sys
+
+FORMATS = ("text", "compact", "csv", "jsonl")
+CHUNK_ROWS = 500  # rows rendered per buffered write
+
+def add_view_arguments(parser):
+    """Adds the paging, filtering and output-format options shared by the view commands."""
+    parser.add_argument("--limit", type=int, help="show at most N rows")
+    parser.add_argument("--offset", type=int, default=0, help="skip the first N rows")
+    parser.add_argument("--since", help="only games starting at or after this ISO time (e.g. 2025-09-01)")
+    parser.add_argument("--until", help="only games starting before this ISO time")
+    parser.add_argument("--team", help="only games involving a team whose name contains this text")
+    parser.add_argument("--format", dest="output_format", choices=FORMATS, default="text",
+                        help="text (default), compact one line per row, csv or jsonl")
+
+def view_options(args):
+    """Picks the shared view options out of parsed arguments as keyword arguments."""
+    return {
+        "limit": args.limit,
+        "offset": args.offset,
+        "since": args.since,
+        "until": args.until,
+        "team": args.team,
+        "output_format": args.output_format,
+    }
+
+def build_filters(time_column, team_columns, since=None, until=None, team=None):
+    """Returns (WHERE clause or "", params) for the time window and team filters."""
+    clauses = []
+    params = []
+    if since:
+        clauses.append(f"{time_column} >= ?")
+        params.append(since)
+    if until:
+        clauses.append(f"{time_column} < ?")
+        params.append(until)
+    if team:
+        clauses.append("(" + " OR ".join(f"{column} LIKE ?" for column in team_columns) + ")")
+        params.extend(f"%{team}%" for _ in team_columns)
+    if not clauses:
+        return "", params
+    return "WHERE " + " AND ".join(clauses), params
+
+def paging(limit=None, offset=0):
+    """Returns (LIMIT/OFFSET clause, params)."""
+    return "LIMIT ? OFFSET ?", [-1 if limit is None else limit, offset or 0]
+
+def fmt(value):
+    """Formats a nullable column value for display."""
+    return "N/A" if value is None else f"{value}"
+
+def write_rows(cursor, columns, output_format="text", render_text=None, render_compact=None, title=None,
+               empty_message=None, out=None):
+    """Streams cursor rows to `out` in the requested format. Returns the number of rows written.
+
+    cursor may also be any iterator of row tuples. Rows are pulled from it lazily and rendered into buffered chunks, so
+    memory stays flat regardless of how many rows the query returns.
+    """
+    out = out or sys.stdout
+    written = 0
+    chunk = []
+    csv_buffer = io.StringIO()
+    csv_writer = csv.writer(csv_buffer, lineterminator="\n")
+
+    def render(row):
+        if output_format == "jsonl":
+            return json.dumps(dict(zip(columns, row))) + "\n"
+        if output_format == "csv":
+            csv_writer.writerow(row)
+            text = csv_buffer.getvalue()
+            csv_buffer.seek(0)
+            csv_buffer.truncate()
+            return text
+        if output_format == "compact":
+            if render_compact:
+                return render_compact(row) + "\n"
+            return " | ".join(fmt(value) for value in row) + "\n"
+        return render_text(row)
+
+    if hasattr(cursor, "fetchmany"):
+        fetch = cursor.fetchmany
+    else:
+        rows_iter = iter(cursor)
+        fetch = lambda size: list(itertools.islice(rows_iter, size))
+
+    while True:
+        rows = fetch(CHUNK_ROWS)
+        if not rows:
+            break
+        if not written:
+            if output_format == "csv":
+                csv_writer.writerow(columns)
+                chunk.append(csv_buffer.getvalue())
+                csv_buffer.seek(0)
+                csv_buffer.truncate()
+            elif output_format == "text" and title:
+                chunk.append(title + "\n")
+        chunk.extend(render(row) for row in rows)
+        written += len(rows)
+        out.write("".join(chunk))
+        chunk = []
+
+    if not written and empty_message and output_format in ("text", "compact"):
+        out.write(empty_message + "\n")
+    out.flush()
+    return written
@@ -0,0 +1,209 @@
+import argparse
+import sqlite3
+import time
+from datetime import datetime, timedelta, timezone
+
+import requests
+
+import import_data
+from database import get_connection, release_connection
+from migrations import migrate
+from quota import QuotaManager
+
+# (time to kickoff below, refresh every). Games further out than the last bound use
+# DISTANT_INTERVAL; games that have kicked off are no longer refreshed.
+CADENCE = (
+    (timedelta(hours=1), timedelta(minutes=5)),
+    (timedelta(hours=6), timedelta(minutes=15)),
+    (timedelta(hours=24), timedelta(hours=1)),
+    (timedelta(hours=72), timedelta(hours=3)),
+)
+DISTANT_INTERVAL = timedelta(hours=12)
+# Full league pull (no filters) that picks up newly listed fixtures
+DISCOVERY_INTERVAL = timedelta(hours=6)
+MAX_EVENT_IDS = 50  # above this a request falls back to the commence-time window alone
+MIN_SLEEP = timedelta(seconds=30)
+RETRY_DELAY = timedelta(minutes=5)  # wait after a failed request before trying that league again
+
+_TIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+def _parse_time(value):
+    return datetime.strptime(value, _TIME_FORMAT).replace(tzinfo=timezone.utc)
+
+def _format_time(value):
+    return value.astimezone(timezone.utc).strftime(_TIME_FORMAT)
+
+def refresh_interval(kickoff, now):
+    """Returns how often a fixture kicking off at `kickoff` should be refreshed, or None once started."""
+    remaining = kickoff - now
+    if remaining <= timedelta(0):
+        return None
+    for bound, interval in CADENCE:
+        if remaining < bound:
+            return interval
+    return DISTANT_INTERVAL
+
+def _upcoming_fixtures(conn, table, now):
+    """Returns [(fixture id, kickoff)] for fixtures that have not started, by kickoff."""
+    cursor = conn.execute(
+        f"SELECT id, commence_time FROM {table} WHERE commence_time > ? ORDER BY commence_time",
+        (_format_time(now),),
+    )
+    fixtures = []
+    for fixture_id, commence_time in cursor:
+        try:
+            fixtures.append((fixture_id, _parse_time(commence_time)))
+        except (TypeError, ValueError):
+            continue
+    return fixtures
+
+def plan_league_request(fixtures, last_fetched, now):
+    """Works out which fixtures are due and the query filters that fetch just those.
+
+    Returns (filters, due fixture ids, next due time). filters is None when nothing
+    is due yet. next due time is when the earliest fixture becomes due after this
+    round, or None if no fixture needs further refreshes.
+    """
+    due = []
+    next_due = None
+    for fixture_id, kickoff in fixtures:
+        interval = refresh_interval(kickoff, now)
+        if interval is None:
+            continue
+        last = last_fetched.get(fixture_id)
+        if last is None or now - last >= interval:
+            due.append((fixture_id, kickoff))
+            # Refreshed now, so due again one interval later (but not after kickoff)
+            candidate = now + interval
+        else:
+            candidate = last + interval
+        if candidate < kickoff and (next_due is None or candidate < next_due):
+            next_due = candidate
+    if not due:
+        return None, [], next_due
+
+    kickoffs = [kickoff for _, kickoff in due]
+    filters = {
+        "commenceTimeFrom": _format_time(min(kickoffs)),
+        "commenceTimeTo": _format_time(max(kickoffs)),
+    }
+    if len(due) <= MAX_EVENT_IDS:
+        filters["eventIds"] = ",".join(fixture_id for fixture_id, _ in due)
+    return filters, [fixture_id for fixture_id, _ in due], next_due
+
+def _fetch_league(session, conn, sport_name, league, regions, markets, filters, quota=None):
+    """Pulls one league (optionally filtered) and stores it. Returns the fetched event ids, or None if over quota."""
+    if quota:
+        planned = quota.plan([(sport_name, league, regions, markets)])
+        if not planned:
+            return None
+        _, _, regions, markets = planned[0]
+    fetched = []
+    inserted = updated = snapshots = 0
+    games = import_data._stream_league(session, sport_name, league, regions, markets, filters, quota)
+    for batch in import_data._batches(import_data._league_item(sport_name, game) for game in games):
+        fetched.extend(row[0] for row, _ in batch)
+        counts = import_data._store_items(conn, sport_name, league["table"], batch)
+        inserted, updated, snapshots = (total + count for total, count in zip((inserted, updated, snapshots), counts))
+    print(f"  {league['name']}: {len(fetched)} fixtures. Inserted: {inserted}, Updated: {updated}, Odds snapshots: {snapshots}.")
+    return fetched
+
+def poll_once(session, conn, state, now=None, quota=None):
+    """Runs one scheduling round over every league. Returns when the next round is due.
+
+    state carries "last_fetched" ({fixture id: datetime}) and "last_discovery"
+    ({league name: datetime}) between rounds.
+    """
+    now = now or datetime.now(timezone.utc)
+    last_fetched = state.setdefault("last_fetched", {})
+    last_discovery = state.setdefault("last_discovery", {})
+    wake = now + DISCOVERY_INTERVAL
+    upcoming_ids = set()
+
+    for sport_name, league, regions, markets in import_data._league_jobs():
+        name = league["name"]
+        try:
+            skipped = False
+            discovered = last_discovery.get(name)
+            if discovered is None or now - discovered >= DISCOVERY_INTERVAL:
+                print(f"{name}: full refresh")
+                fetched = _fetch_league(session, conn, sport_name, league, regions, markets, None, quota)
+                skipped = fetched is None
+                if not skipped:
+                    for fixture_id in fetched:
+                        last_fetched[fixture_id] = now
+                    last_discovery[name] = now
+            else:
+                fixtures = _upcoming_fixtures(conn, league["table"], now)
+                filters, due_ids, _ = plan_league_request(fixtures, last_fetched, now)
+                if filters:
+                    print(f"{name}: refreshing {len(due_ids)} fixtures due")
+                    fetched = _fetch_league(session, conn, sport_name, league, regions, markets, filters, quota)
+                    skipped = fetched is None
+                    if not skipped:
+                        # Mark every requested id, including any the API no longer lists
+                        for fixture_id in due_ids:
+                            last_fetched[fixture_id] = now
+            if skipped:
+                # Over quota, so nothing was fetched: the league stays due and is retried after a pause
+                wake = min(wake, now + RETRY_DELAY)
+            else:
+                wake = min(wake, last_discovery[name] + DISCOVERY_INTERVAL)
+        except requests.exceptions.RequestException as e:
+            print(f"{name}: error fetching data from API: {e}")
+            wake = min(wake, now + RETRY_DELAY)
+        except sqlite3.Error as e:
+            print(f"{name}: database error: {e}")
+            wake = min(wake, now + RETRY_DELAY)
+        except (KeyError, ValueError) as e:
+            print(f"{name}: invalid API response: {e}")
+            wake = min(wake, now + RETRY_DELAY)
+
+        fixtures = _upcoming_fixtures(conn, league["table"], now)
+        upcoming_ids.update(fixture_id for fixture_id, _ in fixtures)
+        _, _, next_due = plan_league_request(fixtures, last_fetched, now)
+        if next_due is not None:
+            wake = min(wake, next_due)
+
+    if quota:
+        quota.save()
+    # Forget fixtures that have kicked off or dropped off the board
+    for fixture_id in [f for f in last_fetched if f not in upcoming_ids]:
+        del last_fetched[fixture_id]
+    return max(wake, now + MIN_SLEEP)
+
+def run_scheduler(once=False, budget=None):
+    """Keeps fixtures fresh, refreshing each one more often as its kickoff approaches."""
+    if not import_data.API_KEY:
+        print("Error: ODDS_API_KEY not found. Please check your .env file.")
+        return
+
+    migrate(import_data.DATABASE_NAME, verbose=False)
+    conn = None
+    session = import_data._create_session(pool_size=1)
+    state = {}
+    try:
+        conn = get_connection(import_data.DATABASE_NAME)
+        quota = QuotaManager(daily_budget=budget, path=import_data.DATABASE_NAME)
+        while True:
+            wake = poll_once(session, conn, state, quota=quota)
+            if once:
+                return
+            delay = (wake - datetime.now(timezone.utc)).total_seconds()
+            print(f"Next refresh at {_format_time(wake)}.")
+            time.sleep(max(delay, 0))
+    except KeyboardInterrupt:
+        print("Scheduler stopped.")
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+    finally:
+        session.close()
+        if conn:
+            release_connection(conn)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh fixtures on a cadence set by time to kickoff.")
+    parser.add_argument("--once", action="store_true", help="run a single scheduling round and exit")
+    parser.add_argument("--budget", type=int, help="daily odds API quota budget; trims markets/regions to fit")
+    args = parser.parse_args()
+    run_scheduler(once=args.once, budget=args.budget)
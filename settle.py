@@ -0,0 +1,226 @@
+import argparse
+import json
+import os
+import re
+import sqlite3
+
+import requests
+from dotenv import load_dotenv
+
+from analyze_picks import _set_pick_result
+from database import get_connection, release_connection
+from migrations import migrate
+from sports_config import SPORTS
+
+load_dotenv()
+API_KEY = os.getenv("ODDS_API_KEY")
+
+API_BASE_URL = "https://api.the-odds-api.com"
+DATABASE_NAME = "picks.db"
+DAYS_FROM = 3  # the scores endpoint returns completed games from up to 3 days back
+_ID_CHUNK = 500  # bound on game ids per IN (...) lookup
+
+# nfl_picks holds picks for the NFL league; its scores come from that league's sport key
+PICKS_SPORT_KEY = SPORTS["American Football"]["leagues"][0]["sport_key"]
+
+_MARKETS = {
+    "moneyline": "moneyline", "h2h": "moneyline",
+    "spread": "spread", "spreads": "spread", "point spread": "spread",
+    "total": "total", "totals": "total", "over/under": "total",
+    "3-way": "three_way", "3-way moneyline": "three_way", "1x2": "three_way", "match result": "three_way",
+    "btts": "btts", "both teams to score": "btts",
+}
+_NUMBER = re.compile(r"[+-]?\d+(?:\.\d+)?")
+
+def fetch_scores(sport_key, days_from=DAYS_FROM, base_url=API_BASE_URL, session=None):
+    """Fetches recent events with scores from the odds provider (or a stand-in server at base_url)."""
+    url = f"{base_url.rstrip('/')}/v4/sports/{sport_key}/scores/"
+    params = {"daysFrom": days_from}
+    if base_url == API_BASE_URL:
+        params["apiKey"] = API_KEY  # never hand the real key to a stand-in host
+    response = (session or requests).get(url, params=params, timeout=30)
+    response.raise_for_status()
+    return response.json()
+
+def load_scores_file(path):
+    """Reads events in the scores endpoint's JSON shape from a local file."""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def final_scores(events):
+    """Returns {event id: (home score, away score)} for completed events with both scores."""
+    finals = {}
+    for event in events:
+        if not event.get("completed") or not event.get("scores"):
+            continue
+        by_team = {s.get("name"): s.get("score") for s in event["scores"]}
+        home, away = by_team.get(event.get("home_team")), by_team.get(event.get("away_team"))
+        if home is None or away is None:
+            continue
+        try:
+            finals[event["id"]] = (float(home), float(away))
+        except (TypeError, ValueError):
+            continue
+    return finals
+
+def _compare(margin):
+    if margin > 0:
+        return "WIN"
+    if margin < 0:
+        return "LOSS"
+    return "PUSH"
+
+def _picked_side(pick_lower, home_team, away_team):
+    """Returns 'home', 'away' or None depending on which team the pick names."""
+    home_named = bool(home_team) and home_team.lower() in pick_lower
+    away_named = bool(away_team) and away_team.lower() in pick_lower
+    if home_named == away_named:
+        return None
+    return "home" if home_named else "away"
+
+def _line(pick_lower, team, fallback):
+    """Reads the line quoted in the pick text (after the team name), else the fixture's line."""
+    if team:
+        pick_lower = pick_lower.replace(team.lower(), " ")
+    if "pk" in pick_lower.split() or "pick'em" in pick_lower:
+        return 0.0
+    numbers = _NUMBER.findall(pick_lower)
+    return float(numbers[-1]) if numbers else fallback
+
+def grade_pick(market, pick, home_team, away_team, home_score, away_score, spread_points=None, total_points=None):
+    """Grades one pick against a final score. Returns WIN, LOSS, PUSH, or None if it can't be read.
+
+    spread_points (home perspective) and total_points are the fixture's stored
+    lines, used when the pick text doesn't quote its own line.
+    """
+    kind = _MARKETS.get((market or "").strip().lower())
+    pick_lower = (pick or "").strip().lower()
+    if not kind or not pick_lower:
+        return None
+
+    if kind in ("moneyline", "three_way"):
+        if kind == "three_way" and pick_lower in ("draw", "tie", "x"):
+            return "WIN" if home_score == away_score else "LOSS"
+        side = _picked_side(pick_lower, home_team, away_team)
+        if side is None:
+            return None
+        margin = home_score - away_score if side == "home" else away_score - home_score
+        if kind == "three_way" and margin == 0:
+            return "LOSS"
+        return _compare(margin)  # a tie on a two-way moneyline is a push
+
+    if kind == "spread":
+        side = _picked_side(pick_lower, home_team, away_team)
+        if side is None:
+            return None
+        team = home_team if side == "home" else away_team
+        stored = None
+        if spread_points is not None:
+            stored = spread_points if side == "home" else -spread_points
+        line = _line(pick_lower, team, stored)
+        if line is None:
+            return None
+        margin = home_score - away_score if side == "home" else away_score - home_score
+        return _compare(margin + line)
+
+    if kind == "total":
+        line = _line(pick_lower, None, total_points)
+        if line is None:
+            return None
+        total = home_score + away_score
+        if "over" in pick_lower:
+            return _compare(total - line)
+        if "under" in pick_lower:
+            return _compare(line - total)
+        return None
+
+    if kind == "btts":
+        both_scored = home_score > 0 and away_score > 0
+        if pick_lower in ("yes", "btts yes", "both teams to score"):
+            return "WIN" if both_scored else "LOSS"
+        if pick_lower in ("no", "btts no"):
+            return "LOSS" if both_scored else "WIN"
+        return None
+
+    return None
+
+def _pending_picks(cursor, game_ids):
+    """Yields unsettled picks for the given games with the fixture's teams and stored lines."""
+    game_ids = list(game_ids)
+    for start in range(0, len(game_ids), _ID_CHUNK):
+        chunk = game_ids[start:start + _ID_CHUNK]
+        placeholders = ", ".join("?" for _ in chunk)
+        cursor.execute(f'''
+            SELECT p.id, p.game_id, p.market, p.pick, f.home_team, f.away_team, f.spread_points, f.total_points
+            FROM nfl_picks AS p
+            JOIN nfl_fixtures AS f ON f.id = p.game_id
+            WHERE p.game_id IN ({placeholders}) AND p.result IS NULL
+        ''', chunk)
+        yield from cursor.fetchall()
+
+def settle_picks(finals):
+    """Grades every pending pick with a final score in one transaction. Returns (settled, ungraded).
+
+    Results and pick_stats are updated through analyze_picks._set_pick_result,
+    so the running totals stay in step with the manual entry path.
+    """
+    conn = None
+    settled = 0
+    ungraded = []
+    try:
+        conn = get_connection(DATABASE_NAME)
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            for pick_id, game_id, market, pick, home_team, away_team, spread_points, total_points in list(
+                _pending_picks(cursor, finals)
+            ):
+                home_score, away_score = finals[game_id]
+                result = grade_pick(market, pick, home_team, away_team, home_score, away_score,
+                                    spread_points, total_points)
+                if result is None:
+                    ungraded.append((pick_id, market, pick))
+                    continue
+                _set_pick_result(cursor, pick_id, result)
+                settled += 1
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    except sqlite3.Error as e:
+        print(f"Database error during settlement: {e}")
+        return 0, ungraded
+    finally:
+        if conn:
+            release_connection(conn)
+    return settled, ungraded
+
+def settle(path=None, base_url=API_BASE_URL, days_from=DAYS_FROM):
+    """Loads final scores from a file or the scores endpoint and settles pending picks."""
+    migrate(DATABASE_NAME, verbose=False)
+    try:
+        if path:
+            events = load_scores_file(path)
+        else:
+            if not API_KEY and base_url == API_BASE_URL:
+                print("ODDS_API_KEY is not set; pass --file to settle from a local scores file.")
+                return 0, []
+            events = fetch_scores(PICKS_SPORT_KEY, days_from, base_url)
+    except (requests.exceptions.RequestException, OSError, ValueError) as e:
+        print(f"Could not load scores: {e}")
+        return 0, []
+
+    finals = final_scores(events)
+    settled, ungraded = settle_picks(finals)
+    print(f"{len(finals)} completed games; settled {settled} picks.")
+    for pick_id, market, pick in ungraded:
+        print(f"  Could not grade pick {pick_id} ({market}: {pick}); enter its result manually.")
+    return settled, ungraded
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Settle pending picks from final scores.")
+    parser.add_argument("--file", help="read scores from a JSON file in the scores endpoint's format")
+    parser.add_argument("--base-url", default=API_BASE_URL, help="scores API host, e.g. a local stand-in server")
+    parser.add_argument("--days-from", type=int, default=DAYS_FROM, help="days of completed games to request (1-3)")
+    args = parser.parse_args()
+    settle(args.file, args.base_url, args.days_from)
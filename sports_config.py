@@ -11,10 +11,22 @@ SPORTS = {
             "spread_points", "spread_home_odds", "spread_away_odds",
             "total_points", "total_over_odds", "total_under_odds",
         ],
+        # How each market fills the fields above; see extract_plan.py for the rules.
+        # "$home"/"$away" stand for the event's team names.
+        "extract": [
+            {"rule": "best_price", "markets": ["h2h"],
+             "outcomes": {"$home": "moneyline_home_odds", "$away": "moneyline_away_odds"}},
+            {"rule": "best_spread", "markets": ["spreads"], "sides": ["$home", "$away"],
+             "fields": ["spread_points", "spread_home_odds", "spread_away_odds"]},
+            {"rule": "best_total", "markets": ["totals"], "sides": ["Over", "Under"],
+             "fields": ["total_points", "total_over_odds", "total_under_odds"]},
+        ],
     },
     "Soccer": {
         "regions": "uk,eu,us",
         "markets": ["h2h", "totals", "btts"],
+        # Not offered for every league; dropped on a 422 and first to go when over quota
+        "optional_markets": ["btts"],
         "leagues": [
             {"name": "EPL", "sport_key": "soccer_epl", "table": "epl_fixtures"},
             # Add more leagues here later
@@ -28,6 +40,15 @@ SPORTS = {
             # BTTS
             "btts_yes_odds", "btts_no_odds",
         ],
+        "extract": [
+            # some books may use h2h for 3-way
+            {"rule": "best_price", "markets": ["h2h_3_way", "h2h"], "ignore_case": True,
+             "outcomes": {"$home": "home_win_odds", "$away": "away_win_odds", "draw": "draw_odds"}},
+            {"rule": "best_total", "markets": ["totals"], "sides": ["Over", "Under"],
+             "fields": ["total_goals", "over_odds", "under_odds"]},
+            {"rule": "best_price", "markets": ["btts"], "ignore_case": True,
+             "outcomes": {"yes": "btts_yes_odds", "no": "btts_no_odds"}},
+        ],
     },
 }
 
@@ -0,0 +1,267 @@
+import argparse
+import sqlite3
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from database import get_connection, release_connection
+from migrations import migrate
+from report import FORMATS, fmt, write_rows
+from sports_config import SPORTS
+
+DATABASE_NAME = "picks.db"
+
+EDGE_THRESHOLD = 0.03  # flag an outcome whose best price beats the consensus fair price by 3%
+MIN_BOOKS = 3          # consensus needs at least this many books quoting the outcome
+
+# One row per priced outcome. source "best" rows come from the wide fixture
+# columns (market = spec market, outcome = column name); source "books" rows come
+# from book_odds (API market key and outcome name) and carry the consensus.
+COLUMNS = (
+    "fixture_id", "source", "market", "outcome", "point", "price", "implied_prob", "fair_prob",
+    "overround", "edge", "books", "arbitrage", "value",
+)
+
+def implied_probabilities(odds):
+    """1 / decimal odds, NaN where the price is missing or not a valid price (<= 1)."""
+    odds = np.asarray(odds, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(odds > 1, 1.0 / odds, np.nan)
+
+def remove_overround(probabilities):
+    """Normalizes each row of an (n, k) implied-probability matrix to sum to 1.
+
+    Returns (fair probabilities, overround = sum - 1). Rows missing any outcome
+    get NaN for both, since their margin cannot be known.
+    """
+    total = probabilities.sum(axis=1)
+    return probabilities / total[:, None], total - 1
+
+def _wide_markets(sport_name):
+    """Turns the sport's extract specs into [(market, [price field], point field or None, flip second point)]."""
+    markets = []
+    for spec in SPORTS[sport_name]["extract"]:
+        if spec["rule"] == "best_price":
+            markets.append((spec["markets"][-1], list(spec["outcomes"].values()), None, False))
+        else:
+            point_field, *price_fields = spec["fields"]
+            # A spread's second side is quoted at minus the first side's line
+            markets.append((spec["markets"][-1], price_fields, point_field, spec["rule"] == "best_spread"))
+    return markets
+
+def scan_best_prices(sport_name, rows):
+    """Scans wide fixture rows (ordered like SPORTS[sport_name]["fields"]) and returns COLUMNS tuples.
+
+    The best prices come from different books, so a market whose implied
+    probabilities sum below 1 is a cross-book arbitrage.
+    """
+    if not rows:
+        return []
+    fields = SPORTS[sport_name]["fields"]
+    ids = [row[0] for row in rows]
+    values = np.array([row[4:] for row in rows], dtype=float)  # None -> NaN
+    column = {field: i for i, field in enumerate(fields[4:])}
+    results = []
+    for market, price_fields, point_field, flip in _wide_markets(sport_name):
+        prices = values[:, [column[field] for field in price_fields]]
+        probabilities = implied_probabilities(prices)
+        fair, overround = remove_overround(probabilities)
+        arbitrage = overround < 0
+        points = values[:, column[point_field]] if point_field else np.zeros(len(rows))
+        for k, field in enumerate(price_fields):
+            present = np.flatnonzero(~np.isnan(probabilities[:, k]))
+            point = (-points if flip and k == 1 else points)[present]
+            n = len(present)
+            results.extend(zip(
+                [ids[i] for i in present.tolist()], ["best"] * n, [market] * n, [field] * n,
+                _column(point), prices[present, k].tolist(), probabilities[present, k].tolist(),
+                _column(fair[present, k]), _column(overround[present]),
+                [None] * n, [None] * n, arbitrage[present].astype(int).tolist(), [0] * n,
+            ))
+    return results
+
+def _column(values):
+    """A float array as a list for SQLite, NaN -> None."""
+    column = values.astype(object)
+    column[np.isnan(values)] = None
+    return column.tolist()
+
+def _group_ids(*keys):
+    """Dense group id per row for the combination of non-negative integer key arrays.
+
+    The keys are packed into one int64 (mixed radix) so a single 1-d unique does the grouping.
+    """
+    packed = np.zeros(len(keys[0]), dtype=np.int64)
+    for key in keys:
+        packed = packed * (int(key.max()) + 1) + key
+    return np.unique(packed, return_inverse=True)[1]
+
+def scan_book_odds(conn, edge_threshold=EDGE_THRESHOLD, min_books=MIN_BOOKS):
+    """Scans every stored per-book quote and returns COLUMNS tuples, one per (fixture, market, outcome, point).
+
+    Each book's own market (its quotes at one line) is de-vigged separately; the
+    consensus fair probability of an outcome is the median across books. The
+    edge is best price x consensus - 1, and a line whose best prices across books
+    imply less than 100% is an arbitrage.
+    """
+    rows = conn.execute('''
+        SELECT q.fixture_id, q.market_id, q.outcome_id, q.point, q.bookmaker_id, q.price, o.name
+        FROM book_odds AS q JOIN odds_outcomes AS o ON o.id = q.outcome_id
+    ''').fetchall()
+    if not rows:
+        return []
+    fixture_col, market_col, outcome_col, point_col, book_col, price_col, name_col = zip(*rows)
+    fixture_code = {fixture_id: i for i, fixture_id in enumerate(dict.fromkeys(fixture_col))}
+    away_teams = {}
+    for sport_cfg in SPORTS.values():
+        for league in sport_cfg["leagues"]:
+            away_teams.update(conn.execute(f"SELECT id, away_team FROM {league['table']}"))
+    markets = dict(conn.execute("SELECT id, key FROM odds_markets"))
+
+    fixture = np.array([fixture_code[fixture_id] for fixture_id in fixture_col], dtype=np.int64)
+    market = np.array(market_col, dtype=np.int64)
+    outcome = np.array(outcome_col, dtype=np.int64)
+    point = np.array(point_col, dtype=float)
+    book = np.array(book_col, dtype=np.int64)
+    price = np.array(price_col, dtype=float)
+    # The line both sides of a spread share, from the home side's view (the away side quotes minus it)
+    is_away = np.array([name == away_teams.get(f) for f, name in zip(fixture_col, name_col)], dtype=bool)
+    line = np.where(is_away, -point, point)
+    line_code = np.unique(np.round(line * 100).astype(np.int64), return_inverse=True)[1]
+
+    probability = implied_probabilities(price)
+    valid = ~np.isnan(probability)
+    probability = np.where(valid, probability, 0.0)
+
+    # One book's market at one line, e.g. book X's spread at -3.5
+    book_market = _group_ids(fixture, market, line_code, book)
+    book_total = np.bincount(book_market, weights=probability)
+    book_sides = np.bincount(book_market, weights=valid)
+    # The (fixture, market, line) every book's quotes belong to, and the outcome within it
+    line_group = _group_ids(fixture, market, line_code)
+    outcome_group = _group_ids(fixture, market, line_code, outcome)
+    # outcome_group refines line_group, so each outcome group maps to exactly one line
+    outcome_line = np.zeros(outcome_group.max() + 1, dtype=np.int64)
+    outcome_line[outcome_group] = line_group
+    n_outcomes = np.bincount(outcome_line)
+    # A book's margin is only known when it quotes every outcome of the line
+    complete = valid & (book_sides[book_market] == n_outcomes[line_group]) & (n_outcomes[line_group] > 1)
+    fair = np.where(complete, probability / np.where(book_total > 0, book_total, 1)[book_market], np.nan)
+
+    # Per outcome: best price and its row, book count, median of the books' fair probabilities
+    n_groups = outcome_group.max() + 1
+    books = np.bincount(outcome_group, weights=valid, minlength=n_groups).astype(np.int64)
+    by_price = np.lexsort((np.where(valid, price, -np.inf), outcome_group))
+    last = np.flatnonzero(np.r_[outcome_group[by_price][1:] != outcome_group[by_price][:-1], True])
+    best_row = by_price[last]
+    best = price[best_row]
+    by_fair = np.lexsort((np.where(np.isnan(fair), np.inf, fair), outcome_group))
+    fair_counts = np.bincount(outcome_group, weights=~np.isnan(fair), minlength=n_groups).astype(np.int64)
+    starts = np.r_[0, np.cumsum(np.bincount(outcome_group, minlength=n_groups))[:-1]]
+    low = fair[by_fair[starts + np.maximum(fair_counts - 1, 0) // 2]]
+    high = fair[by_fair[starts + fair_counts // 2]]
+    consensus = np.where(fair_counts > 0, (low + high) / 2, np.nan)
+
+    # Cross-book margin of each line from its best prices; only known when every outcome has one
+    best_probability = implied_probabilities(best)
+    group_line = line_group[best_row]
+    line_total = np.bincount(group_line, weights=np.nan_to_num(best_probability))
+    line_priced = np.bincount(group_line, weights=~np.isnan(best_probability))
+    overround = np.where(line_priced == n_outcomes, line_total - 1, np.nan)[group_line]
+    arbitrage = (overround < 0) & (n_outcomes[group_line] > 1)
+    edge = best * consensus - 1
+    value = (edge >= edge_threshold) & (fair_counts >= min_books)
+
+    rows_out = best_row.tolist()
+    n = len(rows_out)
+    return list(zip(
+        [fixture_col[r] for r in rows_out], ["books"] * n, [markets[market_col[r]] for r in rows_out],
+        [name_col[r] for r in rows_out], [point_col[r] for r in rows_out], best.tolist(),
+        _column(best_probability), _column(consensus), _column(overround), _column(edge),
+        books.tolist(), arbitrage.astype(int).tolist(), value.astype(int).tolist(),
+    ))
+
+def run_scan(edge_threshold=EDGE_THRESHOLD, min_books=MIN_BOOKS, path=None, verbose=True):
+    """Rescans every fixture and per-book quote and replaces the value_scan table.
+
+    Returns (rows written, arbitrage rows, value rows), or None on a database error.
+    """
+    path = path or DATABASE_NAME
+    migrate(path, verbose=False)
+    conn = None
+    try:
+        conn = get_connection(path)
+        start = time.perf_counter()
+        results = []
+        for sport_name, sport_cfg in SPORTS.items():
+            fields = sport_cfg["fields"]
+            for league in sport_cfg["leagues"]:
+                rows = conn.execute(f"SELECT {', '.join(fields)} FROM {league['table']}").fetchall()
+                results.extend(scan_best_prices(sport_name, rows))
+        results.extend(scan_book_odds(conn, edge_threshold, min_books))
+        scanned_at = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        with conn:
+            conn.execute("DELETE FROM value_scan")
+            conn.executemany(f'''
+                INSERT OR REPLACE INTO value_scan ({", ".join(COLUMNS)}, scanned_at)
+                VALUES ({", ".join("?" for _ in COLUMNS)}, ?)
+            ''', [row + (scanned_at,) for row in results])
+        arbitrages = sum(row[11] for row in results)
+        values = sum(row[12] for row in results)
+        if verbose:
+            print(f"Scanned {len(results)} outcomes in {(time.perf_counter() - start) * 1000:.1f} ms: "
+                  f"{arbitrages} in arbitrage, {values} with edge >= {edge_threshold:.0%}.")
+        return len(results), arbitrages, values
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return None
+    finally:
+        if conn:
+            release_connection(conn)
+
+def _render_flag(row):
+    fixture_id, source, market, outcome, point, price, implied, fair, overround, edge, books, arbitrage, value = row
+    flags = " ".join(flag for flag, on in (("ARB", arbitrage), ("VALUE", value)) if on)
+    line = f" {point:+g}" if point else ""
+    edge_text = f"{edge:+.1%}" if edge is not None else "N/A"
+    margin = f"{overround:+.1%}" if overround is not None else "N/A"
+    return (
+        f"[{flags}] {fixture_id}  {market} {outcome}{line} @ {fmt(price)}\n"
+        f"  Implied {implied:.1%}  Fair {fmt(None if fair is None else round(fair, 4))}  "
+        f"Edge {edge_text}  Market margin {margin}  Books {fmt(books)}\n"
+    )
+
+def view_flags(output_format="text", out=None):
+    """Streams value_scan rows flagged as arbitrage or value, largest edge first."""
+    conn = None
+    try:
+        conn = get_connection(DATABASE_NAME)
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT {", ".join(COLUMNS)} FROM value_scan
+            WHERE arbitrage OR value
+            ORDER BY edge IS NULL, edge DESC, overround
+        ''')
+        write_rows(
+            cursor, COLUMNS, output_format, _render_flag,
+            title="--- Arbitrage and Value Outcomes ---",
+            empty_message="No arbitrage or value outcomes in the last scan.",
+            out=out,
+        )
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+    finally:
+        if conn:
+            release_connection(conn)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scan fixtures and per-book odds for arbitrage and value.")
+    parser.add_argument("--edge", type=float, default=EDGE_THRESHOLD, help="minimum edge to flag as value (0.03 = 3%%)")
+    parser.add_argument("--min-books", type=int, default=MIN_BOOKS, help="books needed for a consensus price")
+    parser.add_argument("--show", action="store_true", help="list flagged outcomes after the scan")
+    parser.add_argument("--format", dest="output_format", choices=FORMATS, default="text",
+                        help="text (default), compact one line per row, csv or jsonl")
+    args = parser.parse_args()
+    if run_scan(args.edge, args.min_books) is not None and args.show:
+        view_flags(args.output_format)
@@ -1,75 +1,90 @@
+import argparse
 import sqlite3
+from database import get_connection, release_connection
+from report import add_view_arguments, build_filters, fmt, paging, view_options, write_rows
 
 DATABASE_NAME = "picks.db"
 
-def view_fixtures():
-    """Reads and prints the contents of the nfl_fixtures table with odds if available."""
+COLUMNS = (
+    "id",
+    "commence_time",
+    "away_team",
+    "home_team",
+    "moneyline_home_odds",
+    "moneyline_away_odds",
+    "spread_points",
+    "spread_home_odds",
+    "spread_away_odds",
+    "total_points",
+    "total_over_odds",
+    "total_under_odds",
+)
+
+def _render_fixture(row):
+    (
+        game_id,
+        commence_time,
+        away_team,
+        home_team,
+        ml_home,
+        ml_away,
+        spread_pts,
+        spread_home,
+        spread_away,
+        total_pts,
+        over_odds,
+        under_odds,
+    ) = row
+    home_spread = fmt(spread_pts)
+    away_spread = fmt(-spread_pts) if spread_pts is not None else "N/A"
+    return (
+        f"Game ID: {game_id}\n"
+        f"  Starts: {fmt(commence_time)}\n"
+        f"  Matchup: {fmt(away_team)} @ {fmt(home_team)}\n"
+        f"  Moneyline: {fmt(home_team)} ({fmt(ml_home)}) / {fmt(away_team)} ({fmt(ml_away)})\n"
+        f"  Spread: {fmt(home_team)} {home_spread} ({fmt(spread_home)}) / {fmt(away_team)} {away_spread} ({fmt(spread_away)})\n"
+        f"  Total: Over {fmt(total_pts)} ({fmt(over_odds)}) / Under {fmt(total_pts)} ({fmt(under_odds)})\n"
+        + "-" * 25 + "\n"
+    )
+
+def _render_compact(row):
+    game_id, commence_time, away_team, home_team, ml_home, ml_away, spread_pts, _, _, total_pts, _, _ = row
+    return (
+        f"{fmt(commence_time)}  {fmt(away_team)} @ {fmt(home_team)}  "
+        f"ML {fmt(ml_home)}/{fmt(ml_away)}  Spread {fmt(spread_pts)}  Total {fmt(total_pts)}  [{game_id}]"
+    )
+
+def view_fixtures(limit=None, offset=0, since=None, until=None, team=None, output_format="text", out=None):
+    """Streams the nfl_fixtures table with odds if available, filtered and paged in SQL."""
     conn = None
     try:
-        conn = sqlite3.connect(DATABASE_NAME)
+        conn = get_connection(DATABASE_NAME)
         cursor = conn.cursor()
 
-        cursor.execute('''
-            SELECT
-                id,
-                commence_time,
-                away_team,
-                home_team,
-                moneyline_home_odds,
-                moneyline_away_odds,
-                spread_points,
-                spread_home_odds,
-                spread_away_odds,
-                total_points,
-                total_over_odds,
-                total_under_odds
+        where, params = build_filters("commence_time", ("home_team", "away_team"), since, until, team)
+        limit_clause, limit_params = paging(limit, offset)
+        cursor.execute(f'''
+            SELECT {", ".join(COLUMNS)}
             FROM nfl_fixtures
+            {where}
             ORDER BY commence_time
-        ''')
-
-        rows = cursor.fetchall()
-
-        if not rows:
-            print("No data found in nfl_fixtures. Run import_data.py first.")
-            return
+            {limit_clause}
+        ''', params + limit_params)
 
-        print("--- NFL Fixtures ---")
-        for row in rows:
-            (
-                game_id,
-                commence_time,
-                away_team,
-                home_team,
-                ml_home,
-                ml_away,
-                spread_pts,
-                spread_home,
-                spread_away,
-                total_pts,
-                over_odds,
-                under_odds,
-            ) = row
-
-            def fmt(value):
-                return "N/A" if value is None else f"{value}"
-
-            print(f"Game ID: {game_id}")
-            print(f"  Starts: {fmt(commence_time)}")
-            print(f"  Matchup: {fmt(away_team)} @ {fmt(home_team)}")
-            print(f"  Moneyline: {fmt(home_team)} ({fmt(ml_home)}) / {fmt(away_team)} ({fmt(ml_away)})")
-            home_spread = fmt(spread_pts)
-            away_spread = fmt(-spread_pts) if spread_pts is not None else "N/A"
-            print(f"  Spread: {fmt(home_team)} {home_spread} ({fmt(spread_home)}) / {fmt(away_team)} {away_spread} ({fmt(spread_away)})")
-            print(f"  Total: Over {fmt(total_pts)} ({fmt(over_odds)}) / Under {fmt(total_pts)} ({fmt(under_odds)})")
-            print("-" * 25)
+        write_rows(
+            cursor, COLUMNS, output_format, _render_fixture, _render_compact,
+            title="--- NFL Fixtures ---",
+            empty_message="No data found in nfl_fixtures. Run import_data.py first.",
+            out=out,
+        )
 
     except sqlite3.Error as e:
         print(f"Database error: {e}")
     finally:
         if conn:
-            conn.close()
+            release_connection(conn)
 
 if __name__ == "__main__":
-    view_fixtures()
-
-
+    parser = argparse.ArgumentParser(description="Show NFL fixtures with odds.")
+    add_view_arguments(parser)
+    view_fixtures(**view_options(parser.parse_args()))
@@ -1,73 +1,88 @@
+import argparse
 import sqlite3
+from database import get_connection, release_connection
+from report import add_view_arguments, build_filters, fmt, paging, view_options, write_rows
 
 DATABASE_NAME = "picks.db"
 
-def view_epl_fixtures():
-    """Reads and prints the contents of the epl_fixtures table with odds."""
+COLUMNS = (
+    "id",
+    "commence_time",
+    "away_team",
+    "home_team",
+    "home_win_odds",
+    "draw_odds",
+    "away_win_odds",
+    "total_goals",
+    "over_odds",
+    "under_odds",
+    "btts_yes_odds",
+    "btts_no_odds",
+)
+
+def _render_fixture(row):
+    (
+        match_id,
+        commence_time,
+        away_team,
+        home_team,
+        home_win,
+        draw,
+        away_win,
+        total_goals,
+        over,
+        under,
+        btts_yes,
+        btts_no,
+    ) = row
+    return (
+        f"Match ID: {match_id}\n"
+        f"  Starts: {fmt(commence_time)}\n"
+        f"  Matchup: {fmt(away_team)} @ {fmt(home_team)}\n"
+        f"  3-Way: {fmt(home_team)} ({fmt(home_win)}) / Draw ({fmt(draw)}) / {fmt(away_team)} ({fmt(away_win)})\n"
+        f"  Total Goals: Over {fmt(total_goals)} ({fmt(over)}) / Under {fmt(total_goals)} ({fmt(under)})\n"
+        f"  BTTS: Yes ({fmt(btts_yes)}) / No ({fmt(btts_no)})\n"
+        + "-" * 25 + "\n"
+    )
+
+def _render_compact(row):
+    match_id, commence_time, away_team, home_team, home_win, draw, away_win, total_goals, _, _, btts_yes, _ = row
+    return (
+        f"{fmt(commence_time)}  {fmt(away_team)} @ {fmt(home_team)}  "
+        f"1X2 {fmt(home_win)}/{fmt(draw)}/{fmt(away_win)}  Total {fmt(total_goals)}  BTTS {fmt(btts_yes)}  [{match_id}]"
+    )
+
+def view_epl_fixtures(limit=None, offset=0, since=None, until=None, team=None, output_format="text", out=None):
+    """Streams the epl_fixtures table with odds, filtered and paged in SQL."""
     conn = None
     try:
-        conn = sqlite3.connect(DATABASE_NAME)
+        conn = get_connection(DATABASE_NAME)
         cursor = conn.cursor()
 
-        cursor.execute('''
-            SELECT
-                id,
-                commence_time,
-                away_team,
-                home_team,
-                home_win_odds,
-                draw_odds,
-                away_win_odds,
-                total_goals,
-                over_odds,
-                under_odds,
-                btts_yes_odds,
-                btts_no_odds
+        where, params = build_filters("commence_time", ("home_team", "away_team"), since, until, team)
+        limit_clause, limit_params = paging(limit, offset)
+        cursor.execute(f'''
+            SELECT {", ".join(COLUMNS)}
             FROM epl_fixtures
+            {where}
             ORDER BY commence_time
-        ''')
-
-        rows = cursor.fetchall()
-
-        if not rows:
-            print("No data found in epl_fixtures. Run import_data.py first.")
-            return
+            {limit_clause}
+        ''', params + limit_params)
 
-        def fmt(value):
-            return "N/A" if value is None else f"{value}"
-
-        print("--- EPL Fixtures ---")
-        for row in rows:
-            (
-                match_id,
-                commence_time,
-                away_team,
-                home_team,
-                home_win,
-                draw,
-                away_win,
-                total_goals,
-                over,
-                under,
-                btts_yes,
-                btts_no,
-            ) = row
-
-            print(f"Match ID: {match_id}")
-            print(f"  Starts: {fmt(commence_time)}")
-            print(f"  Matchup: {fmt(away_team)} @ {fmt(home_team)}")
-            print(f"  3-Way: {fmt(home_team)} ({fmt(home_win)}) / Draw ({fmt(draw)}) / {fmt(away_team)} ({fmt(away_win)})")
-            print(f"  Total Goals: Over {fmt(total_goals)} ({fmt(over)}) / Under {fmt(total_goals)} ({fmt(under)})")
-            print(f"  BTTS: Yes ({fmt(btts_yes)}) / No ({fmt(btts_no)})")
-            print("-" * 25)
+        write_rows(
+            cursor, COLUMNS, output_format, _render_fixture, _render_compact,
+            title="--- EPL Fixtures ---",
+            empty_message="No data found in epl_fixtures. Run import_data.py first.",
+            out=out,
+        )
 
     except sqlite3.Error as e:
         print(f"Database error: {e}")
     finally:
         if conn:
-            conn.close()
+            release_connection(conn)
 
 if __name__ == "__main__":
-    view_epl_fixtures()
-
-
+    parser = argparse.ArgumentParser(description="Show EPL fixtures with odds.")
+    add_view_arguments(parser)
+    view_epl_fixtures(**view_options(parser.parse_args()))
@@ -1,15 +1,57 @@
+import argparse
 import sqlite3
+from database import get_connection, release_connection
+from report import add_view_arguments, build_filters, paging, view_options, write_rows
 
 DATABASE_NAME = "picks.db"
 
-def view_picks():
-    """Reads and prints the contents of the nfl_picks table with matchup info."""
+COLUMNS = (
+    "id",
+    "game_id",
+    "away_team",
+    "home_team",
+    "market",
+    "pick",
+    "odds",
+    "confidence_level",
+    "rationale",
+)
+
+def _render_pick(row):
+    pick_id, game_id, away_team, home_team, market, pick, odds, confidence, rationale = row
+    matchup = f"{away_team} @ {home_team}" if away_team and home_team else "(matchup unavailable)"
+    lines = [
+        f"Pick ID: {pick_id}",
+        f"  Game: {game_id}  {matchup}",
+        f"  Market: {market}",
+        f"  Pick: {pick}",
+    ]
+    if odds is not None:
+        lines.append(f"  Odds: {odds}")
+    lines.append(f"  Confidence: {confidence}")
+    lines.append(f"  Rationale: {rationale}")
+    lines.append("-" * 25)
+    return "\n".join(lines) + "\n"
+
+def _render_compact(row):
+    pick_id, game_id, away_team, home_team, market, pick, odds, confidence, _ = row
+    matchup = f"{away_team} @ {home_team}" if away_team and home_team else game_id
+    odds_text = f" @ {odds}" if odds is not None else ""
+    return f"#{pick_id}  {matchup}  {market}: {pick}{odds_text}  ({confidence})"
+
+def view_picks(limit=None, offset=0, since=None, until=None, team=None, output_format="text", out=None):
+    """Streams the nfl_picks table with matchup info, newest first, filtered and paged in SQL.
+
+    since/until filter on the fixture's kickoff time.
+    """
     conn = None
     try:
-        conn = sqlite3.connect(DATABASE_NAME)
+        conn = get_connection(DATABASE_NAME)
         cursor = conn.cursor()
 
-        cursor.execute('''
+        where, params = build_filters("f.commence_time", ("f.home_team", "f.away_team"), since, until, team)
+        limit_clause, limit_params = paging(limit, offset)
+        cursor.execute(f'''
             SELECT
                 p.id,
                 p.game_id,
@@ -22,36 +64,25 @@ def view_picks():
                 p.rationale
             FROM nfl_picks p
             LEFT JOIN nfl_fixtures f ON p.game_id = f.id
+            {where}
             ORDER BY p.id DESC
-        ''')
-
-        rows = cursor.fetchall()
-
-        if not rows:
-            print("No picks found. Run generate_picks.py first.")
-            return
-
-        print("--- Generated NFL Picks ---")
-        for row in rows:
-            pick_id, game_id, away_team, home_team, market, pick, odds, confidence, rationale = row
-            matchup = f"{away_team} @ {home_team}" if away_team and home_team else "(matchup unavailable)"
-            print(f"Pick ID: {pick_id}")
-            print(f"  Game: {game_id}  {matchup}")
-            print(f"  Market: {market}")
-            print(f"  Pick: {pick}")
-            if odds is not None:
-                print(f"  Odds: {odds}")
-            print(f"  Confidence: {confidence}")
-            print(f"  Rationale: {rationale}")
-            print("-" * 25)
+            {limit_clause}
+        ''', params + limit_params)
+
+        write_rows(
+            cursor, COLUMNS, output_format, _render_pick, _render_compact,
+            title="--- Generated NFL Picks ---",
+            empty_message="No picks found. Run generate_picks.py first.",
+            out=out,
+        )
 
     except sqlite3.Error as e:
         print(f"Database error: {e}")
     finally:
         if conn:
-            conn.close()
+            release_connection(conn)
 
 if __name__ == "__main__":
-    view_picks()
-
-
+    parser = argparse.ArgumentParser(description="Show generated NFL picks.")
+    add_view_arguments(parser)
+    view_picks(**view_options(parser.parse_args()))